@@ -0,0 +1,155 @@
+"""
+Benchmark do arquivamento zstd (notas.nfez) contra o layout atual de ZIPs
+
+Gera uma pasta empresa/mês sintética com NFe e eventos no formato do portal
+(vários ZIPs, cada XML comprimido com deflate), empacota com e sem
+dicionário treinado e compara tamanho, vazão do empacotamento e latência
+de leitura aleatória por chave.
+
+Uso: python benchmarks/bench_arquivo_zstd.py [zips] [notas_por_zip] [leituras]
+Requer: pip install zstandard
+"""
+import sys
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from statistics import median
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.automacao import arquivo_zstd
+from src.automacao.arquivo_zstd import LeitorArquivoZstd, empacotar_pasta
+
+NS = "http://www.portalfiscal.inf.br/nfe"
+PRODUTOS = ["PARAFUSO SEXTAVADO ZINCADO", "ARRUELA LISA", "CABO FLEXIVEL 2,5MM", "DISJUNTOR BIPOLAR 32A",
+            "FITA ISOLANTE 20M", "TOMADA 2P+T 10A", "LAMPADA LED 9W", "ELETRODUTO PVC 3/4"]
+
+
+def _chave(numero: int, cnpj: str) -> str:
+    return f"52{2409}{cnpj}55001{numero:09d}1{random.randint(0, 99999999):08d}" + str(numero % 10)
+
+
+def _nfe(chave: str, cnpj: str, ie_dest: str) -> str:
+    itens = []
+    total = 0.0
+    for i in range(1, random.randint(2, 12)):
+        quantidade, valor = random.randint(1, 50), round(random.uniform(1, 300), 2)
+        total += quantidade * valor
+        itens.append(
+            f'<det nItem="{i}"><prod><cProd>{random.randint(1000, 99999)}</cProd><cEAN>SEM GTIN</cEAN>'
+            f'<xProd>{random.choice(PRODUTOS)}</xProd><NCM>73181500</NCM><CFOP>5102</CFOP><uCom>UN</uCom>'
+            f'<qCom>{quantidade}.0000</qCom><vUnCom>{valor:.10f}</vUnCom><vProd>{quantidade * valor:.2f}</vProd>'
+            f'<cEANTrib>SEM GTIN</cEANTrib><uTrib>UN</uTrib><qTrib>{quantidade}.0000</qTrib>'
+            f'<vUnTrib>{valor:.10f}</vUnTrib><indTot>1</indTot></prod><imposto><ICMS><ICMS00><orig>0</orig>'
+            f'<CST>00</CST><modBC>3</modBC><vBC>{quantidade * valor:.2f}</vBC><pICMS>17.00</pICMS>'
+            f'<vICMS>{quantidade * valor * 0.17:.2f}</vICMS></ICMS00></ICMS><PIS><PISAliq><CST>01</CST>'
+            f'<vBC>{quantidade * valor:.2f}</vBC><pPIS>1.65</pPIS><vPIS>{quantidade * valor * 0.0165:.2f}</vPIS>'
+            f'</PISAliq></PIS></imposto></det>'
+        )
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?><nfeProc xmlns="{NS}" versao="4.00"><NFe xmlns="{NS}">'
+        f'<infNFe Id="NFe{chave}" versao="4.00"><ide><cUF>52</cUF><natOp>VENDA DE MERCADORIA</natOp>'
+        f'<mod>55</mod><serie>1</serie><dhEmi>2024-09-{random.randint(1, 30):02d}T10:00:00-03:00</dhEmi>'
+        f'<tpNF>1</tpNF><idDest>1</idDest><cMunFG>5208707</cMunFG><tpImp>1</tpImp><tpEmis>1</tpEmis></ide>'
+        f'<emit><CNPJ>{cnpj}</CNPJ><xNome>DISTRIBUIDORA EXEMPLO LTDA</xNome><enderEmit><xLgr>RUA 1</xLgr>'
+        f'<nro>100</nro><xBairro>CENTRO</xBairro><cMun>5208707</cMun><xMun>GOIANIA</xMun><UF>GO</UF>'
+        f'</enderEmit><IE>101234567</IE><CRT>3</CRT></emit><dest><CNPJ>98765432000110</CNPJ>'
+        f'<xNome>CLIENTE EXEMPLO</xNome><IE>{ie_dest}</IE></dest>{"".join(itens)}<total><ICMSTot>'
+        f'<vProd>{total:.2f}</vProd><vNF>{total:.2f}</vNF></ICMSTot></total></infNFe>'
+        f'<Signature xmlns="http://www.w3.org/2000/09/xmldsig#"><SignatureValue>'
+        f'{"".join(random.choices("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/", k=344))}'
+        f'</SignatureValue></Signature></NFe><protNFe versao="4.00"><infProt><chNFe>{chave}</chNFe>'
+        f'<nProt>152240000{random.randint(100000, 999999)}</nProt><cStat>100</cStat>'
+        f'<xMotivo>Autorizado o uso da NF-e</xMotivo></infProt></protNFe></nfeProc>'
+    )
+
+
+def _evento(chave: str) -> str:
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?><procEventoNFe xmlns="{NS}" versao="1.00"><evento>'
+        f'<infEvento Id="ID110111{chave}01"><cOrgao>52</cOrgao><tpAmb>1</tpAmb><CNPJ>{chave[6:20]}</CNPJ>'
+        f'<chNFe>{chave}</chNFe><dhEvento>2024-09-30T12:00:00-03:00</dhEvento><tpEvento>110111</tpEvento>'
+        f'<nSeqEvento>1</nSeqEvento><detEvento versao="1.00"><descEvento>Cancelamento</descEvento>'
+        f'<xJust>Erro na digitacao dos dados</xJust></detEvento></infEvento></evento></procEventoNFe>'
+    )
+
+
+def _gerar_pasta(pasta: Path, zips: int, notas_por_zip: int):
+    indice_zip = {}
+    numero = 0
+    for z in range(zips):
+        caminho = pasta / f"nfe_101234567_{z:03d}_x.zip"
+        with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED) as pacote:
+            for _ in range(notas_por_zip):
+                numero += 1
+                cnpj = f"{random.randint(10**13, 10**14 - 1)}"
+                chave = _chave(numero, cnpj)
+                pacote.writestr(f"{chave}-nfe.xml", _nfe(chave, cnpj, "109998887"))
+                indice_zip[chave] = (caminho, f"{chave}-nfe.xml")
+                if random.random() < 0.05:
+                    pacote.writestr(f"{chave}-can.xml", _evento(chave))
+    return indice_zip
+
+
+def _percentis(amostras):
+    amostras = sorted(amostras)
+    return median(amostras) * 1e6, amostras[int(len(amostras) * 0.99) - 1] * 1e6
+
+
+def main():
+    zips = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    notas_por_zip = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    leituras = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    if not arquivo_zstd.disponivel():
+        print("Requer: pip install zstandard")
+        return
+
+    random.seed(42)
+    base = Path(tempfile.mkdtemp())
+    try:
+        original = base / "original"
+        original.mkdir()
+        indice_zip = _gerar_pasta(original, zips, notas_por_zip)
+        tamanho_zip = sum(z.stat().st_size for z in original.glob('*.zip'))
+        chaves = random.sample(list(indice_zip), min(leituras, len(indice_zip)))
+        print(f"{zips} ZIP(s) x {notas_por_zip} NFe: {tamanho_zip / 2**20:.2f} MB em ZIP")
+
+        tempos = []
+        for chave in chaves:
+            inicio = time.perf_counter()
+            caminho, membro = indice_zip[chave]
+            with zipfile.ZipFile(caminho) as pacote:
+                pacote.read(membro)
+            tempos.append(time.perf_counter() - inicio)
+        p50, p99 = _percentis(tempos)
+        print(f"{'ZIP (abre o pacote por leitura)':<34} {tamanho_zip / 2**20:8.2f} MB {'':>12} "
+              f"leitura p50 {p50:7.0f}us p99 {p99:7.0f}us")
+
+        min_amostras = arquivo_zstd.MIN_AMOSTRAS
+        for rotulo, com_dicionario in (("zstd sem dicionário", False), ("zstd com dicionário treinado", True)):
+            pasta = base / rotulo.replace(' ', '_')
+            shutil.copytree(original, pasta)
+            arquivo_zstd.MIN_AMOSTRAS = min_amostras if com_dicionario else float('inf')
+            resultado = empacotar_pasta(pasta)
+            vazao = resultado.bytes_xml / 2**20 / resultado.duracao
+
+            with LeitorArquivoZstd(resultado.arquivo) as leitor:
+                tempos = []
+                for chave in chaves:
+                    inicio = time.perf_counter()
+                    leitor.ler(chave)
+                    tempos.append(time.perf_counter() - inicio)
+            p50, p99 = _percentis(tempos)
+            print(f"{rotulo:<34} {resultado.bytes_arquivo / 2**20:8.2f} MB "
+                  f"({resultado.bytes_arquivo / tamanho_zip:5.1%}) {vazao:6.1f} MB/s "
+                  f"leitura p50 {p50:7.0f}us p99 {p99:7.0f}us")
+        arquivo_zstd.MIN_AMOSTRAS = min_amostras
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark do download direto (GerenciadorDownloadHttp) contra um servidor HTTP local
+
+O servidor (tests/servidor_zips.py, o mesmo dos testes) simula o histórico
+da SEFAZ: serve ZIPs com latência por requisição, suporta Range e pode
+derrubar a conexão no meio da primeira resposta de cada arquivo, para
+exercitar a retomada a partir do .part.
+
+Uso: python benchmarks/bench_download_http.py [arquivos] [tamanho_kb] [latencia_s]
+Requer: pip install requests
+"""
+import sys
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.automacao.download_http import GerenciadorDownloadHttp
+from tests.servidor_zips import iniciar_servidor
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    tamanho = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    latencia = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+
+    arquivos = {
+        f"/pacote_{i}.zip": b"PK\x03\x04" + bytes(range(256)) * (tamanho * 4) + str(i).encode()
+        for i in range(quantidade)
+    }
+    esperados = {caminho.strip('/'): hashlib.sha256(c).hexdigest() for caminho, c in arquivos.items()}
+
+    servidor = iniciar_servidor(arquivos, latencia=latencia)
+    urls = [servidor.base + caminho for caminho in arquivos]
+
+    print(f"{quantidade} arquivo(s) de {tamanho} KB, latência {latencia}s por requisição")
+    try:
+        for paralelismo in (1, 2, 4, 8):
+            with tempfile.TemporaryDirectory() as pasta:
+                downloader = GerenciadorDownloadHttp(paralelismo=paralelismo)
+                inicio = time.perf_counter()
+                baixados = downloader.baixar(urls, pasta)
+                duracao = time.perf_counter() - inicio
+                downloader.encerrar()
+
+                integros = sum(esperados[a.nome] == a.sha256 for a in baixados)
+                print(f"paralelismo {paralelismo}: {duracao:6.2f}s  {integros}/{quantidade} íntegros")
+
+        with tempfile.TemporaryDirectory() as pasta:
+            servidor.RequestHandlerClass.interromper = set(arquivos)
+            downloader = GerenciadorDownloadHttp(paralelismo=4)
+            baixados = downloader.baixar(urls, pasta)
+            downloader.encerrar()
+
+            retomados = sum(a.retomado for a in baixados)
+            integros = sum(esperados[a.nome] == a.sha256 for a in baixados)
+            print(f"conexões interrompidas: {retomados} retomado(s) via Range, {integros}/{quantidade} íntegros")
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark de inicialização do WebDriver (requer Chrome instalado)
+
+Mede resolução do chromedriver, abertura do Chrome e primeira carga da
+página de login em cada modo:
+  frio      - sem cache de driver (consulta o WebDriver Manager), perfil descartável
+  cache     - chromedriver resolvido pelo cache por versão do Chrome
+  perfil    - cache + perfil persistente (cache HTTP aquecido)
+  attach    - anexa a um Chrome mantido aberto (porta de depuração); o Chrome
+              iniciado para o attach continua aberto ao final
+
+Uso: python benchmarks/bench_inicializacao_driver.py [rodadas] [endereco_depuracao]
+"""
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.automacao import driver_manager
+from src.automacao.driver_manager import GerenciadorDriver
+from src.config.constants import SEFAZ_LOGIN_URL
+
+
+def _medir(rodadas: int, **kwargs):
+    medicoes = []
+    for _ in range(rodadas):
+        gerenciador = GerenciadorDriver(**kwargs)
+        if not gerenciador.configurar_driver():
+            return None
+
+        inicio = time.perf_counter()
+        gerenciador.driver.get(SEFAZ_LOGIN_URL)
+        tempos = dict(gerenciador.tempos_inicializacao)
+        tempos['primeira_pagina'] = time.perf_counter() - inicio
+        medicoes.append(tempos)
+        gerenciador.encerrar()
+
+    etapas = {etapa for tempos in medicoes for etapa in tempos}
+    return {etapa: sum(t.get(etapa, 0) for t in medicoes) / len(medicoes) for etapa in etapas}
+
+
+def main():
+    rodadas = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    endereco_depuracao = sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1:9222"
+
+    with tempfile.TemporaryDirectory() as pasta:
+        driver_manager.ARQUIVO_CACHE_DRIVER = str(Path(pasta) / "cache_driver.json")
+        perfil = str(Path(pasta) / "perfil")
+
+        modos = [
+            ('frio', dict(cache_driver=False)),
+            ('cache', dict()),
+            ('perfil', dict(perfil_chrome=perfil)),
+            ('attach', dict(perfil_chrome=perfil + "_attach", endereco_depuracao=endereco_depuracao)),
+        ]
+
+        # Aquece o cache de driver e o perfil antes das medições
+        _medir(1, perfil_chrome=perfil)
+
+        colunas = ['resolucao_driver', 'inicio_chrome', 'total', 'primeira_pagina']
+        print(f"Inicialização do WebDriver, média de {rodadas} rodada(s), em segundos:")
+        print(f"{'modo':<8}" + "".join(f"{coluna:>18}" for coluna in colunas))
+        for nome, kwargs in modos:
+            resultado = _medir(rodadas, **kwargs)
+            if resultado is None:
+                print(f"{nome:<8} indisponível")
+                continue
+            print(f"{nome:<8}" + "".join(f"{resultado.get(coluna, 0):>18.2f}" for coluna in colunas))
+
+
+if __name__ == "__main__":
+    main()
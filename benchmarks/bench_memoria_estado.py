@@ -0,0 +1,131 @@
+"""
+Benchmark de memória do estado das empresas (por 10 mil entradas)
+
+Compara o EstadoEmpresa antigo (@dataclass com __dict__, listas e dicts
+sempre materializados) com a representação compacta atual, carregando o
+mesmo estado persistido pelos backends JSON e SQLite.
+
+Uso: python benchmarks/bench_memoria_estado.py [quantidade]
+"""
+import gc
+import sys
+import json
+import tempfile
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.automacao.multi_ie_manager import GerenciadorMultiplasEmpresas, _desserializar_estado
+
+
+@dataclass
+class EstadoEmpresaDataclass:
+    ie: str
+    nome: str
+    status: str
+    tentativas: int = 0
+    ultima_tentativa: Optional[datetime] = None
+    erro: Optional[str] = None
+    arquivos_baixados: List[str] = None
+    etapa_atual: str = "inicio"
+    progresso_download: int = 0
+    dados_sessao: Dict[str, Any] = None
+    checkpoint_time: Optional[datetime] = None
+    total_notas: int = 0
+    notas_processadas: int = 0
+
+    def __post_init__(self):
+        if self.arquivos_baixados is None:
+            self.arquivos_baixados = []
+        if self.dados_sessao is None:
+            self.dados_sessao = {}
+
+
+def _gerar_estado(arquivo: str, quantidade: int, armazenamento: str):
+    gerenciador = GerenciadorMultiplasEmpresas(arquivo, armazenamento=armazenamento)
+    gerenciador.adicionar_empresas([
+        {'ie': f"10{i:07d}", 'nome': f"EMPRESA EXEMPLO {i} LTDA"} for i in range(quantidade)
+    ])
+    for i, estado in enumerate(gerenciador.estados.values()):
+        estado.status = 'concluido' if i % 3 else 'erro'
+        estado.etapa_atual = 'concluido'
+        estado.tentativas = 1
+        estado.ultima_tentativa = estado.checkpoint_time = datetime.now()
+        estado.dados_sessao = {
+            'url_atual': "https://nfeweb.sefaz.go.gov.br/nfeweb/sites/nfe/consulta-notas-recebidas",
+            'titulo': "Consulta de Notas Recebidas"
+        }
+        estado.arquivos_baixados = [f"NFe_{estado.ie}_2024_01_{i}.zip"]
+    gerenciador.salvar_estado()
+    gerenciador.fechar()
+
+
+def _medir(funcao):
+    gc.collect()
+    tracemalloc.start()
+    objeto = funcao()
+    gc.collect()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objeto, atual
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    escala = 10_000 / quantidade
+
+    with tempfile.TemporaryDirectory() as pasta:
+        resultados = []
+        for armazenamento in ('json', 'sqlite'):
+            arquivo = str(Path(pasta) / armazenamento / "processamento_empresas.json")
+            _gerar_estado(arquivo, quantidade, armazenamento)
+
+            gerenciador, memoria_compacta = _medir(
+                lambda: GerenciadorMultiplasEmpresas(arquivo, armazenamento=armazenamento)
+            )
+            registros = {
+                ie: {**registro, 'arquivos_baixados': arquivos, 'dados_sessao': dados}
+                for ie, registro in gerenciador.armazenamento.carregar().items()
+                for arquivos, dados in [gerenciador.armazenamento.carregar_payload(ie)]
+            }
+            gerenciador.fechar()
+            del gerenciador
+
+            texto_registros = json.dumps(registros)
+
+            def carregar_dataclass():
+                estados = {}
+                for ie, registro in json.loads(texto_registros).items():
+                    compacto = _desserializar_estado(ie, registro)
+                    estados[ie] = EstadoEmpresaDataclass(
+                        ie=ie, nome=registro['nome'], status=registro['status'],
+                        tentativas=registro['tentativas'],
+                        ultima_tentativa=compacto.ultima_tentativa,
+                        erro=registro['erro'],
+                        arquivos_baixados=registro['arquivos_baixados'],
+                        etapa_atual=registro['etapa_atual'],
+                        progresso_download=registro['progresso_download'],
+                        dados_sessao=registro['dados_sessao'],
+                        checkpoint_time=compacto.checkpoint_time,
+                        total_notas=registro['total_notas'],
+                        notas_processadas=registro['notas_processadas']
+                    )
+                return estados
+
+            _, memoria_dataclass = _medir(carregar_dataclass)
+            resultados.append((armazenamento, memoria_dataclass * escala, memoria_compacta * escala))
+
+    print(f"Memória residente do estado, por 10 mil entradas (medido com {quantidade}):")
+    print(f"{'backend':<8} {'dataclass':>12} {'compacto':>12} {'redução':>9}")
+    for armazenamento, dataclass_bytes, compacto_bytes in resultados:
+        reducao = 1 - compacto_bytes / dataclass_bytes
+        print(f"{armazenamento:<8} {dataclass_bytes / 2**20:>10.2f}MB {compacto_bytes / 2**20:>10.2f}MB "
+              f"{reducao:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,5 +21,28 @@ CONFIG = {
     'senha': 'sua_senha_aqui',             # Senha do portal
     'inscricao_estadual': '000000000',     # IE apenas números
     'data_inicio': data_inicio,            # Primeiro dia do mês anterior (automático)
-    'data_fim': data_fim                   # Último dia do mês anterior (automático)
+    'data_fim': data_fim,                  # Último dia do mês anterior (automático)
+    'backend_estado': 'json',              # 'json' (journal) ou 'sqlite' (WAL, consultas indexadas)
+    'escrita_assincrona_estado': False,    # Grava checkpoints em thread separada (write-behind)
+    'intervalo_flush_estado': 0.5,         # Segundos máximos entre gravações no modo assíncrono
+    'max_transicoes_flush': 50,            # Ou grava ao acumular este número de transições
+    'workers': 1,                          # Navegadores em paralelo (cada um com login e pasta de download próprios)
+    'abas': 1,                             # Abas de consulta por navegador, na mesma sessão autenticada
+    'reutilizar_sessao': True,             # Reaproveita a sessão salva (criptografada) e pula o login
+    'validade_sessao_horas': 8,            # Idade máxima da sessão salva; requer: pip install cryptography
+    'cache_driver': True,                  # Reusa o chromedriver resolvido para a versão instalada do Chrome
+    'perfil_chrome': '',                   # Ex.: 'estado/perfil_chrome' - perfil persistente (cache HTTP aquecido)
+    'endereco_depuracao': '',              # Ex.: '127.0.0.1:9222' - anexa a um Chrome mantido aberto entre execuções
+    'prazo_download': 60,                  # Segundos máximos aguardando o .zip (conclusão detectada por evento)
+    'monitorar_downloads_cdp': False,      # Antecipa a detecção pelos eventos de download do Chrome (log de performance)
+    'download_direto': False,              # Baixa os ZIPs do histórico via HTTP com os cookies do navegador
+    'paralelismo_download': 4,             # Downloads HTTP simultâneos (conexões reaproveitadas)
+    'pipeline': False,                     # Solicita os pacotes de todas as IEs e depois colhe o histórico em lote
+    'prazo_pipeline': 900,                 # Segundos máximos aguardando a geração dos pacotes solicitados
+    'pos_processamento': False,            # Lê as NFe de cada ZIP baixado em processos paralelos ao navegador
+    'processos_pos_processamento': 2,      # Processos do pós-processamento
+    'extrair_xml': False,                  # Também grava os XML extraídos numa pasta ao lado do ZIP
+    'catalogo_nfe': False,                 # Indexa cada NFe baixada em estado/catalogo_nfe.db (chave, IE, mês)
+    'armazem_xml': False,                  # Grava cada XML uma única vez (por SHA-256) e um manifesto por empresa/mês no lugar dos ZIPs
+    'intervalo_espera': 0.1                # Segundos entre verificações das esperas por evento (URL, janela, iframe, DOM, rede)
 }
\ No newline at end of file
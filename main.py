@@ -5,12 +5,15 @@ Ponto de entrada principal
 import sys
 import os
 import logging
+import argparse
 from datetime import datetime
 
 from src.config import gerenciador_config
 from src.automacao import AutomatorSEFAZ
 from src.utils.login_helper import LoggingConfig
 from src.automacao.timeout_manager import TimeoutManager
+from src.automacao.catalogo_nfe import DIRETORIO_PACOTES, CatalogoNFe
+from src.automacao import arquivo_zstd
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
@@ -31,8 +34,41 @@ def limpar_logs_antigos(max_logs=5):
     except Exception as e:
         print(f"Erro ao limpar logs antigos: {e}")
 
+def parse_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Automação SEFAZ NFe")
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help="Número de navegadores processando IEs em paralelo (padrão: config.py)"
+    )
+    parser.add_argument(
+        '--abas', type=int, default=None,
+        help="Abas de consulta por navegador, compartilhando o mesmo login (padrão: config.py)"
+    )
+    parser.add_argument(
+        '--pipeline', action='store_true', default=None,
+        help="Solicita os pacotes de todas as IEs antes de colher o histórico em lote"
+    )
+    parser.add_argument(
+        '--pos-processar', action='store_true', default=None,
+        help="Lê as NFe de cada ZIP baixado em processos paralelos ao navegador"
+    )
+    parser.add_argument(
+        '--reindexar-catalogo', action='store_true',
+        help="Indexa no catálogo de NFe os ZIPs já baixados ainda não catalogados e sai"
+    )
+    parser.add_argument(
+        '--arquivar-zstd', action='store_true',
+        help="Reempacota os ZIPs de cada empresa/mês num arquivo zstd com índice por chave e sai"
+    )
+    parser.add_argument(
+        '--remover-zips', action='store_true',
+        help="Com --arquivar-zstd, remove os ZIPs depois de conferir o arquivo gerado"
+    )
+    return parser.parse_args(argv)
+
 def main():
     
+    argumentos = parse_argumentos()
     limpar_logs_antigos(max_logs=3)
     
     if not LoggingConfig.setup(log_level=logging.DEBUG, log_file="logs/nfe_automation.log", verbose=False):
@@ -40,6 +76,23 @@ def main():
     
     logger = logging.getLogger(__name__)
     
+    if argumentos.reindexar_catalogo:
+        catalogo = CatalogoNFe()
+        documentos = catalogo.reindexar()
+        catalogo.fechar()
+        print(f"Catálogo atualizado: {documentos} documento(s) indexado(s)")
+        return 0
+    
+    if argumentos.arquivar_zstd:
+        if not arquivo_zstd.disponivel():
+            print("Arquivamento zstd requer: pip install zstandard")
+            return 1
+        resultados = arquivo_zstd.empacotar_arvore(DIRETORIO_PACOTES, remover_zips=argumentos.remover_zips)
+        antes = sum(r.bytes_zip for r in resultados)
+        depois = sum(r.bytes_arquivo for r in resultados)
+        print(f"Arquivadas {len(resultados)} pasta(s): {antes / 2**20:.1f} MB em ZIP -> {depois / 2**20:.1f} MB")
+        return 0
+    
     print("\n" + "="*50)
     print("AUTOMACAO SEFAZ NFe - INICIANDO")
     print("="*50)
@@ -53,6 +106,15 @@ def main():
             logger.error("Falha: Configuracoes nao carregadas")
             return 1
         
+        if argumentos.workers is not None:
+            config.workers = argumentos.workers
+        if argumentos.abas is not None:
+            config.abas = argumentos.abas
+        if argumentos.pipeline:
+            config.pipeline = True
+        if argumentos.pos_processar:
+            config.pos_processamento = True
+        
         logger.info("Validando credenciais...")
         erros = config.validar_formatos()
         if erros:
@@ -13,6 +13,9 @@ from .iframe_manager import GerenciadorIframe
 from .health_check import HealthCheckDriver
 from .validador_ie import ValidadorIE
 from .timeout_manager import TimeoutManager
+from .pool_workers import GerenciadorPoolWorkers
+from .agendador_abas import AgendadorAbas
+from .sessao_manager import GerenciadorSessao
 
 __all__ = [
     'AutomatorSEFAZ',
@@ -27,5 +30,8 @@ __all__ = [
     'GerenciadorIframe',
     'HealthCheckDriver',
     'ValidadorIE',
-    'TimeoutManager'
+    'TimeoutManager',
+    'GerenciadorPoolWorkers',
+    'AgendadorAbas',
+    'GerenciadorSessao'
 ]
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Agendador de abas: várias consultas em paralelo na mesma sessão autenticada
+"""
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Generator, Iterable, List, Optional
+
+from .iframe_manager import GerenciadorIframe
+from .timeout_manager import TipoOperacao
+
+logger = logging.getLogger(__name__)
+
+# Espera base (segundos) até a aba ter trabalho pronto após cada ação no servidor,
+# escalada pelo fator de adaptação do TimeoutManager; 'download' é o intervalo
+# entre verificações dos downloads diretos (HTTP), não a duração esperada
+ESPERAS_BASE = {
+    'consulta': 3.0,
+    'download': 0.5,
+    'reserva': 1.0,
+}
+
+
+@dataclass
+class AbaConsulta:
+    handle: str
+    empresa: Optional[Dict] = None
+    fluxo: Optional[Generator] = None
+    pronto_em: float = 0.0
+    inicio: float = 0.0
+
+
+class AgendadorAbas:
+    """Distribui IEs entre K abas da mesma sessão na página de consulta.
+
+    Cada IE roda como um gerador (ProcessadorIE.processar_ie_em_etapas) que
+    cede a aba nas esperas de consulta/modal/histórico informando quando terá
+    trabalho pronto. O agendador só troca de aba quando a próxima aba pronta
+    é diferente da ativa, e só dorme quando nenhuma aba tem trabalho pronto;
+    com um download em andamento, dorme no monitor de downloads, que acorda
+    a aba dona da pasta assim que os arquivos chegam.
+    """
+
+    def __init__(self, automator, num_abas: int):
+        self.automator = automator
+        self.driver = automator.driver
+        self.num_abas = num_abas
+        self.gerenciador_iframe = GerenciadorIframe(self.driver)
+        self.abas: List[AbaConsulta] = []
+        self._aba_downloads: Optional[str] = None
+        self._monitor_downloads = None
+        self._esperados_downloads = 0
+        self.trocas_aba = 0
+        self.colhidas = 0
+
+    def espera(self, etapa: str) -> float:
+        return ESPERAS_BASE.get(etapa, 1.0) * self.automator.timeout_manager.fator_adaptacao
+
+    def reservar_downloads(self) -> bool:
+        """Reserva a pasta de download do navegador para a aba ativa"""
+        aba = self.gerenciador_iframe.aba_ativa
+        if self._aba_downloads in (None, aba):
+            self._aba_downloads = aba
+            return True
+        return False
+
+    def liberar_downloads(self):
+        if self._aba_downloads == self.gerenciador_iframe.aba_ativa:
+            self._aba_downloads = None
+            self._monitor_downloads = None
+
+    def vigiar_downloads(self, monitor, esperados: int):
+        """A aba dona da pasta de download espera pelo monitor em vez de um intervalo fixo"""
+        self._monitor_downloads = monitor
+        self._esperados_downloads = esperados
+
+    def _dormir(self, espera: float):
+        """Dorme até a próxima aba pronta; um download concluído antes disso acorda a aba dele"""
+        if self._monitor_downloads is None:
+            time.sleep(espera)
+            return
+        if self._monitor_downloads.esperar(espera, self._esperados_downloads):
+            for aba in self.abas:
+                if aba.handle == self._aba_downloads:
+                    aba.pronto_em = time.time()
+
+    def abrir_abas(self) -> List[AbaConsulta]:
+        """Abre K-1 abas extras na página de consulta, reaproveitando a sessão da aba atual"""
+        aba_original = self.driver.current_window_handle
+        url_base = self.driver.current_url
+        self.gerenciador_iframe.esquecer_aba()
+        self.gerenciador_iframe.ativar_aba(aba_original)
+        self.abas = [AbaConsulta(aba_original)]
+
+        for indice in range(1, self.num_abas):
+            try:
+                self.driver.switch_to.new_window('tab')
+                handle = self.driver.current_window_handle
+                self.gerenciador_iframe.esquecer_aba()
+                self.gerenciador_iframe.ativar_aba(handle)
+
+                self.driver.get(url_base)
+                if self.automator._clicar_baixar_xml_apos_login():
+                    self.abas.append(AbaConsulta(handle))
+                else:
+                    logger.warning(f"Aba {indice} não chegou à consulta, descartada")
+                    self.driver.close()
+                    self.gerenciador_iframe.esquecer_aba()
+            except Exception as e:
+                logger.warning(f"Erro ao abrir aba {indice}: {e}")
+
+        self.gerenciador_iframe.esquecer_aba()
+        self.gerenciador_iframe.ativar_aba(aba_original)
+        logger.info(f"{len(self.abas)} aba(s) de consulta prontas")
+        return self.abas
+
+    def executar(self, empresas: Iterable[Dict]) -> int:
+        """Processa as empresas alternando entre as abas; retorna quantas tinham notas"""
+        pendentes = iter(empresas)
+        ies_com_notas = 0
+        processador = self.automator.processador_ie
+
+        try:
+            self.abas = self.abrir_abas()
+            while True:
+                for aba in self.abas:
+                    if aba.fluxo is None:
+                        self._iniciar_empresa(aba, pendentes, processador)
+
+                ativas = [aba for aba in self.abas if aba.fluxo is not None]
+                if not ativas:
+                    break
+
+                aba = self._proxima_aba(ativas)
+                espera = aba.pronto_em - time.time()
+                if espera > 0:
+                    self._dormir(espera)
+                    aba = self._proxima_aba(ativas)
+
+                if self.gerenciador_iframe.ativar_aba(aba.handle):
+                    self.trocas_aba += 1
+
+                try:
+                    with self.automator.consulta_driver.contar_ie(aba.empresa['ie']):
+                        aba.pronto_em = time.time() + next(aba.fluxo)
+                except StopIteration as fim:
+                    if fim.value:
+                        ies_com_notas += 1
+                    self._finalizar_empresa(aba, sucesso=True)
+                except Exception as e:
+                    logger.error(f"  ✗ Erro na aba: {e}")
+                    self.automator.gerenciador_multi_ie.marcar_erro(aba.empresa, str(e))
+                    aba.fluxo.close()
+                    self._finalizar_empresa(aba, sucesso=False)
+
+            ies_com_notas += self.colhidas
+            logger.info(f"Abas concluídas: {ies_com_notas} empresas com notas, {self.trocas_aba} trocas de aba")
+            return ies_com_notas
+
+        finally:
+            self._fechar_abas_extras()
+
+    def _proxima_aba(self, ativas: List[AbaConsulta]) -> AbaConsulta:
+        aba_ativa = self.gerenciador_iframe.aba_ativa
+        # Prefere a aba ativa quando empatada, evitando trocas desnecessárias
+        return min(ativas, key=lambda a: (a.pronto_em, a.handle != aba_ativa))
+
+    def _iniciar_empresa(self, aba: AbaConsulta, pendentes, processador):
+        multi_ie = self.automator.gerenciador_multi_ie
+        empresa = next(pendentes, None)
+        while empresa is not None and multi_ie.foi_colhida(empresa['ie']):
+            # Pacote já baixado junto com o histórico de outra IE
+            self.colhidas += 1
+            empresa = next(pendentes, None)
+        if empresa is None:
+            return
+
+        self.automator.gerenciador_multi_ie.marcar_em_andamento(empresa)
+        aba.empresa = empresa
+        aba.fluxo = processador.processar_ie_em_etapas(empresa['ie'], empresa['nome'], self)
+        aba.inicio = aba.pronto_em = time.time()
+
+    def _finalizar_empresa(self, aba: AbaConsulta, sucesso: bool):
+        if sucesso:
+            self.automator.gerenciador_multi_ie.marcar_concluido(aba.empresa)
+        self.automator.timeout_manager.registrar_tempo_operacao(
+            TipoOperacao.CONSULTA, time.time() - aba.inicio, sucesso
+        )
+        aba.empresa = None
+        aba.fluxo = None
+
+    def _fechar_abas_extras(self):
+        for aba in self.abas:
+            if aba.fluxo is not None:
+                aba.fluxo.close()
+                aba.fluxo = None
+
+        for aba in self.abas[1:]:
+            try:
+                self.gerenciador_iframe.ativar_aba(aba.handle)
+                self.driver.close()
+            except Exception as e:
+                logger.debug(f"Erro ao fechar aba: {e}")
+            self.gerenciador_iframe.esquecer_aba()
+
+        try:
+            if self.abas:
+                self.driver.switch_to.window(self.abas[0].handle)
+        except Exception as e:
+            logger.warning(f"Erro ao voltar para a aba original: {e}")
+        self.gerenciador_iframe.esquecer_aba()
@@ -0,0 +1,143 @@
+"""
+Armazenamento endereçado por conteúdo dos XML baixados, sem cópias repetidas
+"""
+import os
+import json
+import mmap
+import hashlib
+import logging
+import threading
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_OBJETOS = Path.home() / "Downloads" / "SEFAZ" / ".objetos"
+ARQUIVO_MANIFESTO = "manifesto.json"
+TAMANHO_BLOCO = 1024 * 1024
+LIMITE_MMAP = 8 * 1024 * 1024
+
+_lock_manifestos = threading.Lock()
+
+
+def calcular_sha256(caminho) -> str:
+    """SHA-256 do arquivo; acima de LIMITE_MMAP a leitura é mapeada em memória"""
+    hash_arquivo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        tamanho = os.fstat(f.fileno()).st_size
+        if tamanho >= LIMITE_MMAP:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                visao = memoryview(mapa)
+                try:
+                    for inicio in range(0, tamanho, TAMANHO_BLOCO):
+                        hash_arquivo.update(visao[inicio:inicio + TAMANHO_BLOCO])
+                finally:
+                    visao.release()
+        else:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+                hash_arquivo.update(bloco)
+    return hash_arquivo.hexdigest()
+
+
+def carregar_manifesto(pasta) -> Dict[str, Dict]:
+    """{nome do ZIP: {'sha256': ..., 'membros': {membro: sha256 do XML}}}"""
+    try:
+        with open(Path(pasta) / ARQUIVO_MANIFESTO, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def sha256_pacote(caminho) -> str:
+    """Hash do ZIP, esteja ele no disco ou só no manifesto da pasta (modo armazém)"""
+    caminho = Path(caminho)
+    if not caminho.exists():
+        entrada = carregar_manifesto(caminho.parent).get(caminho.name)
+        if entrada is not None:
+            return entrada['sha256']
+    return calcular_sha256(caminho)
+
+
+@dataclass
+class ResultadoArmazenamento:
+    nome: str
+    sha256: str
+    membros: int = 0
+    objetos_novos: int = 0
+    bytes_gravados: int = 0
+    repetido: bool = False
+
+
+class ArmazemXML:
+    """Cada XML é gravado uma única vez, em `.objetos/ab/cd/<sha256>.xml`.
+
+    No lugar do ZIP, a pasta da empresa/mês recebe um `manifesto.json` que
+    aponta para os objetos de cada pacote. Um pacote idêntico ao já
+    registrado (mesmo SHA-256 do ZIP) não grava nada; num pacote novo, só os
+    XML ainda ausentes do armazém são escritos.
+    """
+
+    def __init__(self, raiz: Optional[str] = None):
+        self.raiz = Path(raiz) if raiz else DIRETORIO_OBJETOS
+
+    def caminho_objeto(self, sha256: str) -> Path:
+        return self.raiz / sha256[:2] / sha256[2:4] / f"{sha256}.xml"
+
+    def guardar(self, conteudo: bytes) -> Tuple[str, bool]:
+        """Grava o XML se ainda não existir; retorna o SHA-256 e se houve escrita"""
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        destino = self.caminho_objeto(sha256)
+        if destino.exists():
+            return sha256, False
+
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = destino.with_name(f"{destino.name}.{threading.get_ident()}.tmp")
+        with open(temporario, 'wb') as f:
+            f.write(conteudo)
+        os.replace(temporario, destino)
+        return sha256, True
+
+    def guardar_zip(self, arquivo: Path, pasta_destino: str,
+                    sha256: Optional[str] = None) -> ResultadoArmazenamento:
+        """Transfere o conteúdo do ZIP para o armazém, registra no manifesto e remove o ZIP"""
+        arquivo = Path(arquivo)
+        resultado = ResultadoArmazenamento(arquivo.name, sha256 or calcular_sha256(arquivo))
+
+        anterior = carregar_manifesto(pasta_destino).get(arquivo.name)
+        if anterior and anterior.get('sha256') == resultado.sha256:
+            resultado.repetido = True
+            resultado.membros = len(anterior.get('membros', {}))
+            arquivo.unlink()
+            return resultado
+
+        membros = {}
+        with zipfile.ZipFile(arquivo) as pacote:
+            for info in pacote.infolist():
+                if info.is_dir():
+                    continue
+                # read() confere o CRC-32: membro corrompido aborta antes de tocar no manifesto
+                conteudo = pacote.read(info)
+                membros[info.filename], gravado = self.guardar(conteudo)
+                if gravado:
+                    resultado.objetos_novos += 1
+                    resultado.bytes_gravados += len(conteudo)
+        resultado.membros = len(membros)
+
+        self._registrar_manifesto(Path(pasta_destino), arquivo.name,
+                                  {'sha256': resultado.sha256, 'membros': membros})
+        arquivo.unlink()
+        logger.debug(f"{arquivo.name}: {resultado.membros} XML, {resultado.objetos_novos} novo(s) no armazém "
+                     f"({resultado.bytes_gravados} bytes)")
+        return resultado
+
+    def _registrar_manifesto(self, pasta: Path, nome: str, entrada: Dict):
+        with _lock_manifestos:
+            manifesto = carregar_manifesto(pasta)
+            manifesto[nome] = entrada
+            pasta.mkdir(parents=True, exist_ok=True)
+            temporario = pasta / f"{ARQUIVO_MANIFESTO}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(manifesto, f, ensure_ascii=False, indent=1)
+            os.replace(temporario, pasta / ARQUIVO_MANIFESTO)
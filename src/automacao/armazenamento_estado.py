@@ -0,0 +1,520 @@
+"""
+Backends de persistência do estado das empresas
+"""
+import os
+import gzip
+import json
+import shutil
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ArmazenamentoEstado:
+    """Interface dos backends usados por GerenciadorMultiplasEmpresas.
+
+    Os registros trafegam já serializados (dicts com datas em ISO 8601).
+    Backends com `suporta_consultas = True` respondem à consulta de
+    checkpoints antigos diretamente; nos demais o gerenciador varre a memória.
+    As demais consultas (próxima IE, interrompidas, por status) vêm dos
+    índices em memória do gerenciador.
+
+    O payload de sessão (`arquivos_baixados`, `dados_sessao`) não é
+    devolvido por `carregar()`: é lido sob demanda por `carregar_payload`.
+    Registros sem essas chaves preservam o payload já persistido.
+    """
+
+    suporta_consultas = False
+    requer_payload_completo = False
+    CHAVES_PAYLOAD = ('arquivos_baixados', 'dados_sessao')
+
+    def carregar(self) -> Dict[str, Dict]:
+        raise NotImplementedError
+
+    def carregar_payload(self, ie: str) -> Tuple[List[str], Dict]:
+        """Retorna (arquivos_baixados, dados_sessao) persistidos para a IE"""
+        raise NotImplementedError
+
+    def registrar(self, registros: List[Dict]):
+        """Persiste a transição de um ou mais registros"""
+        raise NotImplementedError
+
+    def salvar_tudo(self, registros: Dict[str, Dict]):
+        """Persiste o conjunto completo de registros"""
+        raise NotImplementedError
+
+    def limpar(self):
+        raise NotImplementedError
+
+    def fechar(self):
+        pass
+
+    def existe(self) -> bool:
+        raise NotImplementedError
+
+    def consultar_checkpoints_antigos(self, checkpoint_maximo: str) -> List[str]:
+        raise NotImplementedError
+
+
+class ArmazenamentoJSON(ArmazenamentoEstado):
+    """Snapshot JSON + journal append-only compactado em background.
+
+    Payloads não vazios ficam em memória como texto JSON compacto até
+    serem pedidos, em vez de listas/dicts por empresa.
+    """
+
+    requer_payload_completo = True
+
+    def __init__(self, arquivo_estado: str = "estado/processamento_empresas.json",
+                 limite_journal: int = 1000):
+        self.arquivo_estado = Path(arquivo_estado)
+        self.arquivo_journal = self.arquivo_estado.with_suffix('.journal')
+        self.arquivo_journal_compactando = self.arquivo_estado.with_suffix('.journal.compactando')
+        self.limite_journal = limite_journal
+
+        self._lock = threading.RLock()
+        self._journal = None
+        self._linhas_journal = 0
+        self._thread_compactacao: Optional[threading.Thread] = None
+        self._fonte_snapshot: Optional[Callable[[], Dict[str, Dict]]] = None
+        self._payloads: Dict[str, str] = {}
+
+    def vincular_snapshot(self, fonte: Callable[[], Dict[str, Dict]]):
+        """Define a função que fornece o estado completo para a compactação"""
+        self._fonte_snapshot = fonte
+
+    def existe(self) -> bool:
+        return (self.arquivo_estado.exists() or self.arquivo_journal.exists()
+                or self.arquivo_journal_compactando.exists())
+
+    def carregar(self) -> Dict[str, Dict]:
+        """Carrega snapshot JSON e reaplica as transições registradas no journal"""
+        registros = {}
+        with self._lock:
+            if self.arquivo_estado.exists():
+                with open(self.arquivo_estado, 'r', encoding='utf-8') as f:
+                    registros.update(json.load(f))
+
+            self._reaplicar_journal(self.arquivo_journal_compactando, registros)
+            self._linhas_journal = self._reaplicar_journal(self.arquivo_journal, registros)
+
+            self._payloads = {}
+            for ie, registro in registros.items():
+                arquivos_baixados = registro.pop('arquivos_baixados', None)
+                dados_sessao = registro.pop('dados_sessao', None)
+                if arquivos_baixados or dados_sessao:
+                    self._payloads[ie] = json.dumps(
+                        [arquivos_baixados or [], dados_sessao or {}],
+                        ensure_ascii=False, separators=(',', ':')
+                    )
+        return registros
+
+    def carregar_payload(self, ie: str) -> Tuple[List[str], Dict]:
+        texto = self._payloads.get(ie)
+        if texto is None:
+            return [], {}
+        arquivos_baixados, dados_sessao = json.loads(texto)
+        return arquivos_baixados, dados_sessao
+
+    def _reaplicar_journal(self, arquivo: Path, registros: Dict[str, Dict]) -> int:
+        """Reaplica as linhas de um journal sobre os registros carregados"""
+        if not arquivo.exists():
+            return 0
+
+        aplicadas = 0
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            for numero, linha in enumerate(f, 1):
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Última linha truncada por queda do processo
+                    logger.warning(f"Linha {numero} inválida no journal {arquivo.name}, ignorada")
+                    continue
+
+                # Linhas sem payload preservam o payload anterior
+                registros[registro['ie']] = {**registros.get(registro['ie'], {}), **registro}
+                aplicadas += 1
+
+        if aplicadas:
+            logger.debug(f"Journal {arquivo.name}: {aplicadas} transições reaplicadas")
+        return aplicadas
+
+    def registrar(self, registros: List[Dict]):
+        """Acrescenta uma linha por registro ao journal"""
+        if not registros:
+            return
+
+        with self._lock:
+            if self._journal is None:
+                self.arquivo_journal.parent.mkdir(parents=True, exist_ok=True)
+                self._journal = open(self.arquivo_journal, 'a', encoding='utf-8')
+
+            linhas = [json.dumps(registro, ensure_ascii=False) for registro in registros]
+            self._journal.write('\n'.join(linhas) + '\n')
+            self._journal.flush()
+            self._linhas_journal += len(linhas)
+
+            if self._linhas_journal >= self.limite_journal and self._fonte_snapshot:
+                self._iniciar_compactacao()
+
+    def _fechar_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _iniciar_compactacao(self):
+        """Rotaciona o journal e grava o snapshot em background"""
+        if self._thread_compactacao and self._thread_compactacao.is_alive():
+            return
+
+        self._fechar_journal()
+        if self.arquivo_journal.exists():
+            if self.arquivo_journal_compactando.exists():
+                # Compactação anterior interrompida: acumula até o novo snapshot
+                with open(self.arquivo_journal_compactando, 'a', encoding='utf-8') as destino, \
+                        open(self.arquivo_journal, 'r', encoding='utf-8') as origem:
+                    destino.write(origem.read())
+                self.arquivo_journal.unlink()
+            else:
+                os.replace(self.arquivo_journal, self.arquivo_journal_compactando)
+        self._linhas_journal = 0
+
+        dados = self._fonte_snapshot()
+        self._thread_compactacao = threading.Thread(
+            target=self._compactar, args=(dados,), name="compactacao-estado", daemon=True
+        )
+        self._thread_compactacao.start()
+
+    def _compactar(self, dados: Dict[str, Dict]):
+        try:
+            self._gravar_snapshot(dados)
+            self.arquivo_journal_compactando.unlink(missing_ok=True)
+            logger.debug(f"Journal compactado em snapshot ({len(dados)} empresas)")
+        except Exception as e:
+            logger.error(f"Erro na compactação do journal: {e}")
+
+    def _gravar_snapshot(self, dados: Dict[str, Dict]):
+        """Grava snapshot de forma atômica (arquivo temporário + rename)"""
+        self.arquivo_estado.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.arquivo_estado.with_suffix('.json.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(temporario, self.arquivo_estado)
+
+    def aguardar_compactacao(self, timeout: float = None):
+        """Aguarda término de uma compactação em andamento"""
+        thread = self._thread_compactacao
+        if thread and thread.is_alive():
+            thread.join(timeout)
+
+    def salvar_tudo(self, registros: Dict[str, Dict]):
+        """Grava snapshot completo e descarta o journal já incorporado"""
+        self.aguardar_compactacao()
+        with self._lock:
+            self._gravar_snapshot(registros)
+            self._fechar_journal()
+            self.arquivo_journal.unlink(missing_ok=True)
+            self.arquivo_journal_compactando.unlink(missing_ok=True)
+            self._linhas_journal = 0
+
+    def limpar(self):
+        self.aguardar_compactacao()
+        with self._lock:
+            self._fechar_journal()
+            self._linhas_journal = 0
+            self._payloads = {}
+            for arquivo in (self.arquivo_estado, self.arquivo_journal, self.arquivo_journal_compactando):
+                arquivo.unlink(missing_ok=True)
+
+    def fechar(self):
+        self.aguardar_compactacao()
+        with self._lock:
+            self._fechar_journal()
+
+
+class ArmazenamentoSQLite(ArmazenamentoEstado):
+    """Estado em SQLite (modo WAL) com índices por status e checkpoint.
+
+    Cada transição é um UPSERT de uma única linha. O modo WAL permite que
+    outros processos leiam o progresso enquanto a execução grava. Cada
+    partição de período tem o seu próprio banco, então a chave é só a IE.
+    """
+
+    suporta_consultas = True
+
+    COLUNAS = [
+        'ie', 'nome', 'status', 'tentativas', 'ultima_tentativa', 'erro',
+        'arquivos_baixados', 'etapa_atual', 'progresso_download', 'dados_sessao',
+        'checkpoint_time', 'total_notas', 'notas_processadas'
+    ]
+    COLUNAS_JSON = ('arquivos_baixados', 'dados_sessao')
+
+    NOME_BANCO = "processamento_empresas.db"
+
+    TABELA = """
+        CREATE TABLE IF NOT EXISTS estados (
+            ie TEXT PRIMARY KEY,
+            nome TEXT,
+            status TEXT NOT NULL,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            ultima_tentativa TEXT,
+            erro TEXT,
+            arquivos_baixados TEXT,
+            etapa_atual TEXT,
+            progresso_download INTEGER NOT NULL DEFAULT 0,
+            dados_sessao TEXT,
+            checkpoint_time TEXT,
+            total_notas INTEGER NOT NULL DEFAULT 0,
+            notas_processadas INTEGER NOT NULL DEFAULT 0,
+            ordem INTEGER
+        );
+    """
+
+    def __init__(self, arquivo_banco: str = "estado/processamento_empresas.db"):
+        self.arquivo_banco = Path(arquivo_banco)
+        self._lock = threading.RLock()
+        self._conexao: Optional[sqlite3.Connection] = None
+
+    @property
+    def conexao(self) -> sqlite3.Connection:
+        if self._conexao is None:
+            self.arquivo_banco.parent.mkdir(parents=True, exist_ok=True)
+            self._conexao = sqlite3.connect(str(self.arquivo_banco), check_same_thread=False)
+            self._conexao.row_factory = sqlite3.Row
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("PRAGMA synchronous=NORMAL")
+            self._criar_esquema()
+        return self._conexao
+
+    def _criar_esquema(self):
+        self._conexao.executescript(self.TABELA + """
+            CREATE INDEX IF NOT EXISTS idx_estados_status_checkpoint
+                ON estados (status, checkpoint_time);
+            CREATE INDEX IF NOT EXISTS idx_estados_ordem
+                ON estados (ordem);
+        """)
+
+    @classmethod
+    def abrir_somente_leitura(cls, data_inicio: str, data_fim: str,
+                              diretorio_estado: str = "estado") -> sqlite3.Connection:
+        """Conexão de leitura ao banco da partição do período, para acompanhar outro processo"""
+        particao = ParticaoPeriodo(Path(diretorio_estado), data_inicio, data_fim)
+        arquivo_banco = particao.diretorio / cls.NOME_BANCO
+        if not arquivo_banco.exists():
+            raise FileNotFoundError(f"Sem banco de estado aberto para o período: {arquivo_banco}")
+        conexao = sqlite3.connect(f"file:{arquivo_banco.as_posix()}?mode=ro", uri=True)
+        conexao.row_factory = sqlite3.Row
+        return conexao
+
+    def _para_linha(self, registro: Dict) -> tuple:
+        valores = []
+        for coluna in self.COLUNAS:
+            valor = registro.get(coluna)
+            if coluna in self.COLUNAS_JSON and coluna in registro:
+                valor = json.dumps(valor or ([] if coluna == 'arquivos_baixados' else {}),
+                                   ensure_ascii=False)
+            valores.append(valor)
+        return tuple(valores)
+
+    def existe(self) -> bool:
+        return self.arquivo_banco.exists()
+
+    def carregar(self) -> Dict[str, Dict]:
+        """Carrega apenas as colunas escalares; payloads ficam no banco"""
+        colunas = ', '.join(c for c in self.COLUNAS if c not in self.COLUNAS_JSON)
+        with self._lock:
+            cursor = self.conexao.execute(
+                f"SELECT {colunas} FROM estados ORDER BY ordem"
+            )
+            return {linha['ie']: dict(linha) for linha in cursor}
+
+    def carregar_payload(self, ie: str) -> Tuple[List[str], Dict]:
+        with self._lock:
+            linha = self.conexao.execute(
+                "SELECT arquivos_baixados, dados_sessao FROM estados WHERE ie = ?", (ie,)
+            ).fetchone()
+        if linha is None:
+            return [], {}
+        return (json.loads(linha['arquivos_baixados']) if linha['arquivos_baixados'] else [],
+                json.loads(linha['dados_sessao']) if linha['dados_sessao'] else {})
+
+    def _upsert(self, registros: Iterable[Dict]):
+        colunas = ', '.join(self.COLUNAS)
+        marcadores = ', '.join('?' * len(self.COLUNAS))
+        # Payload ausente no registro (NULL) preserva o valor já gravado
+        atualizacoes = ', '.join(
+            f"{c} = COALESCE(excluded.{c}, estados.{c})" if c in self.COLUNAS_JSON else f"{c} = excluded.{c}"
+            for c in self.COLUNAS if c != 'ie'
+        )
+        self.conexao.executemany(
+            f"INSERT INTO estados ({colunas}, ordem) VALUES ({marcadores}, "
+            f"(SELECT COALESCE(MAX(ordem), 0) + 1 FROM estados)) "
+            f"ON CONFLICT (ie) DO UPDATE SET {atualizacoes}",
+            [self._para_linha(registro) for registro in registros]
+        )
+
+    def registrar(self, registros: List[Dict]):
+        if not registros:
+            return
+        with self._lock, self.conexao:
+            self._upsert(registros)
+
+    def salvar_tudo(self, registros: Dict[str, Dict]):
+        with self._lock, self.conexao:
+            self._upsert(registros.values())
+
+    def limpar(self):
+        with self._lock, self.conexao:
+            self.conexao.execute("DELETE FROM estados")
+
+    def fechar(self):
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
+
+    def consultar_checkpoints_antigos(self, checkpoint_maximo: str) -> List[str]:
+        with self._lock:
+            cursor = self.conexao.execute(
+                "SELECT ie FROM estados WHERE status IN ('concluido', 'erro') "
+                "AND checkpoint_time IS NOT NULL AND checkpoint_time < ?",
+                (checkpoint_maximo,)
+            )
+            return [linha['ie'] for linha in cursor]
+
+
+BACKENDS_ESTADO = {
+    'json': ArmazenamentoJSON,
+    'sqlite': ArmazenamentoSQLite,
+}
+
+
+def criar_armazenamento(tipo: str = 'json', **kwargs) -> ArmazenamentoEstado:
+    """Instancia o backend de estado pelo nome configurado"""
+    try:
+        return BACKENDS_ESTADO[tipo](**kwargs)
+    except KeyError:
+        raise ValueError(f"Backend de estado desconhecido: {tipo} (opções: {', '.join(BACKENDS_ESTADO)})")
+
+
+def criar_armazenamento_arquivo(arquivo_estado: Path, tipo: str = 'json',
+                                limite_journal: int = 1000) -> ArmazenamentoEstado:
+    """Instancia o backend para um arquivo de estado (`.db` ao lado no caso do SQLite)"""
+    arquivo_estado = Path(arquivo_estado)
+    if tipo == 'sqlite':
+        return criar_armazenamento('sqlite', arquivo_banco=str(arquivo_estado.with_suffix('.db')))
+    return criar_armazenamento(tipo, arquivo_estado=str(arquivo_estado), limite_journal=limite_journal)
+
+
+def detectar_tipo_armazenamento(diretorio: Path) -> str:
+    return 'sqlite' if any(Path(diretorio).glob('*.db')) else 'json'
+
+
+class ParticaoPeriodo:
+    """Partição do estado para um período (data_inicio, data_fim).
+
+    Partições abertas ficam em `estado/periodos/<AAAAMMDD_AAAAMMDD>/`.
+    Quando todas as IEs estão finalizadas a partição é selada: o estado
+    completo vai para `estado/arquivados/<id>.json.gz` e o diretório é
+    removido, de modo que só períodos abertos são carregados na partida.
+    """
+
+    DIRETORIO_ABERTAS = "periodos"
+    DIRETORIO_SELADAS = "arquivados"
+    ID_LEGADO = "legado"
+
+    def __init__(self, diretorio_estado: Path, data_inicio: Optional[str], data_fim: Optional[str],
+                 id_periodo: str = None):
+        self.diretorio_estado = Path(diretorio_estado)
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self.id = id_periodo or self.gerar_id(data_inicio, data_fim)
+        self.diretorio = self.diretorio_estado / self.DIRETORIO_ABERTAS / self.id
+        self.arquivo_selado = self.diretorio_estado / self.DIRETORIO_SELADAS / f"{self.id}.json.gz"
+
+    @staticmethod
+    def gerar_id(data_inicio: str, data_fim: str) -> str:
+        inicio = datetime.strptime(data_inicio, "%d/%m/%Y")
+        fim = datetime.strptime(data_fim, "%d/%m/%Y")
+        return f"{inicio:%Y%m%d}_{fim:%Y%m%d}"
+
+    @classmethod
+    def de_diretorio(cls, diretorio: Path) -> 'ParticaoPeriodo':
+        diretorio = Path(diretorio)
+        diretorio_estado = diretorio.parent.parent
+        try:
+            inicio, fim = (datetime.strptime(parte, "%Y%m%d") for parte in diretorio.name.split('_'))
+            return cls(diretorio_estado, f"{inicio:%d/%m/%Y}", f"{fim:%d/%m/%Y}")
+        except ValueError:
+            return cls(diretorio_estado, None, None, id_periodo=diretorio.name)
+
+    @classmethod
+    def listar_abertas(cls, diretorio_estado: Path) -> List['ParticaoPeriodo']:
+        raiz = Path(diretorio_estado) / cls.DIRETORIO_ABERTAS
+        if not raiz.exists():
+            return []
+        return [cls.de_diretorio(diretorio) for diretorio in sorted(raiz.iterdir()) if diretorio.is_dir()]
+
+    def esta_selada(self) -> bool:
+        return self.arquivo_selado.exists() and not self.diretorio.exists()
+
+    def migrar_estado_legado(self, arquivo_estado: Path):
+        """Move o estado não particionado (anterior às partições) para `periodos/legado`"""
+        arquivo_estado = Path(arquivo_estado)
+        legados = [
+            arquivo for arquivo in arquivo_estado.parent.glob(f"{arquivo_estado.stem}.*")
+            if arquivo.is_file()
+        ]
+        if not legados:
+            return
+
+        destino = self.diretorio_estado / self.DIRETORIO_ABERTAS / self.ID_LEGADO
+        destino.mkdir(parents=True, exist_ok=True)
+        for arquivo in legados:
+            os.replace(arquivo, destino / arquivo.name)
+        logger.info(f"Estado não particionado movido para {destino}")
+
+    def reabrir(self, nome_arquivo: str, tipo: str, limite_journal: int = 1000) -> bool:
+        """Restaura uma partição selada para nova execução do mesmo período"""
+        if not self.esta_selada():
+            return False
+
+        with gzip.open(self.arquivo_selado, 'rt', encoding='utf-8') as f:
+            conteudo = json.load(f)
+
+        armazenamento = criar_armazenamento_arquivo(self.diretorio / nome_arquivo, tipo, limite_journal)
+        try:
+            armazenamento.salvar_tudo(conteudo['estados'])
+        finally:
+            armazenamento.fechar()
+
+        self.arquivo_selado.unlink()
+        logger.info(f"Partição {self.id} reaberta ({len(conteudo['estados'])} empresas)")
+        return True
+
+    def selar(self, registros: Dict[str, Dict]):
+        """Grava a partição comprimida (atômico) e remove o diretório aberto"""
+        self.arquivo_selado.parent.mkdir(parents=True, exist_ok=True)
+        conteudo = {
+            'id': self.id,
+            'data_inicio': self.data_inicio,
+            'data_fim': self.data_fim,
+            'selado_em': datetime.now().isoformat(),
+            'estados': registros
+        }
+
+        temporario = self.arquivo_selado.with_suffix('.tmp')
+        with gzip.open(temporario, 'wt', encoding='utf-8') as f:
+            json.dump(conteudo, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temporario, self.arquivo_selado)
+
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+        logger.info(f"Partição {self.id} selada em {self.arquivo_selado} ({len(registros)} empresas)")
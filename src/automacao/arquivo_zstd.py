@@ -0,0 +1,249 @@
+"""
+Arquivamento mensal dos XML em contêiner zstd com dicionário treinado e índice por chave
+"""
+import os
+import re
+import json
+import time
+import struct
+import hashlib
+import logging
+import threading
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard as zstd
+except ImportError:  # zstandard é opcional: só o arquivamento depende dele
+    zstd = None
+
+logger = logging.getLogger(__name__)
+
+NOME_ARQUIVO = "notas.nfez"
+MAGICA = b'NFEZ'
+VERSAO = 1
+CABECALHO = struct.Struct('<4sBI')      # mágica, versão, tamanho do dicionário
+RODAPE = struct.Struct('<QI4s')         # offset do índice, tamanho do índice, mágica
+TAMANHO_DICIONARIO = 112 * 1024
+MAX_AMOSTRAS = 2000
+MIN_AMOSTRAS = 20
+NIVEL_PADRAO = 9
+
+# Só a chave (e o tipo do evento) vão para o índice: expressões sobre os bytes bastam, sem parser
+PADRAO_CHAVE_NFE = re.compile(rb'<infNFe[^>]*\sId="NFe(\d{44})"')
+PADRAO_CHAVE_EVENTO = re.compile(rb'<chNFe>(\d{44})</chNFe>')
+PADRAO_TIPO_EVENTO = re.compile(rb'<tpEvento>(\d+)</tpEvento>')
+
+
+@dataclass
+class ResultadoEmpacotamento:
+    arquivo: Path
+    documentos: int = 0
+    bytes_xml: int = 0
+    bytes_zip: int = 0
+    bytes_arquivo: int = 0
+    zips: int = 0
+    duracao: float = 0.0
+
+
+def disponivel() -> bool:
+    return zstd is not None
+
+
+class LeitorArquivoZstd:
+    """Acesso aleatório a um `.nfez`: cada XML é um frame zstd independente.
+
+    O índice no fim do arquivo leva a chave (NFe e eventos), o pacote e o
+    membro de origem de cada XML ao offset do seu frame; ler um documento é
+    um seek e a descompressão de um único frame com o dicionário do arquivo.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._arquivo = open(self.caminho, 'rb')
+        self._lock = threading.Lock()
+        self.entradas = self._ler_indice()
+        self._por_chave: Dict[str, List[Dict]] = {}
+        for entrada in self.entradas:
+            if entrada['chave']:
+                self._por_chave.setdefault(entrada['chave'], []).append(entrada)
+
+    def _ler_indice(self) -> List[Dict]:
+        magica, versao, tamanho_dicionario = CABECALHO.unpack(self._arquivo.read(CABECALHO.size))
+        if magica != MAGICA or versao != VERSAO:
+            raise ValueError(f"{self.caminho.name} não é um arquivo NFEZ v{VERSAO}")
+        dicionario = self._arquivo.read(tamanho_dicionario)
+        self._descompressor = zstd.ZstdDecompressor(
+            dict_data=zstd.ZstdCompressionDict(dicionario) if dicionario else None
+        )
+
+        self._arquivo.seek(-RODAPE.size, os.SEEK_END)
+        offset_indice, tamanho_indice, magica = RODAPE.unpack(self._arquivo.read(RODAPE.size))
+        if magica != MAGICA:
+            raise ValueError(f"{self.caminho.name}: rodapé inválido (arquivo truncado?)")
+        self._arquivo.seek(offset_indice)
+        return json.loads(zstd.ZstdDecompressor().decompress(self._arquivo.read(tamanho_indice)))
+
+    def chaves(self) -> List[str]:
+        return list(self._por_chave)
+
+    def ler_entrada(self, entrada: Dict) -> bytes:
+        with self._lock:
+            self._arquivo.seek(entrada['offset'])
+            frame = self._arquivo.read(entrada['tamanho'])
+        return self._descompressor.decompress(frame, max_output_size=entrada['original'])
+
+    def ler(self, chave: str) -> List[bytes]:
+        """XML da NFe e dos seus eventos"""
+        return [self.ler_entrada(entrada) for entrada in self._por_chave.get(chave, [])]
+
+    def fechar(self):
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+def _membros_zip(caminho: Path) -> Iterator[Tuple[str, str, bytes]]:
+    with zipfile.ZipFile(caminho) as pacote:
+        for info in pacote.infolist():
+            if not info.is_dir():
+                yield caminho.name, info.filename, pacote.read(info)
+
+
+def _membros_pasta(pasta: Path, zips: List[Path], anterior: Optional[Path]) -> Iterator[Tuple[str, str, bytes]]:
+    """XML do arquivo já existente (reempacotamento incremental) seguidos dos ZIPs da pasta"""
+    if anterior is not None:
+        with LeitorArquivoZstd(anterior) as leitor:
+            for entrada in leitor.entradas:
+                yield entrada['pacote'], entrada['membro'], leitor.ler_entrada(entrada)
+    for caminho in zips:
+        yield from _membros_zip(caminho)
+
+
+def _identificar(conteudo: bytes) -> Dict[str, str]:
+    nfe = PADRAO_CHAVE_NFE.search(conteudo)
+    if nfe:
+        return {'chave': nfe.group(1).decode(), 'tipo_evento': ""}
+    evento, tipo = PADRAO_CHAVE_EVENTO.search(conteudo), PADRAO_TIPO_EVENTO.search(conteudo)
+    if evento and b'<infEvento' in conteudo:
+        return {'chave': evento.group(1).decode(), 'tipo_evento': tipo.group(1).decode() if tipo else ""}
+    return {'chave': "", 'tipo_evento': ""}
+
+
+def _treinar_dicionario(amostras: List[bytes]) -> bytes:
+    if len(amostras) < MIN_AMOSTRAS:
+        return b''
+    try:
+        return zstd.train_dictionary(TAMANHO_DICIONARIO, amostras).as_bytes()
+    except zstd.ZstdError as e:
+        logger.debug(f"Dicionário não treinado ({len(amostras)} amostras): {e}")
+        return b''
+
+
+def empacotar_pasta(pasta, nivel: int = NIVEL_PADRAO, remover_zips: bool = False) -> Optional[ResultadoEmpacotamento]:
+    """Reempacota os ZIPs de uma pasta empresa/ano/mês num único `notas.nfez`.
+
+    Duas passadas pelos ZIPs: a primeira colhe amostras para treinar o
+    dicionário, a segunda comprime cada XML num frame próprio. XML idênticos
+    (períodos sobrepostos) são gravados uma vez e referenciados por todas as
+    entradas do índice. Os ZIPs só são removidos (`remover_zips`) depois de
+    todo o arquivo novo ser relido e conferido pelo SHA-256.
+    """
+    if zstd is None:
+        raise RuntimeError("Arquivamento zstd requer: pip install zstandard")
+
+    pasta = Path(pasta)
+    zips = sorted(pasta.glob('*.zip'))
+    destino = pasta / NOME_ARQUIVO
+    anterior = destino if destino.exists() else None
+    if not zips:
+        return None
+
+    inicio = time.time()
+    resultado = ResultadoEmpacotamento(destino, zips=len(zips), bytes_zip=sum(z.stat().st_size for z in zips))
+
+    amostras = []
+    for _, _, conteudo in _membros_pasta(pasta, zips, anterior):
+        amostras.append(conteudo)
+        if len(amostras) >= MAX_AMOSTRAS:
+            break
+    dicionario = _treinar_dicionario(amostras)
+    del amostras
+
+    compressor = zstd.ZstdCompressor(
+        level=nivel, dict_data=zstd.ZstdCompressionDict(dicionario) if dicionario else None
+    )
+    temporario = destino.with_name(destino.name + '.tmp')
+    entradas: List[Dict] = []
+    frames: Dict[str, Tuple[int, int]] = {}
+    membros_gravados = set()
+
+    with open(temporario, 'wb') as saida:
+        saida.write(CABECALHO.pack(MAGICA, VERSAO, len(dicionario)))
+        saida.write(dicionario)
+
+        for pacote, membro, conteudo in _membros_pasta(pasta, zips, anterior):
+            if (pacote, membro) in membros_gravados:
+                continue
+            membros_gravados.add((pacote, membro))
+            sha256 = hashlib.sha256(conteudo).hexdigest()
+            if sha256 not in frames:
+                frame = compressor.compress(conteudo)
+                frames[sha256] = (saida.tell(), len(frame))
+                saida.write(frame)
+                resultado.bytes_xml += len(conteudo)
+
+            offset, tamanho = frames[sha256]
+            base = {'pacote': pacote, 'membro': membro, 'offset': offset, 'tamanho': tamanho,
+                    'original': len(conteudo), 'sha256': sha256}
+            entradas.append(dict(base, **_identificar(conteudo)))
+            resultado.documentos += 1
+
+        indice = zstd.ZstdCompressor(level=3).compress(json.dumps(entradas).encode('utf-8'))
+        offset_indice = saida.tell()
+        saida.write(indice)
+        saida.write(RODAPE.pack(offset_indice, len(indice), MAGICA))
+
+    _conferir(temporario, entradas)
+    os.replace(temporario, destino)
+    resultado.bytes_arquivo = destino.stat().st_size
+    resultado.duracao = time.time() - inicio
+
+    if remover_zips:
+        for caminho in zips:
+            caminho.unlink()
+
+    logger.info(f"{pasta}: {resultado.documentos} XML de {len(zips)} ZIP(s) -> {NOME_ARQUIVO} "
+                f"({resultado.bytes_zip} -> {resultado.bytes_arquivo} bytes, {resultado.duracao:.1f}s)")
+    return resultado
+
+
+def _conferir(caminho: Path, entradas: List[Dict]):
+    with LeitorArquivoZstd(caminho) as leitor:
+        for entrada in entradas:
+            if hashlib.sha256(leitor.ler_entrada(entrada)).hexdigest() != entrada['sha256']:
+                raise ValueError(f"{caminho.name}: conteúdo divergente em {entrada['pacote']}/{entrada['membro']}")
+
+
+def empacotar_arvore(diretorio, nivel: int = NIVEL_PADRAO, remover_zips: bool = False) -> List[ResultadoEmpacotamento]:
+    """Empacota cada pasta empresa/ano/mês com ZIPs, ignorando diretórios ocultos"""
+    diretorio = Path(diretorio)
+    pastas = sorted({
+        zip_.parent for zip_ in diretorio.rglob('*.zip')
+        if not any(parte.startswith('.') for parte in zip_.relative_to(diretorio).parts)
+    })
+    resultados = []
+    for pasta in pastas:
+        try:
+            resultado = empacotar_pasta(pasta, nivel, remover_zips)
+            if resultado:
+                resultados.append(resultado)
+        except Exception as e:
+            logger.error(f"Erro ao empacotar {pasta}: {e}")
+    return resultados
@@ -0,0 +1,197 @@
+"""
+Catálogo local (SQLite) das NFe e eventos baixados, indexado pela chave de acesso
+"""
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .armazem_xml import ARQUIVO_MANIFESTO, calcular_sha256, carregar_manifesto
+from .pos_processamento import ResultadoPosProcessamento, processar_zip
+
+logger = logging.getLogger(__name__)
+
+ARQUIVO_CATALOGO = "estado/catalogo_nfe.db"
+DIRETORIO_PACOTES = Path.home() / "Downloads" / "SEFAZ"
+
+
+class CatalogoNFe:
+    """Uma linha por documento (NFe ou evento) com a localização no ZIP de origem.
+
+    O catálogo cresce conforme os pacotes chegam (alimentado pelo
+    pós-processamento); cada ZIP é identificado pelo SHA-256 do conteúdo,
+    então o mesmo pacote baixado de novo ou reindexado não é relido. Um
+    documento repetido em outro pacote só atualiza a localização.
+    """
+
+    COLUNAS = [
+        'chave', 'tipo_evento', 'seq_evento', 'tipo', 'cnpj_emitente', 'ie_destinatario', 'dh_emi',
+        'mes', 'v_nf', 'descricao_evento', 'ie', 'arquivo', 'membro', 'offset', 'pacote'
+    ]
+
+    def __init__(self, arquivo_banco: str = ARQUIVO_CATALOGO):
+        self.arquivo_banco = Path(arquivo_banco)
+        self._lock = threading.RLock()
+        self._conexao: Optional[sqlite3.Connection] = None
+
+    @property
+    def conexao(self) -> sqlite3.Connection:
+        if self._conexao is None:
+            self.arquivo_banco.parent.mkdir(parents=True, exist_ok=True)
+            self._conexao = sqlite3.connect(str(self.arquivo_banco), check_same_thread=False)
+            self._conexao.row_factory = sqlite3.Row
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("PRAGMA synchronous=NORMAL")
+            self._criar_esquema()
+        return self._conexao
+
+    def _criar_esquema(self):
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS pacotes (
+                sha256 TEXT PRIMARY KEY,
+                arquivo TEXT NOT NULL,
+                ie TEXT,
+                documentos INTEGER NOT NULL DEFAULT 0,
+                indexado_em TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS documentos (
+                chave TEXT NOT NULL,
+                tipo_evento TEXT NOT NULL DEFAULT '',
+                seq_evento INTEGER NOT NULL DEFAULT 0,
+                tipo TEXT NOT NULL,
+                cnpj_emitente TEXT,
+                ie_destinatario TEXT,
+                dh_emi TEXT,
+                mes TEXT,
+                v_nf REAL,
+                descricao_evento TEXT,
+                ie TEXT,
+                arquivo TEXT NOT NULL,
+                membro TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                pacote TEXT NOT NULL,
+                PRIMARY KEY (chave, tipo_evento, seq_evento)
+            );
+            CREATE INDEX IF NOT EXISTS idx_documentos_destinatario_mes
+                ON documentos (ie_destinatario, mes);
+            CREATE INDEX IF NOT EXISTS idx_documentos_ie_mes
+                ON documentos (ie, mes);
+            CREATE INDEX IF NOT EXISTS idx_documentos_mes
+                ON documentos (mes);
+        """)
+
+    def catalogado(self, sha256: str) -> bool:
+        with self._lock:
+            return self.conexao.execute(
+                "SELECT 1 FROM pacotes WHERE sha256 = ?", (sha256,)
+            ).fetchone() is not None
+
+    def _para_linhas(self, resultado: ResultadoPosProcessamento) -> List[tuple]:
+        linhas = []
+        for nota in resultado.notas:
+            if not nota.chave:
+                continue
+            linha = dict(
+                vars(nota), tipo_evento=nota.tipo_evento or '', seq_evento=nota.seq_evento or 0,
+                mes=(nota.dh_emi or '')[:7] or None,
+                ie=resultado.ie, arquivo=resultado.arquivo, pacote=resultado.sha256
+            )
+            linhas.append(tuple(linha[coluna] for coluna in self.COLUNAS))
+        return linhas
+
+    def indexar(self, resultado: ResultadoPosProcessamento) -> int:
+        """Grava os documentos de um pacote numa transação; retorna quantos"""
+        if not resultado.sha256:
+            return 0
+        linhas = self._para_linhas(resultado)
+        colunas = ', '.join(self.COLUNAS)
+        marcadores = ', '.join('?' * len(self.COLUNAS))
+
+        with self._lock, self.conexao:
+            self.conexao.executemany(
+                f"INSERT OR REPLACE INTO documentos ({colunas}) VALUES ({marcadores})", linhas
+            )
+            if not resultado.integro:
+                # Pacote com membros corrompidos não fica marcado: a próxima reindexação relê
+                return len(linhas)
+            self.conexao.execute(
+                "INSERT OR REPLACE INTO pacotes (sha256, arquivo, ie, documentos, indexado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (resultado.sha256, resultado.arquivo, resultado.ie, len(linhas), datetime.now().isoformat())
+            )
+        return len(linhas)
+
+    def reindexar(self, diretorio: Path = DIRETORIO_PACOTES, processos: int = 2) -> int:
+        """Percorre a árvore de ZIPs e indexa só os pacotes com conteúdo ainda não catalogado"""
+        novos: Dict[str, str] = {}
+        for arquivo, sha256 in self._listar_pacotes(Path(diretorio)):
+            try:
+                sha256 = sha256 or calcular_sha256(arquivo)
+            except OSError as e:
+                logger.warning(f"Pacote ilegível ignorado: {arquivo}: {e}")
+                continue
+            if sha256 not in novos and not self.catalogado(sha256):
+                novos[sha256] = str(arquivo)
+
+        logger.info(f"Catálogo: {len(novos)} pacote(s) novo(s) em {diretorio}")
+        documentos = 0
+        if not novos:
+            return documentos
+
+        with ProcessPoolExecutor(max(1, processos)) as executor:
+            futuros = [executor.submit(processar_zip, arquivo, "", None, sha256)
+                       for sha256, arquivo in novos.items()]
+            for futuro in futuros:
+                documentos += self.indexar(futuro.result())
+        return documentos
+
+    @staticmethod
+    def _listar_pacotes(diretorio: Path) -> Iterable[Tuple[Path, Optional[str]]]:
+        """ZIPs da árvore e pacotes registrados em manifestos do armazém (com o hash já conhecido)"""
+        # Diretórios ocultos (.staging, .workers, .objetos) não são pastas de empresa
+        def visivel(caminho: Path) -> bool:
+            return not any(parte.startswith('.') for parte in caminho.relative_to(diretorio).parts)
+
+        for arquivo in sorted(diretorio.rglob('*.zip')):
+            if visivel(arquivo):
+                yield arquivo, None
+        for manifesto in sorted(diretorio.rglob(ARQUIVO_MANIFESTO)):
+            if visivel(manifesto):
+                for nome, entrada in carregar_manifesto(manifesto.parent).items():
+                    yield manifesto.parent / nome, entrada.get('sha256')
+
+    def buscar_chave(self, chave: str) -> List[Dict]:
+        """A NFe e seus eventos (cada correção com seu nSeqEvento)"""
+        with self._lock:
+            cursor = self.conexao.execute(
+                "SELECT * FROM documentos WHERE chave = ? ORDER BY tipo_evento, seq_evento", (chave,)
+            )
+            return [dict(linha) for linha in cursor]
+
+    def buscar_por_ie(self, ie: str, mes: Optional[str] = None) -> List[Dict]:
+        """Documentos do pacote da IE ou destinados a ela; `mes` no formato AAAA-MM"""
+        filtro_mes = " AND mes = ?" if mes else ""
+        parametros = (ie, mes) if mes else (ie,)
+        with self._lock:
+            cursor = self.conexao.execute(
+                f"SELECT * FROM documentos WHERE ie_destinatario = ?{filtro_mes} "
+                f"UNION SELECT * FROM documentos WHERE ie = ?{filtro_mes} ORDER BY dh_emi",
+                parametros * 2
+            )
+            return [dict(linha) for linha in cursor]
+
+    def buscar_por_mes(self, mes: str) -> List[Dict]:
+        with self._lock:
+            cursor = self.conexao.execute(
+                "SELECT * FROM documentos WHERE mes = ? ORDER BY dh_emi", (mes,)
+            )
+            return [dict(linha) for linha in cursor]
+
+    def fechar(self):
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
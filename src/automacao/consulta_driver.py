@@ -0,0 +1,235 @@
+"""
+Consultas agrupadas ao navegador: várias perguntas por ida ao WebDriver
+"""
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from selenium.webdriver.common.by import By
+
+from .iframe_manager import GerenciadorIframe
+
+logger = logging.getLogger(__name__)
+
+IFRAME_PADRAO = "iNetaccess"
+VALIDADE_CACHE = 0.5            # segundos; só leituras do iframe, que o portal recarrega e altera
+TEXTOS_ERRO = [
+    "erro", "error", "inválido", "incorreto", "falha",
+    "timeout", "expirou", "não encontrado", "acesso negado"
+]
+
+# Comandos do protocolo que só leem estado: não abrem uma nova época de navegação
+COMANDOS_LEITURA = {
+    'getCurrentUrl', 'getTitle', 'getPageSource', 'findElement', 'findElements',
+    'findChildElement', 'findChildElements', 'getElementText', 'getElementTagName',
+    'getElementAttribute', 'getElementProperty', 'getElementValueOfCssProperty',
+    'getElementRect', 'isElementSelected', 'isElementEnabled', 'isElementDisplayed',
+    'w3cGetCurrentWindowHandle', 'w3cGetWindowHandles', 'w3cGetActiveElement',
+    'getCookies', 'getCookie', 'getLog', 'getAvailableLogTypes', 'getWindowRect', 'screenshot',
+}
+COMANDOS_FRAME = {'switchToFrame', 'switchToParentFrame'}
+
+# Campos de formulário por id: presença, visibilidade, habilitação e valor
+FUNCAO_CAMPOS = """
+function visivel(e) { return !!(e.offsetWidth || e.offsetHeight || e.getClientRects().length); }
+function lerCampos(doc, ids) {
+    var campos = {};
+    ids.forEach(function (id) {
+        var e = doc.getElementById(id);
+        campos[id] = e ? {
+            presente: true, visivel: visivel(e), habilitado: !e.disabled,
+            selecionado: !!(e.checked || e.selected), valor: e.value === undefined ? null : e.value
+        } : {presente: false};
+    });
+    return campos;
+}
+"""
+SCRIPT_CAMPOS = FUNCAO_CAMPOS + "return lerCampos(document, arguments[0]);"
+SCRIPT_PAGINA = "return [location.href, document.title];"
+SCRIPT_FRAME = FUNCAO_CAMPOS + (
+    "return {cabecalho: !!document.querySelector('title, h1'), campos: lerCampos(document, arguments[0])};"
+)
+
+# Estado da página e do iframe numa chamada; o conteúdo do iframe só é lido aqui se for de mesma origem
+SCRIPT_ESTADO = FUNCAO_CAMPOS + """
+var ids = arguments[0], idIframe = arguments[1], textosErro = arguments[2];
+var estado = {
+    url: location.href, titulo: document.title, pronto: document.readyState,
+    erro_visivel: null, corpo: !!document.body, formulario: !!document.querySelector('form'),
+    iframe: null
+};
+var html = document.documentElement.outerHTML.toLowerCase();
+textosErro.some(function (texto) {
+    if (html.indexOf(texto) < 0) return false;
+    var nos = document.evaluate("//*[contains(text(), '" + texto + "')]", document, null,
+                                XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var i = 0; i < nos.snapshotLength; i++) {
+        var no = nos.snapshotItem(i);
+        var cor = getComputedStyle(no).color || '', classe = (no.getAttribute('class') || '').toLowerCase();
+        if (cor.indexOf('red') >= 0 || classe.indexOf('error') >= 0) {
+            estado.erro_visivel = (no.textContent || '').slice(0, 100);
+            return true;
+        }
+    }
+    return false;
+});
+var iframe = document.getElementById(idIframe);
+if (iframe) {
+    var doc = null;
+    try { doc = iframe.contentDocument; } catch (e) {}
+    estado.iframe = {
+        elemento: iframe,
+        visivel: visivel(iframe),
+        mesma_origem: !!doc,
+        cabecalho: doc ? !!doc.querySelector('title, h1') : null,
+        campos: doc ? lerCampos(doc, ids) : null
+    };
+}
+return estado;
+"""
+
+
+class ConsultaDriver:
+    """Fachada de leitura sobre o driver e contador de idas ao WebDriver.
+
+    `estado()` responde numa única chamada URL, título, readyState, erros
+    visíveis, presença do iframe e os campos pedidos dentro dele; `campos()`
+    faz o mesmo para o documento atual. Os resultados valem por época de
+    navegação: qualquer comando que não seja de leitura (clique, get,
+    digitação, script, troca de aba) abre uma época nova e descarta o cache.
+    O iframe de consulta é recarregado e alterado pelo próprio portal, sem
+    passar pelo driver: leituras que incluem o conteúdo dele também expiram
+    após `validade` segundos. As do documento principal valem a época toda.
+    Todos os comandos passam pelo contador, que é somado por IE em
+    `contar_ie` para comparar o custo de cada consulta.
+    """
+
+    def __init__(self, driver, iframe: str = IFRAME_PADRAO, validade: float = VALIDADE_CACHE):
+        self.driver = driver
+        self.iframe = iframe
+        self.validade = validade
+        self.epoca = 0
+        self.idas = 0
+        self.idas_por_ie: Dict[str, int] = {}
+        self.consultas = {'respondidas_cache': 0, 'executadas': 0}
+        self.gerenciador_iframe = GerenciadorIframe(driver)
+        self._interno = False
+        self._cache: Dict[Tuple, Tuple[Optional[float], Dict]] = {}
+        self._instalar_contador()
+
+    def _instalar_contador(self):
+        executar = self.driver.execute
+
+        def executar_contando(comando, parametros=None):
+            self._registrar_comando(comando, parametros)
+            return executar(comando, parametros)
+
+        self.driver.execute = executar_contando
+
+    def _registrar_comando(self, comando: str, parametros: Optional[Dict]):
+        self.idas += 1
+        # Trocas de frame não mudam o documento: não abrem época (o cache de campos é por frame)
+        if comando in COMANDOS_LEITURA or comando in COMANDOS_FRAME or self._interno:
+            return
+        self.nova_epoca()
+
+    def nova_epoca(self):
+        self.epoca += 1
+        self._cache.clear()
+
+    def _em_cache(self, chave: Tuple) -> Optional[Dict]:
+        item = self._cache.get(chave)
+        if item is None:
+            return None
+        if item[0] is not None and time.monotonic() - item[0] >= self.validade:
+            del self._cache[chave]
+            return None
+        self.consultas['respondidas_cache'] += 1
+        return item[1]
+
+    def _guardar(self, chave: Tuple, resultado: Dict, expira: bool) -> Dict:
+        """`expira`: o resultado inclui o conteúdo do iframe e vale só `validade` segundos"""
+        self._cache[chave] = (time.monotonic() if expira else None, resultado)
+        return resultado
+
+    @contextmanager
+    def _sem_nova_epoca(self):
+        self._interno = True
+        try:
+            yield
+        finally:
+            self._interno = False
+
+    def estado(self, ids: Iterable[str] = (), atualizar: bool = False) -> Dict:
+        """Estado da página principal e dos campos `ids` no iframe (cache da época atual)"""
+        ids = tuple(ids)
+        chave = ('estado', ids)
+        if not atualizar:
+            em_cache = self._em_cache(chave)
+            if em_cache is not None:
+                return em_cache
+
+        self.consultas['executadas'] += 1
+        if self.gerenciador_iframe.rastreador.em_frame:
+            # Dentro de um frame o documento não é o da página: só o que o protocolo responde direto
+            pagina = {'url': self.driver.current_url, 'titulo': self.driver.title}
+            return self._guardar(chave, pagina, expira=False)
+
+        with self._sem_nova_epoca():
+            estado = self.driver.execute_script(SCRIPT_ESTADO, list(ids), self.iframe, TEXTOS_ERRO)
+            iframe = estado.get('iframe')
+            if iframe and not iframe['mesma_origem'] and iframe['visivel']:
+                # Iframe de outra origem: uma entrada no frame responde cabeçalho e campos juntos
+                with self.gerenciador_iframe.contexto_iframe((By.ID, self.iframe)):
+                    iframe.update(self.driver.execute_script(SCRIPT_FRAME, list(ids)))
+        return self._guardar(chave, estado, expira=iframe is not None)
+
+    def pagina(self) -> Dict:
+        """URL e título da página principal: do estado em cache, senão numa única chamada"""
+        for chave in [chave for chave in self._cache if chave[0] in ('estado', 'pagina')]:
+            em_cache = self._em_cache(chave)
+            if em_cache is not None:
+                return {'url': em_cache['url'], 'titulo': em_cache['titulo']}
+
+        self.consultas['executadas'] += 1
+        if self.gerenciador_iframe.rastreador.em_frame:
+            url, titulo = self.driver.current_url, self.driver.title
+        else:
+            with self._sem_nova_epoca():
+                url, titulo = self.driver.execute_script(SCRIPT_PAGINA)
+        return self._guardar(('pagina',), {'url': url, 'titulo': titulo}, expira=False)
+
+    def campos(self, ids: Iterable[str], atualizar: bool = False) -> Dict[str, Dict]:
+        """Presença, visibilidade, habilitação e valor dos campos no documento atual"""
+        ids = tuple(ids)
+        rastreador = self.gerenciador_iframe.rastreador
+        chave = ('campos', rastreador.frame if rastreador.em_frame else None, ids)
+        if not atualizar:
+            em_cache = self._em_cache(chave)
+            if em_cache is not None:
+                return em_cache
+
+        self.consultas['executadas'] += 1
+        with self._sem_nova_epoca():
+            campos = self.driver.execute_script(SCRIPT_CAMPOS, list(ids))
+        return self._guardar(chave, campos, expira=chave[1] is not None)
+
+    @contextmanager
+    def contar_ie(self, ie: str):
+        """Soma à IE as idas ao WebDriver feitas dentro do bloco"""
+        inicio = self.idas
+        try:
+            yield
+        finally:
+            self.idas_por_ie[ie] = self.idas_por_ie.get(ie, 0) + self.idas - inicio
+
+    def resumo(self) -> Dict:
+        por_ie = list(self.idas_por_ie.values())
+        return {
+            'idas': self.idas,
+            'ies': len(por_ie),
+            'media_por_ie': sum(por_ie) / len(por_ie) if por_ie else 0,
+            'max_por_ie': max(por_ie) if por_ie else 0,
+            **self.consultas,
+        }
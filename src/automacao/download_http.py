@@ -0,0 +1,210 @@
+"""
+Download direto dos pacotes do histórico via HTTP, com os cookies da sessão do navegador
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+from urllib.parse import unquote, urlparse
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.cookies import RequestsCookieJar
+except ImportError:  # requests vem com o webdriver-manager; sem ele o download segue pelo navegador
+    requests = None
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO = 256 * 1024
+SUFIXO_PARCIAL = '.part'
+SUFIXO_NOME = '.nome'           # nome dado pelo servidor, ao lado do .part, para a retomada
+ESPERA_RETOMADA = 1.0           # segundos antes da 2ª tentativa; dobra a cada nova falha
+ESPERA_RETOMADA_MAXIMA = 15.0
+
+
+@dataclass
+class ArquivoBaixado:
+    nome: str
+    caminho: Path
+    tamanho: int
+    sha256: str
+    retomado: bool = False
+
+
+class GerenciadorDownloadHttp:
+    """Baixa os ZIPs do histórico direto do servidor, sem passar pelo Chrome.
+
+    A sessão `requests` recebe os cookies do driver e mantém um pool de
+    conexões keep-alive do tamanho do paralelismo. Cada arquivo é gravado em
+    streaming num `.part` com SHA-256 calculado durante a escrita; uma falha
+    no meio retoma do byte já gravado com `Range`, e o arquivo só recebe o
+    nome final (os.replace) quando completo. O nome do Content-Disposition
+    fica gravado ao lado do `.part`: uma retomada que recebe 416 (nada mais
+    a baixar) não tem cabeçalho de onde tirá-lo.
+    """
+
+    def __init__(self, paralelismo: int = 4, tentativas: int = 3, timeout: float = 60):
+        self.paralelismo = max(1, paralelismo)
+        self.tentativas = tentativas
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.sessao = self._criar_sessao() if requests is not None else None
+
+    @staticmethod
+    def disponivel() -> bool:
+        return requests is not None
+
+    def _criar_sessao(self):
+        sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.paralelismo)
+        sessao.mount('http://', adaptador)
+        sessao.mount('https://', adaptador)
+        return sessao
+
+    def copiar_sessao_navegador(self, driver) -> int:
+        """Copia cookies e user agent do driver para a sessão HTTP; retorna quantos cookies.
+
+        O pote de cookies é montado à parte e trocado de uma vez: downloads de
+        outras abas em andamento nunca veem a sessão sem cookies.
+        """
+        try:
+            cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get('cookies', [])
+        except Exception:
+            cookies = driver.get_cookies()
+
+        pote = RequestsCookieJar()
+        for cookie in cookies:
+            pote.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain', ''), path=cookie.get('path', '/'),
+                secure=cookie.get('secure', False)
+            )
+        self.sessao.cookies = pote
+
+        try:
+            self.sessao.headers['User-Agent'] = driver.execute_script("return navigator.userAgent")
+        except Exception:
+            pass
+        return len(cookies)
+
+    def agendar(self, urls: Iterable[str], diretorio: str) -> List[Future]:
+        """Inicia os downloads em segundo plano, no pool compartilhado; um Future por URL"""
+        destino = Path(diretorio)
+        destino.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.paralelismo, thread_name_prefix="download_http")
+            return [self._executor.submit(self._baixar_com_retomada, url, destino) for url in urls]
+
+    @staticmethod
+    def coletar(futuros: List[Future]) -> List[ArquivoBaixado]:
+        """Aguarda os downloads agendados; falhas individuais são registradas e omitidas"""
+        baixados = []
+        for futuro in futuros:
+            try:
+                baixados.append(futuro.result())
+            except Exception as e:
+                logger.error(f"Falha no download direto: {e}")
+        return baixados
+
+    def baixar(self, urls: Iterable[str], diretorio: str) -> List[ArquivoBaixado]:
+        return self.coletar(self.agendar(urls, diretorio))
+
+    def _baixar_com_retomada(self, url: str, destino: Path) -> ArquivoBaixado:
+        ultimo_erro = None
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                return self._baixar_arquivo(url, destino)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                ultimo_erro = e
+                if tentativa == self.tentativas:
+                    break
+                espera = min(ESPERA_RETOMADA_MAXIMA, ESPERA_RETOMADA * 2 ** (tentativa - 1))
+                logger.warning(f"Download interrompido ({tentativa}/{self.tentativas}), "
+                               f"retomando em {espera:.0f}s: {e}")
+                time.sleep(espera)
+        raise ultimo_erro
+
+    def _baixar_arquivo(self, url: str, destino: Path) -> ArquivoBaixado:
+        parcial = destino / (self._nome_provisorio(url) + SUFIXO_PARCIAL)
+        arquivo_nome = parcial.with_suffix(SUFIXO_NOME)
+        hash_arquivo = hashlib.sha256()
+        inicio = parcial.stat().st_size if parcial.exists() else 0
+
+        cabecalhos = {'Range': f'bytes={inicio}-'} if inicio else {}
+        with self.sessao.get(url, headers=cabecalhos, stream=True, timeout=self.timeout) as resposta:
+            if resposta.status_code == 416 and inicio:
+                # .part já completo numa execução anterior
+                resposta.close()
+                return self._concluir(parcial, self._nome_salvo(arquivo_nome, url), destino, True)
+
+            resposta.raise_for_status()
+            nome = self._nome_arquivo(url, resposta.headers.get('Content-Disposition'))
+            arquivo_nome.write_text(nome, encoding='utf-8')
+            retomado = inicio > 0 and resposta.status_code == 206
+            if retomado:
+                with open(parcial, 'rb') as f:
+                    for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+                        hash_arquivo.update(bloco)
+
+            with open(parcial, 'ab' if retomado else 'wb') as f:
+                for bloco in resposta.iter_content(TAMANHO_BLOCO):
+                    f.write(bloco)
+                    hash_arquivo.update(bloco)
+
+        return self._concluir(parcial, nome, destino, retomado, hash_arquivo.hexdigest())
+
+    def _concluir(self, parcial: Path, nome: str, destino: Path, retomado: bool,
+                  sha256: Optional[str] = None) -> ArquivoBaixado:
+        if sha256 is None:
+            hash_arquivo = hashlib.sha256()
+            with open(parcial, 'rb') as f:
+                for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+                    hash_arquivo.update(bloco)
+            sha256 = hash_arquivo.hexdigest()
+
+        caminho = destino / nome
+        tamanho = parcial.stat().st_size
+        os.replace(parcial, caminho)
+        parcial.with_suffix(SUFIXO_NOME).unlink(missing_ok=True)
+        logger.debug(f"Baixado {nome} ({tamanho} bytes, sha256 {sha256[:12]})")
+        return ArquivoBaixado(nome, caminho, tamanho, sha256, retomado)
+
+    @staticmethod
+    def _nome_provisorio(url: str) -> str:
+        # Estável entre tentativas e execuções, para a retomada encontrar o .part
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _nome_salvo(arquivo_nome: Path, url: str) -> str:
+        try:
+            nome = arquivo_nome.read_text(encoding='utf-8').strip()
+        except OSError:
+            nome = ""
+        return nome or GerenciadorDownloadHttp._nome_arquivo(url, None)
+
+    @staticmethod
+    def _nome_arquivo(url: str, content_disposition: Optional[str]) -> str:
+        if content_disposition:
+            encontrado = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', content_disposition, re.I)
+            if encontrado:
+                return os.path.basename(unquote(encontrado.group(1)))
+
+        nome = os.path.basename(unquote(urlparse(url).path)) or GerenciadorDownloadHttp._nome_provisorio(url)
+        return nome if nome.lower().endswith('.zip') else f"{nome}.zip"
+
+    def encerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.sessao is not None:
+            self.sessao.close()
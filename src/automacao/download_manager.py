@@ -1,9 +1,13 @@
 import re
 import os
 import time
+import errno
+import shutil
 import logging
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, Generator, List, Optional, Tuple
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -11,16 +15,42 @@ from selenium.webdriver.support import expected_conditions as EC
 
 from .retry_manager import gerenciador_retry
 from .iframe_manager import GerenciadorIframe
+from .monitor_downloads import MonitorDownloads
+from .download_http import GerenciadorDownloadHttp
+from .historico_downloads import ColetorHistorico, EntradaHistorico
+from .poller_historico import PollerHistorico
+from .pos_processamento import GerenciadorPosProcessamento
+from .armazem_xml import ArmazemXML
+from .registro_seletores import registro_seletores
 from ..utils.data_models import ResultadoDownload
 from .timeout_manager import TipoOperacao
 
 logger = logging.getLogger(__name__)
 
+# Mesmo sistema de arquivos das pastas das empresas: a movimentação final é um os.replace atômico
+DIRETORIO_STAGING = Path.home() / "Downloads" / "SEFAZ" / ".staging"
+
 
 class GerenciadorDownload:
     
-    def __init__(self, driver: WebDriver):
+    def __init__(self, driver: WebDriver, diretorio_downloads: Optional[str] = None,
+                 prazo_download: float = 60, monitorar_cdp: bool = False,
+                 diretorio_staging: Optional[str] = None,
+                 downloader_http: Optional[GerenciadorDownloadHttp] = None,
+                 periodo: Optional[Tuple[str, str]] = None, gerenciador_estado=None,
+                 pos_processador: Optional[GerenciadorPosProcessamento] = None,
+                 armazem: Optional[ArmazemXML] = None):
         self.driver = driver
+        self.diretorio_downloads = Path(diretorio_downloads) if diretorio_downloads else Path.home() / "Downloads"
+        self.diretorio_staging = Path(diretorio_staging) if diretorio_staging else DIRETORIO_STAGING
+        self.prazo_download = prazo_download
+        self.downloader_http = downloader_http
+        self.gerenciador_estado = gerenciador_estado
+        self.pos_processador = pos_processador
+        self.armazem = armazem
+        self.coletor_historico = ColetorHistorico(driver, periodo)
+        self.poller = PollerHistorico()
+        self.monitor = MonitorDownloads(self.diretorio_downloads, driver, usar_cdp=monitorar_cdp)
         self.wait = WebDriverWait(driver, 15)
         self.gerenciador_iframe = GerenciadorIframe(driver)
         self.estatisticas_erros = {}
@@ -60,47 +90,88 @@ class GerenciadorDownload:
         
         return str(pasta_destino)
     
+    def preparar_diretorio_ie(self, nome_empresa: str) -> Path:
+        """Direciona os downloads do navegador para um staging vazio e exclusivo desta IE"""
+        nome_limpo = re.sub(r'[<>:"/\\|?*]', '_', nome_empresa.strip())
+        staging = self.diretorio_staging / nome_limpo
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True, exist_ok=True)
+        
+        if self._definir_diretorio_navegador(staging):
+            self.monitor.diretorio = staging
+        else:
+            self.monitor.diretorio = self.diretorio_downloads
+        return self.monitor.diretorio
+    
+    def _definir_diretorio_navegador(self, diretorio: Path) -> bool:
+        parametros = {'behavior': 'allow', 'downloadPath': str(diretorio.resolve())}
+        comandos = [
+            ("Browser.setDownloadBehavior", dict(parametros, eventsEnabled=self.monitor.usar_cdp)),
+            ("Page.setDownloadBehavior", parametros),
+        ]
+        for comando, params in comandos:
+            try:
+                self.driver.execute_cdp_cmd(comando, params)
+                return True
+            except Exception as e:
+                logger.debug(f"{comando} indisponível: {e}")
+        
+        logger.warning("Diretório de download por IE indisponível; usando o diretório padrão do navegador")
+        return False
+    
+    def _limpar_staging(self):
+        if self.monitor.diretorio != self.diretorio_downloads:
+            shutil.rmtree(self.monitor.diretorio, ignore_errors=True)
+    
+    def _mover_arquivo(self, arquivo: Path, destino: Path):
+        try:
+            os.replace(arquivo, destino)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Staging em outro sistema de arquivos (diretório configurado): cópia + remoção
+            shutil.move(str(arquivo), str(destino))
+    
+    def _guardar_arquivo(self, arquivo: Path, pasta_destino: str, sha256: Optional[str] = None) -> bool:
+        """Leva o ZIP à pasta da empresa, ou, em modo armazém, seus XML ao armazém"""
+        if self.armazem is None:
+            self._mover_arquivo(arquivo, Path(pasta_destino) / arquivo.name)
+            return True
+        try:
+            self.armazem.guardar_zip(arquivo, pasta_destino, sha256)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao armazenar {arquivo.name}: {e}")
+            return False
+    
+    def contar_notas_tabela(self) -> int:
+        """Linhas da tabela de resultados: estimativa do tamanho do pacote a solicitar"""
+        try:
+            with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
+                return self.driver.execute_script(
+                    "return document.querySelectorAll('table tr.tbody-row, table tbody tr').length;"
+                ) or 0
+        except Exception:
+            return 0
+    
     def tem_notas_tabela(self) -> bool:
         """Verifica rapidamente se existe pelo menos uma nota na tabela"""
         try:
             with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
-                seletores_rapidos = [
-                    "//table//tr[contains(@class, 'tbody-row')]",
-                    "//table//tr[position()>1]",
-                    "//tbody/tr"
-                ]
-                
-                for seletor in seletores_rapidos:
-                    try:
-                        if self.driver.find_elements(By.XPATH, seletor):
-                            return True
-                    except:
-                        continue
-                return False
+                return registro_seletores.encontrar(self.driver, 'linhas_tabela_notas') is not None
         except Exception:
             return False
     
     def _clicar_botao_baixar_xml(self) -> bool:
         def tentar_clicar_botao():
             with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
-                seletores_botao = [
-                    (By.XPATH, "//button[contains(text(), 'Baixar XML')]"),
-                    (By.XPATH, "//a[contains(text(), 'Baixar XML')]"),
-                    (By.ID, "btnBaixarXml"),
-                    (By.XPATH, "//button[contains(@onclick, 'baixar')]"),
-                    (By.XPATH, "//button[contains(@class, 'btn') and contains(text(), 'Baixar')]")
-                ]
-                
-                for seletor in seletores_botao:
-                    try:
-                        botao = self.driver.find_element(*seletor)
-                        if botao.is_displayed() and botao.is_enabled():
-                            self.driver.execute_script("arguments[0].click();", botao)
-                            return True
-                    except:
-                        continue
-                
-                return False
+                botao = registro_seletores.encontrar(
+                    self.driver, 'botao_baixar_xml', lambda elemento: elemento.is_displayed() and elemento.is_enabled()
+                )
+                if botao is None:
+                    return False
+                self.driver.execute_script("arguments[0].click();", botao)
+                return True
         
         return gerenciador_retry.executar_com_retry(
             tentar_clicar_botao, max_tentativas=3, nome_operacao="Clicar Botão Baixar XML"
@@ -113,31 +184,23 @@ class GerenciadorDownload:
                 timeout_modal = self._obter_timeout_operacao(TipoOperacao.MODAL)
                 wait_modal = WebDriverWait(self.driver, timeout_modal)
                 
-                iframe = self.driver.find_element(By.ID, "iNetaccess")
-                self.driver.switch_to.frame(iframe)
-                
-                wait_modal.until( 
-                    EC.visibility_of_element_located((By.XPATH, "//*[contains(text(), 'Confirme a solicitação')]"))
-                )
-                
-                opcao = self.driver.find_element(
-                    By.XPATH, "//label[contains(text(), 'Baixar documentos e eventos')]"
-                )
-                self.driver.execute_script("arguments[0].click();", opcao)
-                
-                botao_confirmar = self.driver.find_element(By.ID, "dnwld-all-btn-ok")
-                self.driver.execute_script("arguments[0].click();", botao_confirmar)
-                
-                self.driver.switch_to.default_content()
-                time.sleep(3)
+                with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
+                    wait_modal.until(
+                        EC.visibility_of_element_located((By.XPATH, "//*[contains(text(), 'Confirme a solicitação')]"))
+                    )
+
+                    opcao = self.driver.find_element(
+                        By.XPATH, "//label[contains(text(), 'Baixar documentos e eventos')]"
+                    )
+                    self.driver.execute_script("arguments[0].click();", opcao)
+
+                    botao_confirmar = self.driver.find_element(By.ID, "dnwld-all-btn-ok")
+                    self.driver.execute_script("arguments[0].click();", botao_confirmar)
+
                 return True
                 
             except Exception as e:
                 logger.error(f"Erro na modal: {e}")
-                try:
-                    self.driver.switch_to.default_content()
-                except:
-                    pass
                 return False
         
         return gerenciador_retry.executar_com_retry(
@@ -147,47 +210,188 @@ class GerenciadorDownload:
             nome_operacao="Processar Modal Download"
         )
     
-    def _processar_historico_downloads(self) -> bool:
-        """Processa links do histórico de downloads"""
-        def tentar_processar_historico():
-            try:
-                iframe = self.driver.find_element(By.ID, "iNetaccess")
-                self.driver.switch_to.frame(iframe)
-                
-                links_download = self.driver.find_elements(By.CSS_SELECTOR, "a.btn.btn-info")
-                
-                downloads_realizados = 0
-                for link in links_download[:1]: 
-                    try:
-                        if "Baixar XML" in link.text:
-                            self.driver.execute_script("arguments[0].click();", link)
-                            downloads_realizados += 1
-                            time.sleep(2)
-                            break 
-                    except Exception as e:
-                        logger.error(f"Erro ao clicar link: {e}")
-                        continue
-                
-                self.driver.switch_to.default_content()
-                return downloads_realizados > 0
-                
-            except Exception as e:
-                logger.error(f"Erro no histórico: {e}")
-                try:
-                    self.driver.switch_to.default_content()
-                except:
-                    pass
-                return False
+    def _aceitar_ie(self, ie: str) -> Optional[str]:
+        """Nome da empresa se o pacote de outra IE pode ser colhido agora (pendente no lote)"""
+        if self.gerenciador_estado is None:
+            return None
+        return self.gerenciador_estado.nome_se_pendente(ie)
+    
+    def _selecionar_pacotes(self, ie_atual: str) -> Dict[str, List[EntradaHistorico]]:
+        entradas = self.coletor_historico.ler_entradas()
+        grupos = self.coletor_historico.selecionar(entradas, ie_atual, self._aceitar_ie)
+        logger.debug(f"Histórico: {len(entradas)} entrada(s), {sum(map(len, grupos.values()))} pronta(s) para baixar")
+        return grupos
+    
+    def _colher_historico(self, ie_atual: str, nome_empresa: str, mes_referencia: datetime,
+                          agendador=None) -> Generator[float, None, ResultadoDownload]:
+        """Baixa numa passada todos os pacotes prontos do histórico, cedendo os segundos de cada espera.
         
-        return gerenciador_retry.executar_com_retry(
-            tentar_processar_historico,
-            max_tentativas=2,
-            delay=2,
-            nome_operacao="Processar Histórico"
+        O histórico é relido quando o poller indica (latência aprendida, depois
+        backoff) até o pacote da IE atual ficar pronto ou o prazo de download esgotar.
+        """
+        if ie_atual not in self.poller.pendentes:
+            self.poller.registrar(ie_atual)
+        
+        limite = time.time() + self.prazo_download
+        primeira_leitura = True
+        while True:
+            yield min(self.poller.espera([ie_atual]), max(0.0, limite - time.time()))
+            if not primeira_leitura:
+                # Sem recarregar, o iframe continua mostrando o histórico da leitura anterior
+                self.coletor_historico.atualizar()
+            primeira_leitura = False
+            grupos = self._selecionar_pacotes(ie_atual)
+            if ie_atual in grupos or time.time() >= limite:
+                break
+            # Pacote da IE atual ainda não pronto: libera os demais e relê na próxima janela
+            for entradas in grupos.values():
+                self.coletor_historico.concluir(entradas, baixadas=False)
+            self.poller.processar_leitura([], lidas=[ie_atual])
+        
+        self.poller.processar_leitura(grupos, lidas=[])
+        self.poller.descartar(ie_atual)
+        self.poller.salvar()
+        
+        arquivos = yield from self._baixar_grupos(grupos, mes_referencia, agendador, {ie_atual: nome_empresa})
+        self._registrar_colheitas(arquivos, exceto=ie_atual)
+        
+        baixados = arquivos.get(ie_atual, [])
+        return ResultadoDownload(
+            total_encontrado=len(grupos.get(ie_atual, [])) or 1, total_baixado=len(baixados),
+            erros=[] if baixados else ["Nenhum pacote pronto no histórico"],
+            notas_baixadas=baixados, caminho_download=self.criar_estrutura_pastas(nome_empresa, mes_referencia)
         )
     
-    def executar_fluxo_download_completo(self, nome_empresa: str, mes_referencia: datetime = None) -> ResultadoDownload:
-        tem_notas = self.tem_notas_tabela() > 0
+    def _baixar_grupos(self, grupos: Dict[str, List[EntradaHistorico]], mes_referencia: datetime,
+                       agendador=None, nomes: Optional[Dict[str, str]] = None
+                       ) -> Generator[float, None, Dict[str, List[str]]]:
+        """Baixa as entradas selecionadas, cada IE na pasta da sua empresa; retorna os arquivos por IE"""
+        nomes = {ie: (nomes or {}).get(ie) or self._aceitar_ie(ie) or ie for ie in grupos}
+        pastas = {ie: self.criar_estrutura_pastas(nomes[ie], mes_referencia) for ie in grupos}
+        arquivos: Dict[str, List[str]] = {ie: [] for ie in grupos}
+        
+        try:
+            direto = self.downloader_http is not None and all(
+                entrada.link for entradas in grupos.values() for entrada in entradas
+            )
+            if direto and grupos:
+                # Download direto não usa o navegador: a aba é liberada assim que os links são lidos
+                self.downloader_http.copiar_sessao_navegador(self.driver)
+                futuros = {ie: self.downloader_http.agendar([e.link for e in grupos[ie]], pastas[ie]) for ie in grupos}
+                logger.info(f"Download direto de {sum(map(len, futuros.values()))} pacote(s)")
+                # Sem agendador a coleta abaixo bloqueia nos próprios Futures
+                while agendador and not all(f.done() for lista in futuros.values() for f in lista):
+                    yield agendador.espera('download')
+                for ie, lista in futuros.items():
+                    arquivos[ie] = self._validar_baixados_http(lista)
+            else:
+                for ie, entradas in grupos.items():
+                    arquivos[ie] = yield from self._baixar_pelo_navegador(entradas, nomes[ie], pastas[ie], agendador)
+        finally:
+            for ie, entradas in grupos.items():
+                self.coletor_historico.concluir(entradas, baixadas=bool(arquivos.get(ie)))
+        
+        if self.pos_processador is not None:
+            for ie, nomes_arquivos in arquivos.items():
+                for nome in nomes_arquivos:
+                    self.pos_processador.enfileirar(Path(pastas[ie]) / nome, ie)
+        return arquivos
+    
+    def _registrar_colheitas(self, arquivos: Dict[str, List[str]], exceto: Optional[str] = None) -> List[str]:
+        colhidas = []
+        for ie, nomes_arquivos in arquivos.items():
+            if ie != exceto and nomes_arquivos and self.gerenciador_estado is not None:
+                logger.info(f"Pacote da IE {ie} colhido: {len(nomes_arquivos)} arquivo(s)")
+                self.gerenciador_estado.registrar_colheita(ie, nomes_arquivos)
+                colhidas.append(ie)
+        return colhidas
+    
+    def solicitar_pacote(self, ie: str) -> bool:
+        """Pipeline, fase 1: pede a geração do pacote ao servidor sem esperar por ele"""
+        total_notas = self.contar_notas_tabela()
+        if self._clicar_botao_baixar_xml() and self._processar_modal_download():
+            self.poller.registrar(ie, total_notas)
+            return True
+        return False
+    
+    def colher_prontos(self, mes_referencia: datetime) -> List[str]:
+        """Uma passada sem espera pelo histórico exibido: baixa o que já estiver pronto do lote"""
+        grupos = self.coletor_historico.selecionar(self.coletor_historico.ler_entradas(), None, self._aceitar_ie)
+        self.poller.processar_leitura(grupos)
+        if not grupos:
+            return []
+        return self._registrar_colheitas(self._executar_etapas(self._baixar_grupos(grupos, mes_referencia)))
+    
+    def aguardar_solicitacoes(self, mes_referencia: datetime, prazo: float) -> int:
+        """Pipeline, fase 2: relê o histórico quando alguma solicitação vence, até não restar pendente"""
+        limite = time.time() + prazo
+        colhidas = len(self.colher_prontos(mes_referencia))
+        try:
+            while self.poller.pendentes and time.time() < limite:
+                espera = min(self.poller.espera(), max(0.0, limite - time.time()))
+                logger.info(f"Aguardando {len(self.poller.pendentes)} pacote(s) em geração; "
+                            f"próxima leitura em {espera:.0f}s")
+                time.sleep(espera)
+                self.coletor_historico.atualizar()
+                colhidas += len(self.colher_prontos(mes_referencia))
+        finally:
+            for ie in self.poller.pendentes:
+                self.poller.descartar(ie)
+            self.poller.salvar()
+        return colhidas
+    
+    def _baixar_pelo_navegador(self, entradas: List[EntradaHistorico], nome_empresa: str, pasta_destino: str,
+                               agendador=None) -> Generator[float, None, List[str]]:
+        # Abas compartilham a pasta de download do navegador: um histórico por vez
+        while agendador and not agendador.reservar_downloads():
+            yield agendador.espera('reserva')
+        
+        try:
+            # O diretório de download é do navegador inteiro: só muda com a reserva em mãos
+            self.preparar_diretorio_ie(nome_empresa)
+            self.monitor.iniciar()
+            if not self.coletor_historico.clicar_entradas(entradas):
+                self.monitor.parar()
+                self._limpar_staging()
+                return []
+            
+            if not agendador:
+                return self.organizar_arquivos_baixados(pasta_destino, esperados=len(entradas))
+            
+            # A aba cede até o prazo; o agendador a acorda antes quando o monitor sinaliza a conclusão
+            agendador.vigiar_downloads(self.monitor, len(entradas))
+            limite = time.time() + self.prazo_download
+            while not self.monitor.concluido(len(entradas)) and time.time() < limite:
+                yield max(0.0, limite - time.time())
+            
+            return self.organizar_arquivos_baixados(pasta_destino, prazo=0, esperados=len(entradas))
+        finally:
+            if agendador:
+                agendador.liberar_downloads()
+    
+    def _validar_baixados_http(self, futuros: List[Future]) -> List[str]:
+        arquivos_baixados = []
+        for arquivo in GerenciadorDownloadHttp.coletar(futuros):
+            if not self._validar_arquivo_download(arquivo.caminho):
+                logger.warning(f"Pacote inválido descartado: {arquivo.nome}")
+                arquivo.caminho.unlink()
+            elif self._guardar_arquivo(arquivo.caminho, str(arquivo.caminho.parent), arquivo.sha256):
+                arquivos_baixados.append(arquivo.nome)
+        return arquivos_baixados
+    
+    @staticmethod
+    def _executar_etapas(fluxo: Generator[float, None, ResultadoDownload]) -> ResultadoDownload:
+        """Modo sequencial: executa o fluxo em etapas dormindo em cada espera"""
+        try:
+            while True:
+                time.sleep(next(fluxo))
+        except StopIteration as fim:
+            return fim.value
+    
+    def executar_fluxo_download_completo(self, nome_empresa: str, mes_referencia: datetime = None,
+                                         ie: str = "") -> ResultadoDownload:
+        total_notas = self.contar_notas_tabela()
+        tem_notas = total_notas > 0 or self.tem_notas_tabela()
         
         if not tem_notas:
             return ResultadoDownload(
@@ -195,53 +399,53 @@ class GerenciadorDownload:
                 notas_baixadas=[], caminho_download=""
             )
         
-        pasta_destino = self.criar_estrutura_pastas(nome_empresa, mes_referencia)
-        
         try:
-            if (self._clicar_botao_baixar_xml() and 
-                self._processar_modal_download() and 
-                self._processar_historico_downloads()):
-                
-                arquivos_baixados = self.organizar_arquivos_baixados(pasta_destino)
-                
-                return ResultadoDownload(
-                    total_encontrado=1 if tem_notas else 0,
-                    total_baixado=len(arquivos_baixados),
-                    erros=[], notas_baixadas=arquivos_baixados, caminho_download=pasta_destino
-                )
-            else:
-                return ResultadoDownload(
-                    total_encontrado=1 if tem_notas else 0, total_baixado=0,
-                    erros=["Falha no fluxo"], notas_baixadas=[], caminho_download=pasta_destino
-                )
+            if self._clicar_botao_baixar_xml() and self._processar_modal_download():
+                self.poller.registrar(ie, total_notas)
+                return self._executar_etapas(self._colher_historico(ie, nome_empresa, mes_referencia))
+            
+            return ResultadoDownload(
+                total_encontrado=1 if tem_notas else 0, total_baixado=0,
+                erros=["Falha no fluxo"], notas_baixadas=[],
+                caminho_download=self.criar_estrutura_pastas(nome_empresa, mes_referencia)
+            )
         except Exception as e:
             return ResultadoDownload(
                 total_encontrado=1 if tem_notas else 0, total_baixado=0,
-                erros=[f"Erro: {str(e)}"], notas_baixadas=[], caminho_destination=pasta_destino
+                erros=[f"Erro: {str(e)}"], notas_baixadas=[], caminho_download=""
             )
     
+    def executar_fluxo_download_em_etapas(self, nome_empresa: str, mes_referencia: datetime,
+                                          agendador, ie: str = "") -> Generator[float, None, ResultadoDownload]:
+        """Mesmo fluxo do download completo, cedendo a aba ao agendador nas esperas do servidor"""
+        total_notas = self.contar_notas_tabela()
+        if not (self._clicar_botao_baixar_xml() and self._processar_modal_download()):
+            return ResultadoDownload(
+                total_encontrado=1, total_baixado=0, erros=["Falha no fluxo"], notas_baixadas=[],
+                caminho_download=self.criar_estrutura_pastas(nome_empresa, mes_referencia)
+            )
+        self.poller.registrar(ie, total_notas)
+        
+        return (yield from self._colher_historico(ie, nome_empresa, mes_referencia, agendador))
+    
     def processar_download_unico(self, ie: str, mes_referencia: datetime = None) -> ResultadoDownload:
         """Mantido para compatibilidade - usa fluxo completo"""
         return self.executar_fluxo_download_completo(ie, mes_referencia)
     
-    def organizar_arquivos_baixados(self, pasta_destino: str) -> int:
+    def organizar_arquivos_baixados(self, pasta_destino: str, prazo: Optional[float] = None,
+                                    esperados: int = 1) -> List[str]:
+        """Aguarda a conclusão dos downloads (até o prazo) e move os .zip novos para a pasta"""
         arquivos_movidos = []
         
         try:
-            downloads_dir = Path.home() / "Downloads"
-            time.sleep(8)
+            novos = self.monitor.aguardar(self.prazo_download if prazo is None else prazo, esperados)
             
-            for arquivo in downloads_dir.glob("*.zip"):
+            for arquivo in novos:
                 if not self._validar_arquivo_download(arquivo):
                     continue
                     
-                caminho_destino = Path(pasta_destino) / arquivo.name
-                
-                if caminho_destino.exists():
-                    caminho_destino.unlink() 
-                
-                arquivo.rename(caminho_destino)
-                arquivos_movidos.append(arquivo.name)
+                if self._guardar_arquivo(arquivo, pasta_destino):
+                    arquivos_movidos.append(arquivo.name)
                     
             logger.info(f"Organizados {len(arquivos_movidos)} arquivo(s) em {pasta_destino}")
             return arquivos_movidos
@@ -249,6 +453,8 @@ class GerenciadorDownload:
         except Exception as e:
             logger.error(f"Erro ao organizar arquivos: {e}")
             return arquivos_movidos
+        finally:
+            self._limpar_staging()
 
     def _validar_arquivo_download(self, arquivo: Path) -> bool:
         """Valida se o arquivo é um download válido do SEFAZ - abordagem simples"""
@@ -2,19 +2,44 @@
 Gerenciador de WebDriver simplificado e robusto.
 """
 import os
+import re
+import sys
+import json
+import time
+import shutil
+import socket
 import logging
-from typing import Optional
+import subprocess
+from typing import Dict, Optional
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 
 logger = logging.getLogger(__name__)
 
+ARQUIVO_CACHE_DRIVER = "estado/cache_driver.json"
+
+CAMINHOS_CHROME = [
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    os.path.expandvars(r"%LOCALAPPDATA%\Google\Chrome\Application\chrome.exe"),
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+
 
 class GerenciadorDriver:
     
-    def __init__(self):
+    def __init__(self, diretorio_download: Optional[str] = None, perfil_chrome: Optional[str] = None,
+                 endereco_depuracao: Optional[str] = None, cache_driver: bool = True,
+                 log_performance: bool = False):
         self.driver: Optional[webdriver.Chrome] = None
+        self.diretorio_download = diretorio_download
+        self.perfil_chrome = perfil_chrome
+        self.endereco_depuracao = endereco_depuracao
+        self.cache_driver = cache_driver
+        self.log_performance = log_performance
+        self.anexado = False
+        self.tempos_inicializacao: Dict[str, float] = {}
         self._configurar_logging_limpo()
     
     def _configurar_logging_limpo(self):
@@ -38,53 +63,183 @@ class GerenciadorDriver:
     
     def configurar_driver(self) -> Optional[webdriver.Chrome]:
         logger.info("Configurando WebDriver...")
+        inicio = time.perf_counter()
+        self.tempos_inicializacao = {}
         
-        # Prioridade: WebDriver Manager (sempre atualizado)
+        # Prioridade: WebDriver Manager (sempre atualizado), resolvido via cache por versão do Chrome
         estrategias = [
             self._configurar_webdriver_manager,
             self._configurar_driver_sistema,
         ]
+        if self.endereco_depuracao:
+            estrategias.insert(0, self._anexar_chrome_existente)
         
         for estrategia in estrategias:
             driver = estrategia()
             if driver:
                 self.driver = driver
                 self._aplicar_config_stealth()
-                logger.info("WebDriver configurado com sucesso")
+                self.tempos_inicializacao['total'] = time.perf_counter() - inicio
+                logger.info(f"WebDriver configurado com sucesso ({self._descrever_tempos()})")
                 return driver
         
         self._mostrar_erro_driver()
         return None
     
+    def _descrever_tempos(self) -> str:
+        return ", ".join(f"{etapa}: {tempo:.2f}s" for etapa, tempo in self.tempos_inicializacao.items())
+    
+    def _iniciar_chrome(self, options, service: Optional[Service] = None) -> webdriver.Chrome:
+        inicio = time.perf_counter()
+        if service:
+            driver = webdriver.Chrome(service=service, options=options)
+        else:
+            driver = webdriver.Chrome(options=options)
+        self.tempos_inicializacao['inicio_chrome'] = time.perf_counter() - inicio
+        return driver
+    
     def _configurar_webdriver_manager(self) -> Optional[webdriver.Chrome]:
         """Configura via WebDriver Manager - SEMPRE ATUALIZADO"""
         try:
-            import warnings
-            warnings.filterwarnings("ignore", category=UserWarning)
-            
-            from webdriver_manager.chrome import ChromeDriverManager
-            from webdriver_manager.core.os_manager import ChromeType
-            
-            # Configuração silenciosa
-            service = Service(
-                ChromeDriverManager(chrome_type=ChromeType.GOOGLE).install()
-            )
+            caminho_driver = self._resolver_chromedriver()
+            service = Service(caminho_driver)
             
             options = self._obter_opcoes_chrome()
-            driver = webdriver.Chrome(service=service, options=options)
-            
-            return driver
+            return self._iniciar_chrome(options, service)
             
         except Exception as e:
             logger.debug(f"WebDriver Manager: {e}")
             return None
     
+    def _resolver_chromedriver(self) -> str:
+        """Caminho do chromedriver: cache por versão do Chrome, senão WebDriver Manager"""
+        inicio = time.perf_counter()
+        versao_chrome = self._obter_versao_chrome() if self.cache_driver else None
+        
+        if versao_chrome:
+            caminho = self._ler_cache_driver().get(versao_chrome)
+            if caminho and os.path.isfile(caminho):
+                self.tempos_inicializacao['resolucao_driver'] = time.perf_counter() - inicio
+                logger.debug(f"Chromedriver em cache para Chrome {versao_chrome}: {caminho}")
+                return caminho
+        
+        import warnings
+        warnings.filterwarnings("ignore", category=UserWarning)
+        
+        from webdriver_manager.chrome import ChromeDriverManager
+        from webdriver_manager.core.os_manager import ChromeType
+        
+        # Configuração silenciosa
+        caminho = ChromeDriverManager(chrome_type=ChromeType.GOOGLE).install()
+        
+        if versao_chrome:
+            self._gravar_cache_driver(versao_chrome, caminho)
+        self.tempos_inicializacao['resolucao_driver'] = time.perf_counter() - inicio
+        return caminho
+    
+    def _ler_cache_driver(self) -> Dict[str, str]:
+        try:
+            with open(ARQUIVO_CACHE_DRIVER, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _gravar_cache_driver(self, versao_chrome: str, caminho: str):
+        try:
+            os.makedirs(os.path.dirname(ARQUIVO_CACHE_DRIVER), exist_ok=True)
+            temporario = f"{ARQUIVO_CACHE_DRIVER}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump({versao_chrome: caminho}, f, indent=2)
+            os.replace(temporario, ARQUIVO_CACHE_DRIVER)
+        except OSError as e:
+            logger.debug(f"Cache do chromedriver não gravado: {e}")
+    
+    def _localizar_chrome(self) -> Optional[str]:
+        for nome in ("google-chrome", "google-chrome-stable", "chrome", "chromium", "chromium-browser"):
+            caminho = shutil.which(nome)
+            if caminho:
+                return caminho
+        return next((caminho for caminho in CAMINHOS_CHROME if os.path.isfile(caminho)), None)
+    
+    def _obter_versao_chrome(self) -> Optional[str]:
+        """Versão do Chrome instalado, sem acesso à rede (registro no Windows, --version nos demais)"""
+        if sys.platform.startswith('win'):
+            try:
+                import winreg
+                chave = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Google\Chrome\BLBeacon")
+                versao, _ = winreg.QueryValueEx(chave, "version")
+                return versao
+            except OSError:
+                return None
+        
+        binario = self._localizar_chrome()
+        if not binario:
+            return None
+        try:
+            saida = subprocess.run([binario, "--version"], capture_output=True, text=True, timeout=10).stdout
+            encontrado = re.search(r"\d+\.\d+\.\d+\.\d+", saida)
+            return encontrado.group(0) if encontrado else None
+        except (OSError, subprocess.SubprocessError):
+            return None
+    
+    def _anexar_chrome_existente(self) -> Optional[webdriver.Chrome]:
+        """Modo attach: conecta via debuggerAddress a um Chrome mantido aberto entre execuções"""
+        try:
+            if not self._porta_depuracao_ativa() and not self._iniciar_chrome_persistente():
+                return None
+            
+            options = Options()
+            options.add_experimental_option("debuggerAddress", self.endereco_depuracao)
+            self._habilitar_log_performance(options)
+            service = Service(self._resolver_chromedriver())
+            driver = self._iniciar_chrome(options, service)
+            self.anexado = True
+            logger.info(f"Anexado ao Chrome em {self.endereco_depuracao}")
+            return driver
+        
+        except Exception as e:
+            logger.warning(f"Não foi possível anexar ao Chrome em {self.endereco_depuracao}: {e}")
+            return None
+    
+    def _porta_depuracao_ativa(self) -> bool:
+        host, _, porta = self.endereco_depuracao.rpartition(':')
+        try:
+            with socket.create_connection((host or "127.0.0.1", int(porta)), timeout=0.5):
+                return True
+        except (OSError, ValueError):
+            return False
+    
+    def _iniciar_chrome_persistente(self) -> bool:
+        """Inicia um Chrome desacoplado com porta de depuração, que sobrevive ao fim da execução"""
+        binario = self._localizar_chrome()
+        if not binario:
+            return False
+        
+        inicio = time.perf_counter()
+        _, _, porta = self.endereco_depuracao.rpartition(':')
+        perfil = os.path.abspath(self.perfil_chrome or "estado/perfil_chrome")
+        argumentos = [binario, f"--remote-debugging-port={porta}", f"--user-data-dir={perfil}",
+                      "--no-first-run", "--no-default-browser-check", "--window-size=1200,800"]
+        
+        opcoes_processo = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+        if sys.platform.startswith('win'):
+            opcoes_processo['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            opcoes_processo['start_new_session'] = True
+        subprocess.Popen(argumentos, **opcoes_processo)
+        
+        for _ in range(50):
+            if self._porta_depuracao_ativa():
+                self.tempos_inicializacao['inicio_chrome_persistente'] = time.perf_counter() - inicio
+                return True
+            time.sleep(0.2)
+        return False
+    
     def _configurar_driver_sistema(self) -> Optional[webdriver.Chrome]:
         """Fallback: Driver do PATH do sistema"""
         try:
             options = self._obter_opcoes_chrome()
-            driver = webdriver.Chrome(options=options)
-            return driver
+            return self._iniciar_chrome(options)
         except Exception as e:
             logger.debug(f"Driver sistema: {e}")
             return None
@@ -101,12 +256,31 @@ class GerenciadorDriver:
         options.add_argument("--disable-blink-features=AutomationControlled")
         options.add_argument("--window-size=1200,800")
         
+        # Perfil persistente: cache HTTP aquecido entre execuções
+        if self.perfil_chrome:
+            options.add_argument(f"--user-data-dir={os.path.abspath(self.perfil_chrome)}")
+        
         # Remover automação detectável
         options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
         options.add_experimental_option('useAutomationExtension', False)
+        self._habilitar_log_performance(options)
+        
+        # Diretório de download próprio (um por worker no modo pool)
+        if self.diretorio_download:
+            os.makedirs(self.diretorio_download, exist_ok=True)
+            options.add_experimental_option("prefs", {
+                "download.default_directory": os.path.abspath(self.diretorio_download),
+                "download.prompt_for_download": False,
+                "download.directory_upgrade": True,
+            })
         
         return options
     
+    def _habilitar_log_performance(self, options: Options):
+        """Expõe os eventos CDP (ex.: Page.downloadProgress) via driver.get_log('performance')"""
+        if self.log_performance:
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    
     def _aplicar_config_stealth(self):
         if self.driver:
             try:
@@ -130,6 +304,16 @@ SOLUÇÕES:
 """
         print(erro_msg)
     
+    def encerrar(self):
+        """Finaliza o driver; no modo attach só desconecta, mantendo o Chrome aberto"""
+        if not self.driver:
+            return
+        if self.anexado:
+            self.driver.service.stop()
+        else:
+            self.driver.quit()
+        self.driver = None
+    
     def fechar(self):
         logger.info("Navegador mantido aberto para inspeção")
         self.driver = None
\ No newline at end of file
@@ -4,12 +4,15 @@ Utilitários para otimização do fluxo SEFAZ
 
 import time
 import logging
+from typing import Optional, Tuple
+from selenium.common.exceptions import JavascriptException, StaleElementReferenceException, TimeoutException
 from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
-from .timeout_manager import TimeoutManager
+from .timeout_manager import TimeoutManager, TipoOperacao
+from .registro_seletores import registro_seletores
     
 logger = logging.getLogger(__name__)
 
@@ -42,6 +45,35 @@ class DetectorMudancas:
         return mudanca, url_atual
 
 
+# Avalia todas as alternativas num único execute_script; a primeira (em ordem de prioridade) presente vence
+SCRIPT_CORRIDA_SELETORES = """
+var seletores = arguments[0];
+function xpath(expressao) {
+    return document.evaluate(expressao, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+function localizar(estrategia, valor) {
+    switch (estrategia) {
+        case 'id': return document.getElementById(valor);
+        case 'xpath': return xpath(valor);
+        case 'css selector': return document.querySelector(valor);
+        case 'name': return document.getElementsByName(valor)[0] || null;
+        case 'class name': return document.getElementsByClassName(valor)[0] || null;
+        case 'tag name': return document.getElementsByTagName(valor)[0] || null;
+        case 'link text': return xpath('//a[normalize-space(.)=' + JSON.stringify(valor) + ']');
+        case 'partial link text': return xpath('//a[contains(., ' + JSON.stringify(valor) + ')]');
+    }
+    return null;
+}
+for (var i = 0; i < seletores.length; i++) {
+    var elemento = null;
+    try { elemento = localizar(seletores[i][0], seletores[i][1]); } catch (e) {}
+    if (elemento) return [i, elemento];
+}
+return null;
+"""
+INTERVALO_CORRIDA = 0.1
+
+
 class GerenciadorWaitInteligente:
     
     def __init__(self, driver: WebDriver, timeout_manager: TimeoutManager):
@@ -51,19 +83,49 @@ class GerenciadorWaitInteligente:
         
     def _atualizar_wait(self):
         """Atualiza wait com timeout atualizado"""
-        timeout = self.timeout_manager.get_timeout('element_wait')
-        self.wait = WebDriverWait(self.driver, timeout)
+        timeout = self.timeout_manager.get_timeout(TipoOperacao.ELEMENTO_WAIT)
+        self.wait = WebDriverWait(
+            self.driver, timeout, poll_frequency=INTERVALO_CORRIDA,
+            ignored_exceptions=(JavascriptException, StaleElementReferenceException)
+        )
     
-    def aguardar_elemento_ou_alternativas(self, *seletores):
+    def aguardar_primeira_alternativa(self, *seletores) -> Optional[Tuple[int, WebElement]]:
+        """Índice e elemento da primeira alternativa presente, sob um único prazo para todas.
+        
+        A cada intervalo, um único execute_script testa todas as alternativas:
+        a espera termina assim que qualquer uma aparece, em vez de esgotar o
+        timeout de cada seletor em sequência. A latência vai para o TimeoutManager.
+        """
         self._atualizar_wait()
-        for seletor in seletores:
-            try:
-                logger.debug(f"Tentando seletor: {seletor}")
-                elemento = self.wait.until(EC.presence_of_element_located(seletor))
-                logger.debug(f"Elemento encontrado com: {seletor}")
-                return elemento
-            except:
-                continue
+        alternativas = [list(seletor) for seletor in seletores]
+        inicio = time.time()
+        try:
+            indice, elemento = self.wait.until(
+                lambda driver: driver.execute_script(SCRIPT_CORRIDA_SELETORES, alternativas)
+            )
+        except TimeoutException:
+            self.timeout_manager.registrar_tempo_operacao(TipoOperacao.ELEMENTO_WAIT, time.time() - inicio, False)
+            return None
+        self.timeout_manager.registrar_tempo_operacao(TipoOperacao.ELEMENTO_WAIT, time.time() - inicio, True)
+        logger.debug(f"Elemento encontrado com: {seletores[indice]} (alternativa {indice + 1}/{len(seletores)})")
+        return indice, elemento
+    
+    def aguardar_alvo(self, alvo: str) -> Optional[WebElement]:
+        """Corrida entre as alternativas do alvo registrado, na ordem do histórico de acertos"""
+        seletores = registro_seletores.ordenar(alvo)
+        inicio = time.time()
+        encontrado = self.aguardar_primeira_alternativa(*seletores)
+        if not encontrado:
+            return None
+        
+        indice, elemento = encontrado
+        registro_seletores.registrar(alvo, seletores[:indice + 1], seletores[indice], time.time() - inicio)
+        return elemento
+    
+    def aguardar_elemento_ou_alternativas(self, *seletores):
+        encontrado = self.aguardar_primeira_alternativa(*seletores)
+        if encontrado:
+            return encontrado[1]
         
         logger.warning("Nenhum seletor principal funcionou, usando fallback...")
         return None
@@ -9,8 +9,9 @@ from selenium.webdriver.support import expected_conditions as EC
 logger = logging.getLogger(__name__)
 
 class HealthCheckDriver:
-    def __init__(self, driver):
+    def __init__(self, driver, consulta_driver=None):
         self.driver = driver
+        self.consulta_driver = consulta_driver
         self.estatisticas = {
             'verificacoes_realizadas': 0,
             'sessoes_recuperadas': 0,
@@ -37,6 +38,9 @@ class HealthCheckDriver:
             'elementos_chave_presentes': False
         }
         
+        if self.consulta_driver is not None:
+            return self._verificar_estado_agrupado(resultados)
+        
         try:
             resultados['sessao_ativa'] = self.verificar_sessao_ativa()
             if not resultados['sessao_ativa']:
@@ -58,6 +62,29 @@ class HealthCheckDriver:
             resultados['sessao_ativa'] = False
             return resultados
     
+    def _verificar_estado_agrupado(self, resultados: Dict[str, bool]) -> Dict[str, bool]:
+        """Mesmas verificações respondidas por uma única consulta ao navegador"""
+        try:
+            estado = self.consulta_driver.estado()
+        except (WebDriverException, NoSuchWindowException) as e:
+            logger.error(f"Sessão do driver inativa: {e}")
+            return resultados
+        except Exception as e:
+            logger.error(f"Erro na verificação de estado: {e}")
+            return resultados
+        
+        iframe = estado.get('iframe') or {}
+        if estado.get('erro_visivel'):
+            logger.warning(f"Erro detectado na página: {estado['erro_visivel']}")
+        
+        resultados['sessao_ativa'] = True
+        resultados['pagina_carregada'] = estado.get('pronto') == "complete"
+        resultados['sem_erros_visiveis'] = not estado.get('erro_visivel')
+        resultados['iframe_acessivel'] = bool(iframe.get('visivel') and iframe.get('cabecalho'))
+        resultados['elementos_chave_presentes'] = bool(iframe and estado.get('corpo') and estado.get('formulario'))
+        self.estatisticas['verificacoes_realizadas'] += 1
+        return resultados
+    
     def _verificar_erros_pagina(self) -> bool:
         """Verifica se há mensagens de erro na página"""
         try:
@@ -0,0 +1,223 @@
+"""
+Leitura do histórico de downloads do portal e seleção dos pacotes prontos
+"""
+import os
+import re
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from .iframe_manager import GerenciadorIframe
+
+logger = logging.getLogger(__name__)
+
+# Todas as linhas das tabelas do histórico numa única ida ao navegador
+SCRIPT_LER_HISTORICO = """
+return Array.from(document.querySelectorAll('table tr')).map((tr, indice) => {
+    const link = Array.from(tr.querySelectorAll('a.btn.btn-info'))
+        .find(a => a.textContent.includes('Baixar XML'));
+    return {
+        indice: indice,
+        celulas: Array.from(tr.querySelectorAll('td')).map(td => td.innerText.trim()),
+        tem_link: !!link,
+        link: link && /^https?:/.test(link.href) ? link.href : null,
+    };
+}).filter(linha => linha.celulas.length);
+"""
+
+SCRIPT_CLICAR_ENTRADAS = """
+const linhas = document.querySelectorAll('table tr');
+let clicados = 0;
+for (const indice of arguments[0]) {
+    const link = Array.from(linhas[indice] ? linhas[indice].querySelectorAll('a.btn.btn-info') : [])
+        .find(a => a.textContent.includes('Baixar XML'));
+    if (link) { link.click(); clicados++; }
+}
+return clicados;
+"""
+
+PADRAO_DATA = re.compile(r'\d{2}/\d{2}/\d{4}')
+PADRAO_DATA_HORA = re.compile(r'\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}(?::\d{2})?')
+PADRAO_IE = re.compile(r'^[\d.\-/]+$')
+# Prefixos de palavra: "processando" é pendente, "Processado" é pronto
+STATUS_PENDENTES = ('processando', 'processamento', 'aguard', 'gerando', 'solicitad', 'pendente')
+STATUS_FALHA = ('erro', 'falh', 'expirad')
+STATUS_CONHECIDOS = STATUS_PENDENTES + STATUS_FALHA + ('processad', 'dispon', 'conclu', 'pronto', 'finaliz')
+
+
+def _padrao_status(prefixos: Tuple[str, ...]) -> 're.Pattern':
+    return re.compile(r'\b(?:' + '|'.join(prefixos) + ')', re.IGNORECASE)
+
+
+PADRAO_NAO_PRONTA = _padrao_status(STATUS_PENDENTES + STATUS_FALHA)
+PADRAO_STATUS = _padrao_status(STATUS_CONHECIDOS)
+
+ARQUIVO_REGISTRO = "estado/historico_baixado.json"
+
+# Registro compartilhado entre workers: entradas já baixadas e em coleta no momento
+_lock_registro = threading.Lock()
+_em_coleta: Set[str] = set()
+
+
+@dataclass
+class EntradaHistorico:
+    indice: int
+    ie: Optional[str] = None
+    periodo: Optional[Tuple[str, str]] = None
+    status: str = ""
+    link: Optional[str] = None
+    gerado_em: Optional[str] = None
+    tem_link: bool = False
+    texto: str = ""
+
+    @property
+    def chave(self) -> str:
+        """Identidade estável entre sessões: campos interpretados, senão o link ou o texto da linha"""
+        if self.ie or self.gerado_em:
+            periodo = "-".join(self.periodo) if self.periodo else ""
+            return f"{self.ie or ''}|{periodo}|{self.gerado_em or ''}"
+        return self.link or self.texto
+
+    @property
+    def pronta(self) -> bool:
+        return self.tem_link and not PADRAO_NAO_PRONTA.search(self.status)
+
+    @classmethod
+    def de_linha(cls, linha: Dict) -> 'EntradaHistorico':
+        """Interpreta as células pelo formato (IE, período, data de geração, status)"""
+        entrada = cls(indice=linha['indice'], link=linha.get('link'), tem_link=linha.get('tem_link', False),
+                      texto="|".join(linha['celulas']))
+        # Início do período quando ele vem em duas células vizinhas ("01/10/2026" | "31/10/2026")
+        inicio_periodo = None
+        for celula in linha['celulas']:
+            digitos = re.sub(r'\D', '', celula)
+            datas = PADRAO_DATA.findall(celula)
+            data_sozinha = len(datas) == 1 and not PADRAO_DATA_HORA.search(celula)
+
+            if entrada.periodo is None and data_sozinha:
+                if inicio_periodo is None:
+                    inicio_periodo = datas[0]
+                else:
+                    entrada.periodo, inicio_periodo = (inicio_periodo, datas[0]), None
+                continue
+            inicio_periodo = None
+
+            # Uma data sozinha ("15/11/2026") também tem só dígitos e barras: não é IE
+            if entrada.ie is None and PADRAO_IE.match(celula) and 8 <= len(digitos) <= 9 and not datas:
+                entrada.ie = digitos
+            elif entrada.periodo is None and len(datas) == 2 and not PADRAO_DATA_HORA.search(celula):
+                entrada.periodo = (datas[0], datas[1])
+            elif entrada.gerado_em is None and PADRAO_DATA_HORA.search(celula):
+                entrada.gerado_em = PADRAO_DATA_HORA.search(celula).group(0)
+            elif not entrada.status and PADRAO_STATUS.search(celula):
+                entrada.status = celula
+        return entrada
+
+
+class ColetorHistorico:
+    """Seleciona, numa passada, todos os pacotes prontos das IEs/período solicitados.
+
+    Entradas já baixadas ficam registradas em `estado/historico_baixado.json`
+    (compartilhado entre execuções e workers) e não são baixadas de novo.
+    """
+
+    def __init__(self, driver, periodo: Optional[Tuple[str, str]] = None,
+                 arquivo_registro: str = ARQUIVO_REGISTRO):
+        self.driver = driver
+        self.periodo = periodo
+        self.arquivo_registro = Path(arquivo_registro)
+        self.gerenciador_iframe = GerenciadorIframe(driver)
+        self._baixadas = self._carregar_registro()
+
+    def _carregar_registro(self) -> Set[str]:
+        try:
+            with open(self.arquivo_registro, 'r', encoding='utf-8') as f:
+                return set(json.load(f))
+        except FileNotFoundError:
+            return set()
+        except Exception as e:
+            logger.warning(f"Registro do histórico ilegível, ignorado: {e}")
+            return set()
+
+    def ler_entradas(self) -> List[EntradaHistorico]:
+        try:
+            with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
+                linhas = self.driver.execute_script(SCRIPT_LER_HISTORICO) or []
+            return [EntradaHistorico.de_linha(linha) for linha in linhas]
+        except Exception as e:
+            logger.error(f"Erro ao ler histórico: {e}")
+            return []
+
+    def selecionar(self, entradas: List[EntradaHistorico], ie_atual: Optional[str],
+                   aceitar_ie: Callable[[str], bool] = lambda ie: False) -> Dict[str, List[EntradaHistorico]]:
+        """Agrupa por IE as entradas prontas e não baixadas; reserva-as para este coletor.
+
+        Linhas sem IE legível são atribuídas à IE atual, só a primeira delas
+        (a solicitação mais recente), como o fluxo de um link fazia; sem IE
+        atual (pipeline) elas são ignoradas. Com período definido, são
+        descartadas as linhas de outro período; período ilegível conta como
+        desconhecido e a linha segue.
+        """
+        grupos: Dict[str, List[EntradaHistorico]] = {}
+        sem_ie_atribuida = False
+
+        with _lock_registro:
+            for entrada in entradas:
+                if not entrada.pronta or entrada.chave in self._baixadas or entrada.chave in _em_coleta:
+                    continue
+                if self.periodo and entrada.periodo and entrada.periodo != tuple(self.periodo):
+                    continue
+
+                ie = entrada.ie
+                if ie is None:
+                    if sem_ie_atribuida or not ie_atual:
+                        continue
+                    ie, sem_ie_atribuida = ie_atual, True
+                elif ie != ie_atual and not aceitar_ie(ie):
+                    continue
+
+                _em_coleta.add(entrada.chave)
+                grupos.setdefault(ie, []).append(entrada)
+
+        return grupos
+
+    def atualizar(self):
+        """Recarrega o documento do iframe para o servidor listar os pacotes recém-gerados"""
+        try:
+            with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
+                # O reload troca o documento do frame, não o elemento iframe: o contexto continua válido
+                self.driver.execute_script("location.reload();")
+                WebDriverWait(self.driver, 15).until(
+                    lambda d: d.execute_script("return document.readyState") == "complete"
+                )
+        except Exception as e:
+            logger.debug(f"Erro ao atualizar histórico: {e}")
+
+    def clicar_entradas(self, entradas: Iterable[EntradaHistorico]) -> int:
+        """Dispara pelo navegador o download das entradas, numa única chamada"""
+        with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
+            return self.driver.execute_script(SCRIPT_CLICAR_ENTRADAS, [e.indice for e in entradas]) or 0
+
+    def concluir(self, entradas: Iterable[EntradaHistorico], baixadas: bool):
+        """Libera a reserva; com sucesso, registra as entradas como baixadas"""
+        chaves = {entrada.chave for entrada in entradas}
+        with _lock_registro:
+            _em_coleta.difference_update(chaves)
+            if not baixadas or not chaves:
+                return
+
+            self._baixadas = self._carregar_registro() | self._baixadas | chaves
+            try:
+                self.arquivo_registro.parent.mkdir(parents=True, exist_ok=True)
+                temporario = self.arquivo_registro.with_suffix('.tmp')
+                with open(temporario, 'w', encoding='utf-8') as f:
+                    json.dump(sorted(self._baixadas), f)
+                os.replace(temporario, self.arquivo_registro)
+            except Exception as e:
+                logger.warning(f"Erro ao gravar registro do histórico: {e}")
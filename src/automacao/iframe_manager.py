@@ -1,42 +1,205 @@
 # gerenciador_iframe.py
 import logging
+import weakref
 from contextlib import contextmanager
+from selenium.common.exceptions import (
+    NoSuchElementException, NoSuchFrameException, StaleElementReferenceException
+)
 from selenium.webdriver.common.by import By
 
 logger = logging.getLogger(__name__)
 
+# Aba ativa por driver, compartilhada entre as instâncias (processador, download, agendador)
+_abas_ativas = weakref.WeakKeyDictionary()
+# Contexto de navegação (frame) por driver, também compartilhado
+_rastreadores = weakref.WeakKeyDictionary()
+
+DESCONHECIDO = object()
+
+# Comandos que não dependem do frame atual: não forçam a saída adiada do iframe
+COMANDOS_SEM_FRAME = {
+    'getCurrentUrl', 'getTitle', 'w3cGetCurrentWindowHandle', 'w3cGetWindowHandles',
+    'getCookies', 'getCookie', 'addCookie', 'deleteCookie', 'deleteAllCookies',
+    'getLog', 'getAvailableLogTypes', 'getWindowRect', 'setWindowRect', 'w3cMaximizeWindow',
+    'minimizeWindow', 'screenshot', 'executeCdpCommand', 'setTimeouts', 'getTimeouts', 'quit',
+}
+# Comandos que levam o driver ao documento principal (navegação e fechamento descartam o iframe em cache)
+COMANDOS_NAVEGACAO = {'get', 'refresh', 'goBack', 'goForward'}
+COMANDOS_JANELA = {'switchToWindow', 'newWindow', 'close'}
+
+
+class RastreadorFrames:
+    """Contexto de navegação do driver, visto por todos os comandos enviados a ele.
+
+    Sabe em que iframe o driver está, guarda o elemento do iframe por aba até
+    a próxima navegação e adia a volta ao documento principal: ao sair de
+    `contexto_iframe` o driver continua no frame, e só o primeiro comando que
+    depende do documento principal paga o `default_content`. Reentrar no
+    mesmo frame nesse meio tempo não custa nenhuma ida ao WebDriver.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.frame = None               # locator do frame atual; None = documento principal
+        self.aba = None
+        self.usos = 0                   # contextos abertos sobre o frame atual
+        self.saida_pendente = False
+        self.elementos = {}             # (aba, locator) -> elemento do iframe
+        self.estatisticas = {'entradas': 0, 'reentradas': 0, 'saidas': 0}
+        self._interno = False
+        self._instalar()
+
+    def _instalar(self):
+        executar = self.driver.execute
+
+        def executar_rastreando(comando, parametros=None):
+            if not self._interno:
+                self._antes_do_comando(comando, parametros or {})
+            return executar(comando, parametros)
+
+        self.driver.execute = executar_rastreando
+
+    @property
+    def em_frame(self) -> bool:
+        """O chamador está (deliberadamente) dentro de um frame"""
+        return self.frame is not None and not self.saida_pendente
+
+    def _antes_do_comando(self, comando: str, parametros: dict):
+        if comando in COMANDOS_NAVEGACAO or comando in COMANDOS_JANELA:
+            if comando in COMANDOS_NAVEGACAO or comando == 'close':
+                self._descartar_elementos(self.aba)
+            if comando == 'close':
+                # A aba fechada deixa de ser a ativa: a próxima troca de aba não pode ser pulada
+                _abas_ativas.pop(self.driver, None)
+                self.aba = None
+            elif comando == 'switchToWindow':
+                self.aba = parametros.get('handle')
+            self._no_documento_principal()
+        elif comando == 'switchToFrame':
+            if parametros.get('id') is None:
+                self._no_documento_principal()
+                return
+            # Troca manual de frame: o destino é relativo ao contexto atual, que precisa ser o real
+            self._sair_se_pendente()
+            self.frame = DESCONHECIDO
+        elif comando == 'switchToParentFrame':
+            self._sair_se_pendente()
+            self.frame = None if self.frame not in (None, DESCONHECIDO) else DESCONHECIDO
+        elif comando not in COMANDOS_SEM_FRAME:
+            self._sair_se_pendente()
+
+    def _no_documento_principal(self):
+        self.frame = None
+        self.usos = 0
+        self.saida_pendente = False
+
+    def _descartar_elementos(self, aba):
+        for chave in [chave for chave in self.elementos if chave[0] == aba]:
+            del self.elementos[chave]
+
+    def _executar(self, funcao, *args):
+        self._interno = True
+        try:
+            return funcao(*args)
+        finally:
+            self._interno = False
+
+    def _sair_se_pendente(self):
+        if self.saida_pendente:
+            self._executar(self.driver.switch_to.default_content)
+            self.estatisticas['saidas'] += 1
+            self._no_documento_principal()
+
+    def entrar(self, iframe_locator):
+        if self.frame == iframe_locator:
+            # Já no frame (aberto ou com a saída adiada): nada a enviar
+            self.saida_pendente = False
+            self.usos += 1
+            self.estatisticas['reentradas'] += 1
+            return
+
+        if self.frame is not None:
+            self._executar(self.driver.switch_to.default_content)
+            self.estatisticas['saidas'] += 1
+            self._no_documento_principal()
+
+        chave = (self.aba, iframe_locator)
+        elemento = self.elementos.get(chave)
+        try:
+            if elemento is None:
+                raise StaleElementReferenceException("iframe fora do cache")
+            self._executar(self.driver.switch_to.frame, elemento)
+        except (StaleElementReferenceException, NoSuchElementException, NoSuchFrameException):
+            elemento = self._executar(self.driver.find_element, *iframe_locator)
+            self._executar(self.driver.switch_to.frame, elemento)
+            self.elementos[chave] = elemento
+
+        self.frame = iframe_locator
+        self.usos = 1
+        self.saida_pendente = False
+        self.estatisticas['entradas'] += 1
+        logger.debug(f"Entrou no iframe: {iframe_locator}")
+
+    def liberar(self):
+        """Fim de um contexto: a volta ao documento principal fica para quando for necessária"""
+        if self.frame is None:
+            return
+        self.usos = max(0, self.usos - 1)
+        if self.usos == 0:
+            self.saida_pendente = True
+
+    def sair(self):
+        """Volta imediata ao documento principal (recuperação após erro)"""
+        self._executar(self.driver.switch_to.default_content)
+        self._no_documento_principal()
+
+
+def obter_rastreador(driver) -> RastreadorFrames:
+    rastreador = _rastreadores.get(driver)
+    if rastreador is None:
+        rastreador = _rastreadores[driver] = RastreadorFrames(driver)
+    return rastreador
+
+
 class GerenciadorIframe:
     def __init__(self, driver):
         self.driver = driver
-        self.iframe_stack = []
-    
+        self.rastreador = obter_rastreador(driver)
+
+    @property
+    def aba_ativa(self):
+        return _abas_ativas.get(self.driver)
+
+    def ativar_aba(self, handle: str) -> bool:
+        """Troca para a aba apenas se ela não for a ativa; retorna True se houve troca"""
+        if _abas_ativas.get(self.driver) == handle:
+            return False
+
+        self.driver.switch_to.window(handle)
+        _abas_ativas[self.driver] = handle
+        logger.debug(f"Aba ativa: {handle}")
+        return True
+
+    def esquecer_aba(self):
+        _abas_ativas.pop(self.driver, None)
+
     @contextmanager
     def contexto_iframe(self, iframe_locator):
+        """Executa o bloco dentro do iframe; reentrar no frame atual não envia comandos"""
+        self.rastreador.entrar(iframe_locator)
         try:
-            self.iframe_stack.append(self.driver.current_window_handle)
-            
-            iframe = self.driver.find_element(*iframe_locator)
-            self.driver.switch_to.frame(iframe)
-            logger.debug(f"Entrou no iframe: {iframe_locator}")
-            
             yield
-            
-        finally:
-            try:
-                self.driver.switch_to.default_content()
-                logger.debug("Retornou ao contexto padrão")
-                
-                if self.iframe_stack:
-                    window = self.iframe_stack.pop()
-                    self.driver.switch_to.window(window)
-                    
-            except Exception as e:
-                logger.warning(f"Erro ao restaurar contexto: {e}")
-                self._recuperar_contexto_seguro()
-    
+        except Exception:
+            # Após erro o frame pode não existir mais: volta de fato ao documento principal
+            self._recuperar_contexto_seguro()
+            raise
+        else:
+            self.rastreador.liberar()
+
     def _recuperar_contexto_seguro(self):
         try:
-            self.driver.switch_to.default_content()
-            self.iframe_stack.clear()
+            self.rastreador.sair()
+            logger.debug("Retornou ao contexto padrão")
         except Exception as e:
-            logger.error(f"Falha crítica ao recuperar contexto: {e}")
\ No newline at end of file
+            self.rastreador.frame = DESCONHECIDO
+            logger.error(f"Falha crítica ao recuperar contexto: {e}")
@@ -0,0 +1,166 @@
+"""
+Detecção de conclusão de downloads por evento (sistema de arquivos e CDP)
+"""
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import List, Set
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog é opcional: sem ele o monitor usa polling
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
+
+EXTENSOES_PARCIAIS = ('.crdownload', '.tmp', '.part')
+INTERVALO_POLLING = 0.2
+
+
+class _NotificadorDownloads(FileSystemEventHandler):
+    """Acorda o monitor quando um .zip aparece (rename .crdownload -> .zip ou criação direta)"""
+
+    def __init__(self, evento: threading.Event):
+        self.evento = evento
+
+    def on_moved(self, event):
+        if str(event.dest_path).endswith('.zip'):
+            self.evento.set()
+
+    def on_created(self, event):
+        if str(event.src_path).endswith('.zip'):
+            self.evento.set()
+
+
+class MonitorDownloads:
+    """Espera o download terminar de fato em vez de dormir um tempo fixo.
+
+    Um download está concluído quando surge um .zip novo no diretório e não
+    há arquivo parcial (.crdownload) pendente. O watcher (watchdog/inotify,
+    se instalado) ou o polling detectam o rename final; opcionalmente os
+    eventos Page/Browser.downloadProgress do log de performance do Chrome
+    antecipam a verificação.
+    """
+
+    def __init__(self, diretorio: Path, driver=None, usar_cdp: bool = False):
+        self.diretorio = Path(diretorio)
+        self.driver = driver
+        self.usar_cdp = usar_cdp and driver is not None
+        self._anteriores: Set[str] = set()
+        self._evento = threading.Event()
+        self._observador = None
+
+    def iniciar(self):
+        """Marca o início de um download: só arquivos novos a partir daqui contam"""
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self._anteriores = {entrada.name for entrada in os.scandir(self.diretorio)}
+        self._evento.clear()
+
+        if self.usar_cdp:
+            self._ativar_eventos_cdp()
+            self._ler_eventos_cdp()
+
+        if Observer is not None and self._observador is None:
+            try:
+                self._observador = Observer()
+                self._observador.schedule(_NotificadorDownloads(self._evento), str(self.diretorio))
+                self._observador.start()
+            except Exception as e:
+                logger.debug(f"Watcher indisponível, usando polling: {e}")
+                self._observador = None
+
+    def parar(self):
+        if self._observador is not None:
+            self._observador.stop()
+            self._observador.join(timeout=2)
+            self._observador = None
+
+    def novos_arquivos(self) -> List[Path]:
+        """Arquivos .zip completos surgidos desde iniciar()"""
+        return sorted(
+            self.diretorio / nome for nome in self._listar()
+            if nome.endswith('.zip') and nome not in self._anteriores
+        )
+
+    def _listar(self) -> List[str]:
+        try:
+            return [entrada.name for entrada in os.scandir(self.diretorio)]
+        except FileNotFoundError:
+            return []
+
+    def _parciais(self) -> List[str]:
+        return [nome for nome in self._listar()
+                if nome.endswith(EXTENSOES_PARCIAIS) and nome not in self._anteriores]
+
+    def concluido(self, esperados: int = 1) -> bool:
+        """Verificação sem bloqueio: há `esperados` .zip novos e nenhum download parcial pendente"""
+        if self.usar_cdp:
+            self._ler_eventos_cdp()
+        return len(self.novos_arquivos()) >= esperados and not self._parciais()
+
+    def esperar(self, prazo: float, esperados: int = 1) -> bool:
+        """Bloqueia até a conclusão ou o prazo (segundos), sem encerrar o monitor.
+
+        Com o watcher ativo a thread dorme no evento até o rename do .zip;
+        só o polling (sem watchdog) e o log CDP, que é lido sob demanda,
+        verificam a cada INTERVALO_POLLING.
+        """
+        limite = time.time() + prazo
+        while not self.concluido(esperados):
+            restante = limite - time.time()
+            if restante <= 0:
+                return False
+            espera = INTERVALO_POLLING if self._observador is None or self.usar_cdp else restante
+            self._evento.wait(min(espera, restante))
+            self._evento.clear()
+        return True
+
+    def aguardar(self, prazo: float, esperados: int = 1) -> List[Path]:
+        """Bloqueia até a conclusão ou o prazo (segundos); retorna os arquivos concluídos"""
+        inicio = time.time()
+
+        try:
+            if not self.esperar(prazo, esperados):
+                parciais = self._parciais()
+                if parciais:
+                    logger.warning(f"Prazo de download esgotado com parciais pendentes: {parciais}")
+                else:
+                    logger.warning(f"{len(self.novos_arquivos())}/{esperados} download(s) concluído(s) em {prazo:.1f}s")
+
+            novos = self.novos_arquivos()
+            if novos:
+                logger.debug(f"Download concluído em {time.time() - inicio:.1f}s: {[a.name for a in novos]}")
+            return novos
+
+        finally:
+            self.parar()
+
+    def _ativar_eventos_cdp(self):
+        try:
+            self.driver.execute_cdp_cmd("Page.enable", {})
+        except Exception as e:
+            logger.debug(f"Eventos CDP de download indisponíveis: {e}")
+            self.usar_cdp = False
+
+    def _ler_eventos_cdp(self):
+        """Consome o log de performance; download 'completed' acorda a espera"""
+        try:
+            entradas = self.driver.get_log('performance')
+        except Exception as e:
+            logger.debug(f"Log de performance indisponível: {e}")
+            self.usar_cdp = False
+            return
+
+        for entrada in entradas:
+            try:
+                mensagem = json.loads(entrada['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            if (mensagem.get('method') in ('Page.downloadProgress', 'Browser.downloadProgress')
+                    and mensagem.get('params', {}).get('state') == 'completed'):
+                self._evento.set()
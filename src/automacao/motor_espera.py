@@ -0,0 +1,175 @@
+"""
+Esperas por eventos do portal no lugar das pausas fixas do fluxo
+"""
+import time
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+from selenium.common.exceptions import (
+    NoSuchElementException, NoSuchFrameException, StaleElementReferenceException, TimeoutException
+)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support.ui import WebDriverWait
+
+from .iframe_manager import GerenciadorIframe
+from .timeout_manager import TimeoutManager, TipoOperacao
+
+logger = logging.getLogger(__name__)
+
+IFRAME_NETACCESS = (By.ID, "iNetaccess")
+INTERVALO_PADRAO = 0.1
+
+# Instala (uma vez por documento) um MutationObserver e o contador de XHR/fetch em andamento;
+# cada chamada devolve há quantos ms houve a última mutação e a última atividade de rede
+SCRIPT_OBSERVADORES = """
+if (!window.__esperaNFe) {
+    var estado = {mutacao: Date.now(), rede: Date.now(), ativas: 0};
+    window.__esperaNFe = estado;
+    new MutationObserver(function () { estado.mutacao = Date.now(); }).observe(
+        document, {subtree: true, childList: true, attributes: true, characterData: true}
+    );
+    var concluir = function () { estado.ativas = Math.max(0, estado.ativas - 1); estado.rede = Date.now(); };
+    var enviar = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        estado.ativas++;
+        this.addEventListener('loadend', concluir);
+        return enviar.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var buscar = window.fetch;
+        window.fetch = function () {
+            estado.ativas++;
+            return buscar.apply(this, arguments).then(
+                function (r) { concluir(); return r; },
+                function (e) { concluir(); throw e; }
+            );
+        };
+    }
+}
+var estado = window.__esperaNFe, agora = Date.now();
+var recursos = performance.getEntriesByType('resource');
+var ultimoRecurso = recursos.length ? performance.now() - recursos[recursos.length - 1].responseEnd : Infinity;
+return {
+    pronto: document.readyState,
+    mutacao: agora - estado.mutacao,
+    ativas: estado.ativas,
+    rede: Math.min(agora - estado.rede, ultimoRecurso)
+};
+"""
+
+
+class MotorEspera:
+    """Espera por condições concretas (janela nova, URL, elemento no iNetaccess,
+    DOM quieto, rede ociosa) e retorna assim que elas valem.
+
+    Cada espera é registrada no TimeoutManager com a latência real, que
+    passa a alimentar o fator de adaptação no lugar das pausas fixas. O
+    timeout vem do tipo de operação; esperas não obrigatórias que expiram
+    (a condição pode legitimamente não ocorrer) não contam como erro.
+    """
+
+    def __init__(self, driver: WebDriver, timeout_manager: TimeoutManager,
+                 intervalo: float = INTERVALO_PADRAO):
+        self.driver = driver
+        self.timeout_manager = timeout_manager
+        self.intervalo = intervalo
+        self.gerenciador_iframe = GerenciadorIframe(driver)
+
+    def aguardar(self, condicao: Callable[[WebDriver], Any], tipo: TipoOperacao = TipoOperacao.ELEMENTO_WAIT,
+                 timeout: Optional[float] = None, obrigatoria: bool = True, descricao: str = "") -> Any:
+        """Resultado da condição assim que for verdadeiro; None se expirar"""
+        if timeout is None:
+            timeout = self.timeout_manager.get_timeout(tipo)
+        espera = WebDriverWait(
+            self.driver, timeout, poll_frequency=self.intervalo,
+            ignored_exceptions=(NoSuchElementException, NoSuchFrameException, StaleElementReferenceException)
+        )
+
+        inicio = time.time()
+        try:
+            resultado = espera.until(condicao)
+        except TimeoutException:
+            tempo_decorrido = time.time() - inicio
+            if obrigatoria:
+                logger.warning(f"Espera expirada após {tempo_decorrido:.1f}s: {descricao or tipo.value}")
+                self.timeout_manager.registrar_tempo_operacao(tipo, tempo_decorrido, False)
+            else:
+                logger.debug(f"Condição não ocorreu em {tempo_decorrido:.1f}s: {descricao or tipo.value}")
+            return None
+
+        tempo_decorrido = time.time() - inicio
+        logger.debug(f"{descricao or tipo.value}: {tempo_decorrido:.2f}s")
+        self.timeout_manager.registrar_tempo_operacao(tipo, tempo_decorrido, True)
+        return resultado
+
+    def nova_janela(self, handles_anteriores: List[str], tipo: TipoOperacao = TipoOperacao.PAGINA_CARREGAMENTO,
+                    timeout: Optional[float] = None, obrigatoria: bool = False) -> Optional[str]:
+        """Handle da janela aberta depois de `handles_anteriores`"""
+        anteriores = set(handles_anteriores)
+
+        def janela_aberta(driver):
+            novas = [handle for handle in driver.window_handles if handle not in anteriores]
+            return novas[-1] if novas else None
+
+        return self.aguardar(janela_aberta, tipo, timeout, obrigatoria, "nova janela")
+
+    def mudanca_url(self, url_anterior: Optional[str] = None, contendo: Optional[str] = None,
+                    tipo: TipoOperacao = TipoOperacao.PAGINA_CARREGAMENTO,
+                    timeout: Optional[float] = None, obrigatoria: bool = True) -> Optional[str]:
+        """URL atual assim que for diferente de `url_anterior` e/ou contiver `contendo`"""
+        def url_alterada(driver):
+            url = driver.current_url
+            if url_anterior is not None and url == url_anterior:
+                return None
+            if contendo is not None and contendo not in url:
+                return None
+            return url
+
+        return self.aguardar(url_alterada, tipo, timeout, obrigatoria, f"URL {contendo or 'alterada'}")
+
+    def elemento_visivel(self, locator: Tuple[str, str], tipo: TipoOperacao = TipoOperacao.ELEMENTO_WAIT,
+                         timeout: Optional[float] = None, obrigatoria: bool = True):
+        """Elemento visível no contexto atual (o chamador já está no frame certo)"""
+        def visivel(driver):
+            elemento = driver.find_element(*locator)
+            return elemento if elemento.is_displayed() else None
+
+        return self.aguardar(visivel, tipo, timeout, obrigatoria, f"{locator[1]} visível")
+
+    def elemento_visivel_iframe(self, locator: Tuple[str, str], iframe: Tuple[str, str] = IFRAME_NETACCESS,
+                                tipo: TipoOperacao = TipoOperacao.ELEMENTO_WAIT,
+                                timeout: Optional[float] = None, obrigatoria: bool = True) -> bool:
+        """Elemento visível dentro do iframe; cada tentativa entra e sai do frame"""
+        def visivel(driver):
+            with self.gerenciador_iframe.contexto_iframe(iframe):
+                return driver.find_element(*locator).is_displayed()
+
+        return bool(self.aguardar(visivel, tipo, timeout, obrigatoria, f"{locator[1]} visível em {iframe[1]}"))
+
+    def dom_quieto(self, quietude: float = 0.5, iframe: Optional[Tuple[str, str]] = None,
+                   tipo: TipoOperacao = TipoOperacao.PAGINA_CARREGAMENTO,
+                   timeout: Optional[float] = None, obrigatoria: bool = False) -> bool:
+        """Documento carregado e sem mutações há `quietude` segundos"""
+        def quieto(driver):
+            estado = self._estado_documento(iframe)
+            return estado['pronto'] == 'complete' and estado['mutacao'] >= quietude * 1000
+
+        return bool(self.aguardar(quieto, tipo, timeout, obrigatoria, "DOM quieto"))
+
+    def rede_ociosa(self, ociosidade: float = 0.5, iframe: Optional[Tuple[str, str]] = None,
+                    tipo: TipoOperacao = TipoOperacao.PAGINA_CARREGAMENTO,
+                    timeout: Optional[float] = None, obrigatoria: bool = False) -> bool:
+        """Nenhum XHR/fetch em andamento nem recurso concluído há `ociosidade` segundos"""
+        def ociosa(driver):
+            estado = self._estado_documento(iframe)
+            return (estado['pronto'] == 'complete' and not estado['ativas']
+                    and estado['rede'] >= ociosidade * 1000)
+
+        return bool(self.aguardar(ociosa, tipo, timeout, obrigatoria, "rede ociosa"))
+
+    def _estado_documento(self, iframe: Optional[Tuple[str, str]]) -> dict:
+        if iframe is None:
+            return self.driver.execute_script(SCRIPT_OBSERVADORES)
+        with self.gerenciador_iframe.contexto_iframe(iframe):
+            return self.driver.execute_script(SCRIPT_OBSERVADORES)
@@ -1,151 +1,513 @@
-import json
+import sys
 import logging
+import threading
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
-from typing import Any, List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional, Tuple
 from pathlib import Path
 
+from .armazenamento_estado import (
+    ParticaoPeriodo, criar_armazenamento_arquivo, detectar_tipo_armazenamento
+)
+
 logger = logging.getLogger(__name__)
 
-@dataclass
-@dataclass
+STATUS_EMPRESA = ('pendente', 'em_andamento', 'concluido', 'erro', 'solicitado')
+ETAPAS_EMPRESA = ('inicio', 'formulario', 'captcha', 'consulta', 'validacao', 'download', 'concluido',
+                  'solicitado')
+
+_CODIGOS_STATUS = {status: codigo for codigo, status in enumerate(STATUS_EMPRESA)}
+_CODIGOS_ETAPA = {etapa: codigo for codigo, etapa in enumerate(ETAPAS_EMPRESA)}
+
+
+def _codificar(valor: str, codigos: Dict[str, int]):
+    """Valores conhecidos viram inteiros pequenos; os demais são internados"""
+    codigo = codigos.get(valor)
+    return codigo if codigo is not None else sys.intern(valor)
+
+
 class EstadoEmpresa:
-    ie: str
-    nome: str
-    status: str
-    tentativas: int = 0
-    ultima_tentativa: Optional[datetime] = None
-    erro: Optional[str] = None
-    arquivos_baixados: List[str] = None
-    etapa_atual: str = "inicio"
-    progresso_download: int = 0
-    dados_sessao: Dict[str, Any] = None
-    checkpoint_time: Optional[datetime] = None
-    total_notas: int = 0
-    notas_processadas: int = 0
-    
-    def __post_init__(self):
-        if self.arquivos_baixados is None:
-            self.arquivos_baixados = []
-        if self.dados_sessao is None:
-            self.dados_sessao = {}
+    """
+    Estado de uma IE em representação compacta: `__slots__`, status/etapa
+    como inteiros pequenos e payloads de sessão (`arquivos_baixados`,
+    `dados_sessao`) carregados sob demanda do backend via `_carregador`.
+    """
+
+    __slots__ = (
+        'ie', 'nome', '_status', 'tentativas', 'ultima_tentativa', 'erro',
+        '_arquivos_baixados', '_etapa', 'progresso_download', '_dados_sessao',
+        'checkpoint_time', 'total_notas', 'notas_processadas', '_carregador'
+    )
+
+    def __init__(self, ie: str, nome: str, status: str, tentativas: int = 0,
+                 ultima_tentativa: Optional[datetime] = None, erro: Optional[str] = None,
+                 arquivos_baixados: List[str] = None, etapa_atual: str = "inicio",
+                 progresso_download: int = 0, dados_sessao: Dict[str, Any] = None,
+                 checkpoint_time: Optional[datetime] = None, total_notas: int = 0,
+                 notas_processadas: int = 0,
+                 carregador: Optional[Callable[[str], Tuple[List[str], Dict[str, Any]]]] = None):
+        self.ie = ie
+        self.nome = nome
+        self.status = status
+        self.tentativas = tentativas
+        self.ultima_tentativa = ultima_tentativa
+        self.erro = erro
+        self._arquivos_baixados = arquivos_baixados
+        self.etapa_atual = etapa_atual
+        self.progresso_download = progresso_download
+        self._dados_sessao = dados_sessao
+        self.checkpoint_time = checkpoint_time
+        self.total_notas = total_notas
+        self.notas_processadas = notas_processadas
+        self._carregador = carregador
+
+    @property
+    def status(self) -> str:
+        codigo = self._status
+        return STATUS_EMPRESA[codigo] if codigo.__class__ is int else codigo
+
+    @status.setter
+    def status(self, valor: str):
+        self._status = _codificar(valor, _CODIGOS_STATUS)
+
+    @property
+    def etapa_atual(self) -> str:
+        codigo = self._etapa
+        return ETAPAS_EMPRESA[codigo] if codigo.__class__ is int else codigo
+
+    @etapa_atual.setter
+    def etapa_atual(self, valor: str):
+        self._etapa = _codificar(valor, _CODIGOS_ETAPA)
+
+    @property
+    def payload_carregado(self) -> bool:
+        return self._carregador is None
+
+    def obter_payload(self) -> Tuple[List[str], Dict[str, Any]]:
+        """Payload atual sem mantê-lo em memória quando ainda não foi carregado"""
+        if self._carregador is not None:
+            return self._carregador(self.ie)
+        return self._arquivos_baixados or [], self._dados_sessao or {}
+
+    def _materializar_payload(self):
+        if self._carregador is not None:
+            self._arquivos_baixados, self._dados_sessao = self._carregador(self.ie)
+            self._carregador = None
+
+    @property
+    def arquivos_baixados(self) -> List[str]:
+        self._materializar_payload()
+        if self._arquivos_baixados is None:
+            self._arquivos_baixados = []
+        return self._arquivos_baixados
+
+    @arquivos_baixados.setter
+    def arquivos_baixados(self, valor: List[str]):
+        self._materializar_payload()
+        self._arquivos_baixados = valor
+
+    @property
+    def dados_sessao(self) -> Dict[str, Any]:
+        self._materializar_payload()
+        if self._dados_sessao is None:
+            self._dados_sessao = {}
+        return self._dados_sessao
+
+    @dados_sessao.setter
+    def dados_sessao(self, valor: Dict[str, Any]):
+        self._materializar_payload()
+        self._dados_sessao = valor
+
+    def __repr__(self) -> str:
+        return (f"EstadoEmpresa(ie={self.ie!r}, nome={self.nome!r}, status={self.status!r}, "
+                f"etapa_atual={self.etapa_atual!r}, tentativas={self.tentativas})")
+
+def _serializar_estado(estado: EstadoEmpresa, incluir_payload: bool = True) -> Dict:
+    """Serializa o estado; payload não carregado só é lido do backend se `incluir_payload`"""
+    dados = {
+        'ie': estado.ie,
+        'nome': estado.nome,
+        'status': estado.status,
+        'tentativas': estado.tentativas,
+        'ultima_tentativa': estado.ultima_tentativa.isoformat() if estado.ultima_tentativa else None,
+        'erro': estado.erro,
+        'etapa_atual': estado.etapa_atual,
+        'progresso_download': estado.progresso_download,
+        'checkpoint_time': estado.checkpoint_time.isoformat() if estado.checkpoint_time else None,
+        'total_notas': estado.total_notas,
+        'notas_processadas': estado.notas_processadas
+    }
+
+    if estado.payload_carregado or incluir_payload:
+        arquivos_baixados, dados_sessao = estado.obter_payload()
+        dados['arquivos_baixados'] = list(arquivos_baixados)
+        dados['dados_sessao'] = dict(dados_sessao)
+
+    return dados
+
+def _desserializar_estado(ie: str, estado_data: Dict, carregador: Callable = None) -> EstadoEmpresa:
+    ultima_tentativa = None
+    checkpoint_time = None
+
+    if estado_data['ultima_tentativa']:
+        ultima_tentativa = datetime.fromisoformat(estado_data['ultima_tentativa'])
+
+    if estado_data['checkpoint_time']:
+        checkpoint_time = datetime.fromisoformat(estado_data['checkpoint_time'])
+
+    # Sem payload no registro: fica a cargo do carregador preguiçoso
+    possui_payload = 'arquivos_baixados' in estado_data or 'dados_sessao' in estado_data
+
+    return EstadoEmpresa(
+        ie=ie,
+        nome=estado_data['nome'],
+        status=estado_data['status'],
+        tentativas=estado_data['tentativas'],
+        ultima_tentativa=ultima_tentativa,
+        erro=estado_data['erro'],
+        arquivos_baixados=estado_data.get('arquivos_baixados') or None,
+        etapa_atual=estado_data['etapa_atual'],
+        progresso_download=estado_data['progresso_download'],
+        dados_sessao=estado_data.get('dados_sessao') or None,
+        checkpoint_time=checkpoint_time,
+        total_notas=estado_data.get('total_notas', 0),
+        notas_processadas=estado_data.get('notas_processadas', 0),
+        carregador=None if possui_payload else carregador
+    )
 
 class GerenciadorMultiplasEmpresas:
-    def __init__(self, arquivo_estado: str = "estado/processamento_empresas.json"):
-        self.arquivo_estado = Path(arquivo_estado)
-        self.estados: Dict[str, EstadoEmpresa] = {} 
+    """
+    Estado das empresas em memória, persistido por um backend plugável
+    (`json`: snapshot + journal append-only; `sqlite`: banco em modo WAL).
+
+    Com `escrita_assincrona=True` as transições só marcam a IE como suja e
+    uma thread escritora grava os lotes coalescidos a cada `intervalo_flush`
+    segundos ou `max_transicoes` transições, o que vier primeiro.
+
+    Com `periodo=(data_inicio, data_fim)` o estado é a partição daquele
+    período (chave efetiva: IE + período), em `estado/periodos/<id>/`.
+    """
+
+    def __init__(self, arquivo_estado: str = "estado/processamento_empresas.json",
+                 limite_journal: int = 1000, armazenamento: str = 'json',
+                 escrita_assincrona: bool = False, intervalo_flush: float = 0.5,
+                 max_transicoes: int = 50, periodo: Optional[Tuple[str, str]] = None,
+                 particao: Optional[ParticaoPeriodo] = None):
+        arquivo_estado = Path(arquivo_estado)
+        self.selado = False
+
+        if periodo and not particao:
+            particao = ParticaoPeriodo(arquivo_estado.parent, *periodo)
+            if not particao.diretorio.exists():
+                particao.migrar_estado_legado(arquivo_estado)
+                particao.reabrir(arquivo_estado.name, armazenamento, limite_journal)
+
+        self.particao = particao
+        if particao:
+            arquivo_estado = particao.diretorio / arquivo_estado.name
+
+        self.arquivo_estado = arquivo_estado
+        self.estados: Dict[str, EstadoEmpresa] = {}
+        self._lock = threading.RLock()
+
+        self.escrita_assincrona = escrita_assincrona
+        self.intervalo_flush = intervalo_flush
+        self.max_transicoes = max_transicoes
+        self._sujas: Dict[str, None] = {}
+        self._transicoes_pendentes = 0
+        self._condicao_escrita = threading.Condition(threading.Lock())
+        self._lock_escrita = threading.Lock()
+        self._encerrando = False
+        self._thread_escrita: Optional[threading.Thread] = None
+
+        # Índices secundários (dicts como conjuntos ordenados), atualizados a cada transição
+        self._ies_por_status: Dict[str, Dict[str, None]] = {}
+        self._interrompidas: Dict[str, datetime] = {}
+        self._sem_tentativa: Dict[str, None] = {}
+        self._retentativa: Dict[str, None] = {}
+        # IEs concluídas nesta execução por pacote colhido no histórico de outra IE
+        self._colhidas: Dict[str, None] = {}
+
+        self.armazenamento = criar_armazenamento_arquivo(self.arquivo_estado, armazenamento, limite_journal)
+        if hasattr(self.armazenamento, 'vincular_snapshot'):
+            self.armazenamento.vincular_snapshot(self._serializar_todos)
+
         self.carregar_estado()
-    
+
+        if self.escrita_assincrona:
+            self._thread_escrita = threading.Thread(
+                target=self._loop_escrita, name="escritor-estado", daemon=True
+            )
+            self._thread_escrita.start()
+
+    def _serializar_todos(self) -> Dict[str, Dict]:
+        with self._lock:
+            incluir_payload = self.armazenamento.requer_payload_completo
+            return {ie: _serializar_estado(estado, incluir_payload) for ie, estado in self.estados.items()}
+
     def carregar_estado(self) -> bool:
-        """Carrega estado do arquivo JSON com desserialização de datetime"""
-        if not self.arquivo_estado.exists():
+        """Carrega estado do backend com desserialização de datetime"""
+        if not self.armazenamento.existe():
             return False
-        
+
         try:
-            with open(self.arquivo_estado, 'r', encoding='utf-8') as f:
-                dados = json.load(f)
-            
-            for ie, estado_data in dados.items():
-                ultima_tentativa = None
-                checkpoint_time = None
-                
-                if estado_data['ultima_tentativa']:
-                    from datetime import datetime
-                    ultima_tentativa = datetime.fromisoformat(estado_data['ultima_tentativa'])
-                
-                if estado_data['checkpoint_time']:
-                    from datetime import datetime
-                    checkpoint_time = datetime.fromisoformat(estado_data['checkpoint_time'])
-                
-                self.estados[ie] = EstadoEmpresa(
-                    ie=ie,
-                    nome=estado_data['nome'],
-                    status=estado_data['status'],
-                    tentativas=estado_data['tentativas'],
-                    ultima_tentativa=ultima_tentativa,
-                    erro=estado_data['erro'],
-                    arquivos_baixados=estado_data['arquivos_baixados'],
-                    etapa_atual=estado_data['etapa_atual'],
-                    progresso_download=estado_data['progresso_download'],
-                    dados_sessao=estado_data['dados_sessao'],
-                    checkpoint_time=checkpoint_time,
-                    total_notas=estado_data.get('total_notas', 0),
-                    notas_processadas=estado_data.get('notas_processadas', 0)
-                )
+            with self._lock:
+                for ie, estado_data in self.armazenamento.carregar().items():
+                    self.estados[ie] = _desserializar_estado(
+                        ie, estado_data, self.armazenamento.carregar_payload
+                    )
+                self._reconstruir_indices()
             return True
         except Exception as e:
             logger.error(f"Erro carregar estado: {e}")
             self.estados = {}
             return False
-    
+
+    def _reconstruir_indices(self):
+        self._ies_por_status = {}
+        self._interrompidas = {}
+        self._sem_tentativa = {}
+        self._retentativa = {}
+
+        interrompidas = []
+        for ie, estado in self.estados.items():
+            self._indexar(ie, estado, ordenar_interrompida=False)
+            if ie in self._interrompidas:
+                interrompidas.append((estado.checkpoint_time, ie))
+
+        self._interrompidas = {ie: checkpoint for checkpoint, ie in sorted(interrompidas)}
+
+    @staticmethod
+    def _esta_interrompida(estado: EstadoEmpresa) -> bool:
+        return (estado.status == 'em_andamento' and
+                estado.checkpoint_time is not None and
+                estado.etapa_atual != 'concluido')
+
+    def _indexar(self, ie: str, estado: EstadoEmpresa, ordenar_interrompida: bool = True):
+        """Atualiza os índices de uma IE; quem continua no mesmo índice mantém a posição"""
+        for status, ies in self._ies_por_status.items():
+            if status != estado.status:
+                ies.pop(ie, None)
+        self._ies_por_status.setdefault(estado.status, {}).setdefault(ie, None)
+
+        if estado.tentativas == 0:
+            self._sem_tentativa.setdefault(ie, None)
+        else:
+            self._sem_tentativa.pop(ie, None)
+
+        if estado.tentativas == 1 and estado.status in ('pendente', 'erro'):
+            self._retentativa.setdefault(ie, None)
+        else:
+            self._retentativa.pop(ie, None)
+
+        if not self._esta_interrompida(estado):
+            self._interrompidas.pop(ie, None)
+            return
+
+        checkpoint = estado.checkpoint_time
+        if self._interrompidas.get(ie) == checkpoint:
+            return
+        self._interrompidas.pop(ie, None)
+
+        if (ordenar_interrompida and self._interrompidas
+                and checkpoint < next(reversed(self._interrompidas.values()))):
+            # Checkpoint fora de ordem (raro): reordena o índice
+            itens = sorted([*self._interrompidas.items(), (ie, checkpoint)], key=lambda item: item[1])
+            self._interrompidas = dict(itens)
+        else:
+            self._interrompidas[ie] = checkpoint
+
+    def _registrar_transicao(self, *ies: str):
+        """Atualiza os índices e persiste no backend o estado atual das IEs informadas"""
+        try:
+            with self._lock:
+                for ie in ies:
+                    if ie in self.estados:
+                        self._indexar(ie, self.estados[ie])
+
+                if self.selado:
+                    return
+                if self.escrita_assincrona:
+                    novas = [ie for ie in ies if ie in self.estados]
+                    self._sujas.update(dict.fromkeys(novas))
+                    self._transicoes_pendentes += len(novas)
+                    transicoes = self._transicoes_pendentes
+                else:
+                    registros = [
+                        _serializar_estado(self.estados[ie], incluir_payload=False)
+                        for ie in ies if ie in self.estados
+                    ]
+                    self.armazenamento.registrar(registros)
+                    return
+
+            if transicoes >= self.max_transicoes:
+                with self._condicao_escrita:
+                    self._condicao_escrita.notify()
+        except Exception as e:
+            logger.error(f"Erro registrar transição: {e}")
+
+    def _loop_escrita(self):
+        """Thread escritora: grava lotes coalescidos de transições"""
+        while True:
+            with self._condicao_escrita:
+                if not self._encerrando:
+                    self._condicao_escrita.wait(self.intervalo_flush)
+                encerrar = self._encerrando
+            self.flush()
+            if encerrar:
+                return
+
+    def flush(self) -> bool:
+        """Grava imediatamente as transições pendentes da escrita assíncrona"""
+        with self._lock_escrita:
+            with self._lock:
+                if not self._sujas or self.selado:
+                    return True
+                registros = [
+                    _serializar_estado(self.estados[ie], incluir_payload=False)
+                    for ie in self._sujas if ie in self.estados
+                ]
+                sujas = self._sujas
+                self._sujas = {}
+                self._transicoes_pendentes = 0
+
+            try:
+                self.armazenamento.registrar(registros)
+                logger.debug(f"Flush de estado: {len(registros)} empresa(s)")
+                return True
+            except Exception as e:
+                logger.error(f"Erro no flush de estado: {e}")
+                with self._lock:
+                    # Devolve para a próxima tentativa sem sobrescrever transições mais novas
+                    for ie in sujas:
+                        self._sujas.setdefault(ie, None)
+                return False
+
     def salvar_estado(self) -> bool:
-        """Salva estado no arquivo JSON com serialização de datetime"""
+        """Persiste o estado completo no backend"""
+        if self.selado:
+            return True
         try:
-            dados = {}
-            for ie, estado in self.estados.items():
-                estado_dict = {
-                    'ie': estado.ie,
-                    'nome': estado.nome,
-                    'status': estado.status,
-                    'tentativas': estado.tentativas,
-                    'ultima_tentativa': estado.ultima_tentativa.isoformat() if estado.ultima_tentativa else None,
-                    'erro': estado.erro,
-                    'arquivos_baixados': estado.arquivos_baixados,
-                    'etapa_atual': estado.etapa_atual,
-                    'progresso_download': estado.progresso_download,
-                    'dados_sessao': estado.dados_sessao,
-                    'checkpoint_time': estado.checkpoint_time.isoformat() if estado.checkpoint_time else None,
-                    'total_notas': estado.total_notas,
-                    'notas_processadas': estado.notas_processadas
-                }
-                dados[ie] = estado_dict
-            
-            self.arquivo_estado.parent.mkdir(exist_ok=True)
-            with open(self.arquivo_estado, 'w', encoding='utf-8') as f:
-                json.dump(dados, f, indent=2, ensure_ascii=False)
+            with self._lock_escrita:
+                with self._lock:
+                    self._sujas = {}
+                    self._transicoes_pendentes = 0
+                    registros = self._serializar_todos()
+                self.armazenamento.salvar_tudo(registros)
             return True
         except Exception as e:
             logger.error(f"Erro salvar estado: {e}")
             return False
-    
+
+    def periodo_finalizado(self) -> bool:
+        """Todas as IEs do período estão concluídas ou com erro"""
+        with self._lock:
+            finalizadas = sum(len(self._ies_por_status.get(status, {})) for status in ('concluido', 'erro'))
+            return bool(self.estados) and finalizadas == len(self.estados)
+
+    def selar_periodo_se_finalizado(self) -> bool:
+        """Sela (comprime e arquiva) a partição quando o período está finalizado"""
+        if not self.particao or self.selado or not self.periodo_finalizado():
+            return False
+
+        try:
+            self._parar_escrita()
+            with self._lock_escrita, self._lock:
+                registros = {ie: _serializar_estado(estado) for ie, estado in self.estados.items()}
+                self.selado = True
+            self.armazenamento.fechar()
+            self.particao.selar(registros)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao selar período {self.particao.id}: {e}")
+            return False
+
+    @classmethod
+    def selar_periodos_finalizados(cls, arquivo_estado: str = "estado/processamento_empresas.json",
+                                   exceto: Optional[Tuple[str, str]] = None) -> int:
+        """Sela partições abertas de outros períodos que já foram finalizadas"""
+        arquivo_estado = Path(arquivo_estado)
+        id_exceto = ParticaoPeriodo.gerar_id(*exceto) if exceto else None
+        seladas = 0
+
+        for particao in ParticaoPeriodo.listar_abertas(arquivo_estado.parent):
+            if particao.id == id_exceto:
+                continue
+            try:
+                gerenciador = cls(
+                    str(arquivo_estado), particao=particao,
+                    armazenamento=detectar_tipo_armazenamento(particao.diretorio)
+                )
+                if gerenciador.selar_periodo_se_finalizado():
+                    seladas += 1
+                else:
+                    gerenciador.fechar()
+            except Exception as e:
+                logger.error(f"Erro ao verificar partição {particao.id}: {e}")
+
+        return seladas
+
+    def _parar_escrita(self):
+        if self._thread_escrita and self._thread_escrita.is_alive():
+            with self._condicao_escrita:
+                self._encerrando = True
+                self._condicao_escrita.notify()
+            self._thread_escrita.join()
+        self.flush()
+
+    def fechar(self):
+        """Encerra a thread escritora (com flush final) e libera o backend"""
+        if self.selado:
+            return
+        self._parar_escrita()
+
+        try:
+            self.armazenamento.fechar()
+        except Exception as e:
+            logger.warning(f"Erro ao fechar armazenamento de estado: {e}")
+
     def adicionar_empresas(self, empresas: List[Dict]):
         """Adiciona empresas para processamento"""
-        for empresa in empresas:
-            ie = empresa['ie']
-            if ie not in self.estados:
-                self.estados[ie] = EstadoEmpresa(
-                    ie=ie, 
-                    nome=empresa['nome'], 
-                    status='pendente'
-                )
-        self.salvar_estado()
+        novas = []
+        with self._lock:
+            for empresa in empresas:
+                ie = empresa['ie']
+                if ie not in self.estados:
+                    self.estados[ie] = EstadoEmpresa(
+                        ie=ie,
+                        nome=empresa['nome'],
+                        status='pendente'
+                    )
+                    novas.append(ie)
+
+            if novas:
+                self._registrar_transicao(*novas)
     
     def obter_proxima_empresa(self) -> Optional[Dict]:
         """Obtém próxima empresa para processamento"""
-        for ie, estado in self.estados.items():
-            if estado.tentativas == 0:
-                return {'ie': ie, 'nome': estado.nome}
-        
-        for ie, estado in self.estados.items():
-            if estado.status in ['pendente', 'erro'] and estado.tentativas == 1:
-                return {'ie': ie, 'nome': estado.nome}
+        with self._lock:
+            for fila in (self._sem_tentativa, self._retentativa):
+                ie = next(iter(fila), None)
+                if ie is not None:
+                    return {'ie': ie, 'nome': self.estados[ie].nome}
         
         return None
     
     def _atualizar_estado(self, ie: str, status: str, erro: str = None):
         """Atualiza estado de uma empresa"""
-        if ie in self.estados:
-            self.estados[ie].status = status
-            self.estados[ie].erro = erro
-            self.estados[ie].ultima_tentativa = datetime.now()
-            self.salvar_estado()
+        with self._lock:
+            if ie in self.estados:
+                self.estados[ie].status = status
+                self.estados[ie].erro = erro
+                self.estados[ie].ultima_tentativa = datetime.now()
+                self._registrar_transicao(ie)
     
     def marcar_em_andamento(self, empresa: Dict):
         """Marca empresa como em processamento"""
         ie = empresa['ie']
-        if ie in self.estados:
-            self.estados[ie].tentativas += 1
-            self._atualizar_estado(ie, 'em_andamento')
+        with self._lock:
+            if ie in self.estados:
+                self.estados[ie].tentativas += 1
+                self._atualizar_estado(ie, 'em_andamento')
     
     def marcar_concluido(self, empresa: Dict):
         """Marca empresa como concluída"""
@@ -159,11 +521,50 @@ class GerenciadorMultiplasEmpresas:
         """Marca empresa como pendente"""
         self._atualizar_estado(empresa['ie'], 'pendente', motivo)
     
+    def nome_se_pendente(self, ie: str) -> Optional[str]:
+        """Nome da empresa se a IE é do lote e ainda não foi concluída nem está em andamento"""
+        with self._lock:
+            estado = self.estados.get(ie)
+            if estado and estado.status not in ('concluido', 'em_andamento'):
+                return estado.nome
+            return None
+    
+    def registrar_colheita(self, ie: str, arquivos: List[str]):
+        """Conclui uma IE cujo pacote foi colhido do histórico durante o processamento de outra"""
+        with self._lock:
+            estado = self.estados.get(ie)
+            if estado is None:
+                return
+            estado.arquivos_baixados = estado.arquivos_baixados + list(arquivos)
+            estado.etapa_atual = 'concluido'
+            estado.progresso_download = 100
+            estado.checkpoint_time = datetime.now()
+            self._colhidas[ie] = None
+            self._atualizar_estado(ie, 'concluido')
+    
+    def foi_colhida(self, ie: str) -> bool:
+        return ie in self._colhidas
+    
+    def marcar_solicitado(self, empresa: Dict):
+        """Pipeline: pacote pedido ao servidor, aguardando a colheita no histórico"""
+        ie = empresa['ie']
+        with self._lock:
+            estado = self.estados.get(ie)
+            if estado is None:
+                return
+            estado.etapa_atual = 'solicitado'
+            estado.checkpoint_time = datetime.now()
+            estado.dados_sessao['solicitado_em'] = estado.checkpoint_time.isoformat()
+            self._atualizar_estado(ie, 'solicitado')
+    
+    def obter_solicitadas(self) -> List[Dict]:
+        with self._lock:
+            return [{'ie': ie, 'nome': self.estados[ie].nome}
+                    for ie in self._ies_por_status.get('solicitado', {})]
+    
     def obter_relatorio(self) -> Dict:
         """Relatório básico do processamento"""
-        status_count = {}
-        for estado in self.estados.values():
-            status_count[estado.status] = status_count.get(estado.status, 0) + 1
+        status_count = {status: len(ies) for status, ies in self._ies_por_status.items()}
         
         return {
             'total': len(self.estados),
@@ -179,13 +580,11 @@ class GerenciadorMultiplasEmpresas:
         empresas_sem_notas = []
         empresas_com_erro = []
         
-        for estado in self.estados.values():
-            if estado.status == 'concluido':
-                empresas_com_notas.append(estado.nome)
-            elif estado.status == 'pendente':
-                empresas_sem_notas.append(estado.nome)
-            elif estado.status == 'erro':
-                empresas_com_erro.append(estado.nome)
+        with self._lock:
+            for status, nomes in (('concluido', empresas_com_notas),
+                                  ('pendente', empresas_sem_notas),
+                                  ('erro', empresas_com_erro)):
+                nomes.extend(self.estados[ie].nome for ie in self._ies_por_status.get(status, {}))
         
         return {
             'total': len(self.estados),
@@ -200,9 +599,12 @@ class GerenciadorMultiplasEmpresas:
     
     def limpar_estado(self):
         """Limpa estado do processamento"""
-        self.estados.clear()
-        if self.arquivo_estado.exists():
-            self.arquivo_estado.unlink(missing_ok=True)
+        with self._lock_escrita, self._lock:
+            self.estados.clear()
+            self._sujas = {}
+            self._transicoes_pendentes = 0
+            self._reconstruir_indices()
+            self.armazenamento.limpar()
     
     def obter_estatisticas_tempo(self) -> Dict:
         """Estatísticas de tempo do processamento"""
@@ -231,26 +633,27 @@ class GerenciadorMultiplasEmpresas:
                 logger.warning(f"Tentativa de checkpoint para IE não registrada: {ie}")
                 return False
                 
-            estado = self.estados[ie]
-            estado.etapa_atual = etapa
-            estado.progresso_download = max(0, min(100, progresso)) 
-            estado.checkpoint_time = datetime.now()
+            with self._lock:
+                estado = self.estados[ie]
+                estado.etapa_atual = etapa
+                estado.progresso_download = max(0, min(100, progresso)) 
+                estado.checkpoint_time = datetime.now()
             
-            if dados_sessao:
-                estado.dados_sessao.update(dados_sessao)
+                if dados_sessao:
+                    estado.dados_sessao.update(dados_sessao)
                 
-            if total_notas is not None:
-                estado.total_notas = total_notas
+                if total_notas is not None:
+                    estado.total_notas = total_notas
                 
-            if notas_processadas is not None:
-                estado.notas_processadas = notas_processadas
+                if notas_processadas is not None:
+                    estado.notas_processadas = notas_processadas
             
-            if progresso < 100:
-                estado.status = 'em_andamento'
-            else:
-                estado.status = 'concluido'
+                if progresso < 100:
+                    estado.status = 'em_andamento'
+                else:
+                    estado.status = 'concluido'
             
-            self.salvar_estado()
+                self._registrar_transicao(ie)
             logger.debug(f"Checkpoint criado para {ie} - {etapa} ({progresso}%)")
             return True
             
@@ -265,8 +668,6 @@ class GerenciadorMultiplasEmpresas:
             if ie not in self.estados:
                 return False
                 
-            estado = self.estados[ie]
-            
             progressos_etapas = {
                 "inicio": 0,
                 "formulario": 20, 
@@ -276,15 +677,17 @@ class GerenciadorMultiplasEmpresas:
                 "concluido": 100
             }
             
-            estado.etapa_atual = etapa_anterior
-            estado.progresso_download = progressos_etapas.get(etapa_anterior, 0)
-            estado.tentativas += 1
-            estado.status = 'erro' if estado.tentativas >= 3 else 'pendente'
+            with self._lock:
+                estado = self.estados[ie]
+                estado.etapa_atual = etapa_anterior
+                estado.progresso_download = progressos_etapas.get(etapa_anterior, 0)
+                estado.tentativas += 1
+                estado.status = 'erro' if estado.tentativas >= 3 else 'pendente'
             
-            if motivo:
-                estado.erro = f"{motivo} (rollback para {etapa_anterior})"
+                if motivo:
+                    estado.erro = f"{motivo} (rollback para {etapa_anterior})"
             
-            self.salvar_estado()
+                self._registrar_transicao(ie)
             logger.info(f"Rollback realizado: {ie} -> {etapa_anterior} ({estado.progresso_download}%)")
             return True
             
@@ -292,33 +695,50 @@ class GerenciadorMultiplasEmpresas:
             logger.error(f"Erro no rollback para {empresa.get('ie', 'unknown')}: {e}")
             return False
             
+    def _descrever_sessao(self, ie: str, estado: EstadoEmpresa, tempo_desde_checkpoint: float) -> Dict:
+        return {
+            'ie': ie,
+            'nome': estado.nome,
+            'etapa': estado.etapa_atual,
+            'progresso': estado.progresso_download,
+            'tentativas': estado.tentativas,
+            'total_notas': estado.total_notas,
+            'notas_processadas': estado.notas_processadas,
+            'tempo_desde_checkpoint': int(tempo_desde_checkpoint)
+        }
+
+    def obter_sessao_interrompida(self, ie: str, tempo_maximo_minutos: int = 30) -> Optional[Dict]:
+        """Retorna a sessão interrompida de uma IE, se retomável (consulta O(1) no índice)"""
+        with self._lock:
+            checkpoint = self._interrompidas.get(ie)
+            if checkpoint is None:
+                return None
+
+            tempo_desde_checkpoint = (datetime.now() - checkpoint).total_seconds()
+            if tempo_desde_checkpoint > tempo_maximo_minutos * 60:
+                return None
+
+            return self._descrever_sessao(ie, self.estados[ie], tempo_desde_checkpoint)
+
     def recuperar_sessao_interrompida(self, tempo_maximo_minutos: int = 30) -> List[Dict]:
         """Encontra IEs com processamento interrompido para retomada"""
         try:
             empresas_interrompidas = []
             tempo_limite = tempo_maximo_minutos * 60 
+            agora = datetime.now()
             
-            for ie, estado in self.estados.items():
-
-                if (estado.status == 'em_andamento' and 
-                    estado.checkpoint_time and 
-                    estado.etapa_atual != 'concluido'):
+            with self._lock:
+                # Índice ordenado por checkpoint_time: percorre do mais recente e para no primeiro expirado
+                for ie in reversed(self._interrompidas):
+                    tempo_desde_checkpoint = (agora - self._interrompidas[ie]).total_seconds()
+                    if tempo_desde_checkpoint > tempo_limite:
+                        break
                     
-                    tempo_desde_checkpoint = (datetime.now() - estado.checkpoint_time).total_seconds()
-                    
-                    if tempo_desde_checkpoint <= tempo_limite:
-                        empresas_interrompidas.append({
-                            'ie': ie,
-                            'nome': estado.nome,
-                            'etapa': estado.etapa_atual,
-                            'progresso': estado.progresso_download,
-                            'tentativas': estado.tentativas,
-                            'total_notas': estado.total_notas,
-                            'notas_processadas': estado.notas_processadas,
-                            'tempo_desde_checkpoint': int(tempo_desde_checkpoint)
-                        })
-                        logger.info(f"Sessão interrompida encontrada: {ie} - {estado.etapa_atual} ({estado.progresso_download}%)")
+                    estado = self.estados[ie]
+                    empresas_interrompidas.append(self._descrever_sessao(ie, estado, tempo_desde_checkpoint))
+                    logger.debug(f"Sessão interrompida encontrada: {ie} - {estado.etapa_atual} ({estado.progresso_download}%)")
             
+            empresas_interrompidas.reverse()
             logger.info(f"Encontradas {len(empresas_interrompidas)} sessões interrompidas")
             return empresas_interrompidas
             
@@ -330,22 +750,31 @@ class GerenciadorMultiplasEmpresas:
         """Remove checkpoints mais antigos que X dias"""
         try:
             limite_tempo = datetime.now() - timedelta(days=dias)
-            removidos = 0
+            removidos = []
+            
+            if self.armazenamento.suporta_consultas:
+                candidatos = [
+                    (ie, self.estados[ie])
+                    for ie in self.armazenamento.consultar_checkpoints_antigos(limite_tempo.isoformat())
+                    if ie in self.estados
+                ]
+            else:
+                candidatos = list(self.estados.items())
             
-            for ie, estado in list(self.estados.items()):
+            for ie, estado in candidatos:
                 if (estado.checkpoint_time and 
                     estado.checkpoint_time < limite_tempo and 
                     estado.status in ['concluido', 'erro']):
                     
                     estado.dados_sessao = {}
                     estado.checkpoint_time = None
-                    removidos += 1
+                    removidos.append(ie)
             
-            if removidos > 0:
-                self.salvar_estado()
-                logger.info(f"Limpeza: {removidos} checkpoints antigos removidos")
+            if removidos:
+                self._registrar_transicao(*removidos)
+                logger.info(f"Limpeza: {len(removidos)} checkpoints antigos removidos")
             
-            return removidos
+            return len(removidos)
             
         except Exception as e:
             logger.error(f"Erro na limpeza de checkpoints: {e}")
@@ -0,0 +1,173 @@
+"""
+Sondagem adaptativa do histórico: quando reler cada solicitação de pacote
+"""
+import os
+import json
+import math
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARQUIVO_PRONTIDAO = "estado/prontidao_historico.json"
+AMOSTRAS_POR_FAIXA = 50
+LATENCIA_PADRAO = 5.0
+
+# Uma instância por arquivo, compartilhada entre os workers do processo
+_estatisticas_compartilhadas: Dict[str, 'EstatisticasProntidao'] = {}
+_lock_compartilhadas = threading.Lock()
+
+
+def _faixa_tamanho(total_notas: int) -> int:
+    """Ordem de grandeza do pacote: 0 (até 9 notas), 1 (até 99), 2 (até 999)..."""
+    return int(math.log10(max(1, total_notas)))
+
+
+class EstatisticasProntidao:
+    """Latências observadas (solicitação -> pacote pronto) por hora do dia e tamanho.
+
+    A estimativa usa a mediana da faixa mais específica com amostras:
+    hora + tamanho, depois só tamanho, depois todas.
+    """
+
+    def __init__(self, arquivo: str = ARQUIVO_PRONTIDAO):
+        self.arquivo = Path(arquivo)
+        self._lock = threading.Lock()
+        self._amostras: Dict[str, List[float]] = self._carregar()
+
+    @classmethod
+    def compartilhada(cls, arquivo: str = ARQUIVO_PRONTIDAO) -> 'EstatisticasProntidao':
+        with _lock_compartilhadas:
+            if arquivo not in _estatisticas_compartilhadas:
+                _estatisticas_compartilhadas[arquivo] = cls(arquivo)
+            return _estatisticas_compartilhadas[arquivo]
+
+    def _carregar(self) -> Dict[str, List[float]]:
+        try:
+            with open(self.arquivo, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Estatísticas de prontidão ilegíveis, ignoradas: {e}")
+            return {}
+
+    @staticmethod
+    def _chaves(hora: int, total_notas: int) -> List[str]:
+        faixa = _faixa_tamanho(total_notas)
+        return [f"{hora}:{faixa}", f"*:{faixa}", "*:*"]
+
+    def estimar(self, hora: int, total_notas: int) -> float:
+        with self._lock:
+            for chave in self._chaves(hora, total_notas):
+                amostras = self._amostras.get(chave)
+                if amostras:
+                    return median(amostras)
+        return LATENCIA_PADRAO
+
+    def registrar(self, hora: int, total_notas: int, latencia: float):
+        with self._lock:
+            for chave in self._chaves(hora, total_notas):
+                amostras = self._amostras.setdefault(chave, [])
+                amostras.append(round(latencia, 2))
+                del amostras[:-AMOSTRAS_POR_FAIXA]
+
+    def salvar(self):
+        with self._lock:
+            try:
+                self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+                temporario = self.arquivo.with_suffix('.tmp')
+                with open(temporario, 'w', encoding='utf-8') as f:
+                    json.dump(self._amostras, f)
+                os.replace(temporario, self.arquivo)
+            except Exception as e:
+                logger.warning(f"Erro ao salvar estatísticas de prontidão: {e}")
+
+
+@dataclass
+class SolicitacaoPendente:
+    ie: str
+    solicitado_em: float
+    total_notas: int
+    proxima_leitura: float
+    leituras: int = 0
+
+
+class PollerHistorico:
+    """Agenda as releituras do histórico para cada solicitação pendente.
+
+    A primeira leitura acontece perto da latência típica aprendida; a partir
+    daí, backoff exponencial com jitter até o pacote aparecer pronto. Sem
+    solicitações pendentes não há leitura.
+    """
+
+    def __init__(self, estatisticas: Optional[EstatisticasProntidao] = None,
+                 espera_minima: float = 1.0, espera_maxima: float = 60.0,
+                 fator: float = 2.0, jitter: float = 0.25):
+        self.estatisticas = estatisticas or EstatisticasProntidao.compartilhada()
+        self.espera_minima = espera_minima
+        self.espera_maxima = espera_maxima
+        self.fator = fator
+        self.jitter = jitter
+        self._pendentes: Dict[str, SolicitacaoPendente] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pendentes(self) -> List[str]:
+        with self._lock:
+            return list(self._pendentes)
+
+    def registrar(self, ie: str, total_notas: int = 0):
+        """Marca o momento da solicitação; a primeira leitura fica um pouco antes do típico"""
+        agora = time.time()
+        estimativa = self.estatisticas.estimar(datetime.now().hour, total_notas)
+        with self._lock:
+            self._pendentes[ie] = SolicitacaoPendente(
+                ie, agora, total_notas, agora + max(self.espera_minima, estimativa * 0.8)
+            )
+        logger.debug(f"Pacote de {ie} solicitado; pronto em ~{estimativa:.1f}s")
+
+    def espera(self, ies: Optional[Iterable[str]] = None) -> float:
+        """Segundos até a próxima leitura devida (das IEs informadas ou de todas)"""
+        with self._lock:
+            alvos = [self._pendentes[ie] for ie in (ies if ies is not None else self._pendentes)
+                     if ie in self._pendentes]
+            if not alvos:
+                return 0.0
+            return max(0.0, min(s.proxima_leitura for s in alvos) - time.time())
+
+    def processar_leitura(self, prontas: Iterable[str], lidas: Optional[Iterable[str]] = None):
+        """Após ler o histórico: registra a latência das prontas e adia as demais lidas"""
+        agora = time.time()
+        prontas = set(prontas)
+        with self._lock:
+            for ie in prontas:
+                solicitacao = self._pendentes.pop(ie, None)
+                if solicitacao is not None:
+                    latencia = agora - solicitacao.solicitado_em
+                    hora = datetime.fromtimestamp(solicitacao.solicitado_em).hour
+                    self.estatisticas.registrar(hora, solicitacao.total_notas, latencia)
+                    logger.debug(f"Pacote de {ie} pronto em {latencia:.1f}s ({solicitacao.leituras + 1} leitura(s))")
+
+            for ie in (lidas if lidas is not None else list(self._pendentes)):
+                solicitacao = self._pendentes.get(ie)
+                if solicitacao is None or solicitacao.proxima_leitura > agora:
+                    continue
+                solicitacao.leituras += 1
+                intervalo = min(self.espera_maxima, self.espera_minima * self.fator ** solicitacao.leituras)
+                intervalo *= 1 + random.uniform(-self.jitter, self.jitter)
+                solicitacao.proxima_leitura = agora + intervalo
+
+    def descartar(self, ie: str):
+        with self._lock:
+            self._pendentes.pop(ie, None)
+
+    def salvar(self):
+        self.estatisticas.salvar()
@@ -0,0 +1,137 @@
+"""
+Pool de navegadores para processar IEs em paralelo
+"""
+import time
+import queue
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+from .agendador_abas import AgendadorAbas
+from .timeout_manager import EstadoServidor
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_DOWNLOADS_WORKERS = Path.home() / "Downloads" / "SEFAZ" / ".workers"
+
+
+class GerenciadorPoolWorkers:
+    """Distribui as IEs de uma fila compartilhada entre N navegadores.
+
+    O automator principal (já autenticado) é o worker 0; os demais abrem seu
+    próprio Chrome, ProcessadorIE, GerenciadorDownload e diretório de download,
+    fazem login e passam a consumir a mesma fila. Estado e estatísticas de
+    tempo vão para o GerenciadorMultiplasEmpresas e o TimeoutManager do
+    automator principal.
+    """
+
+    def __init__(self, automator, num_workers: int, escalonamento_inicio: float = 3.0):
+        self.automator = automator
+        self.num_workers = num_workers
+        self.escalonamento_inicio = escalonamento_inicio
+        self.fila: "queue.Queue[Dict]" = queue.Queue()
+        self.total_empresas = 0
+        self.ies_com_notas = 0
+        self.processadas = 0
+        self._lock = threading.Lock()
+
+    def executar(self, empresas: List[Dict]) -> int:
+        """Processa todas as empresas com o pool; retorna quantas tinham notas"""
+        for empresa in empresas:
+            self.fila.put(empresa)
+        self.total_empresas = len(empresas)
+
+        num_workers = min(self.num_workers, len(empresas))
+        logger.info(f"Pool com {num_workers} workers para {len(empresas)} empresas")
+
+        threads = []
+        for id_worker in range(1, num_workers):
+            thread = threading.Thread(
+                target=self._executar_worker, args=(id_worker,),
+                name=f"worker-{id_worker}", daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+
+        self._consumir_fila(self.automator)
+
+        for thread in threads:
+            thread.join()
+
+        logger.info(f"Pool finalizado: {self.processadas}/{self.total_empresas} empresas processadas")
+        return self.ies_com_notas
+
+    def _executar_worker(self, id_worker: int):
+        # Import tardio: evita import circular com sefaz_automator
+        from .sefaz_automator import AutomatorSEFAZ
+
+        time.sleep(self.escalonamento_inicio * id_worker)
+        if self.fila.empty():
+            return
+
+        worker = AutomatorSEFAZ(
+            id_worker=id_worker,
+            diretorio_download=str(DIRETORIO_DOWNLOADS_WORKERS / f"worker_{id_worker}")
+        )
+        try:
+            if not worker.inicializar(
+                self.automator.config,
+                gerenciador_multi_ie=self.automator.gerenciador_multi_ie,
+                timeout_manager=self.automator.timeout_manager,
+                pos_processador=self.automator.pos_processador
+            ):
+                logger.error(f"Worker {id_worker}: falha na inicialização")
+                return
+
+            worker.etapas_fluxo = [
+                etapa for etapa in worker.etapas_fluxo if etapa[0] != "PROCESSAR_MULTIPLAS_IES"
+            ]
+            if not worker.executar_fluxo():
+                logger.error(f"Worker {id_worker}: falha no login, encerrando")
+                return
+
+            self._consumir_fila(worker)
+
+        except Exception as e:
+            logger.error(f"Worker {id_worker}: erro não esperado: {e}")
+        finally:
+            worker.encerrar_driver()
+
+    def _consumir_fila(self, worker):
+        num_abas = getattr(worker.config, 'abas', 1)
+        if num_abas > 1:
+            ies_com_notas = AgendadorAbas(worker, num_abas).executar(self._iterar_fila(worker))
+            with self._lock:
+                self.ies_com_notas += ies_com_notas
+            return
+
+        for empresa in self._iterar_fila(worker):
+            if worker.processar_empresa(empresa):
+                with self._lock:
+                    self.ies_com_notas += 1
+
+    def _iterar_fila(self, worker):
+        while True:
+            self._aguardar_se_servidor_instavel(worker)
+            try:
+                empresa = self.fila.get_nowait()
+            except queue.Empty:
+                return
+
+            with self._lock:
+                self.processadas += 1
+                posicao = self.processadas
+            logger.info(f"[worker {worker.id_worker}] [{posicao}/{self.total_empresas}] "
+                        f"{empresa['nome']} ({empresa['ie']})")
+            yield empresa
+
+    def _aguardar_se_servidor_instavel(self, worker):
+        """Portal instável: workers extras recuam antes de pegar a próxima IE"""
+        timeout_manager = self.automator.timeout_manager
+        if worker.id_worker == 0 or timeout_manager.estado_servidor != EstadoServidor.INSTAVEL:
+            return
+
+        espera = timeout_manager.calcular_backoff_erro('connection_error', worker.id_worker)
+        logger.info(f"Worker {worker.id_worker}: servidor instável, aguardando {espera:.0f}s")
+        time.sleep(espera)
@@ -0,0 +1,315 @@
+"""
+Pós-processamento dos pacotes baixados: extração em streaming e leitura das NFe
+"""
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .armazem_xml import ArmazemXML, calcular_sha256, carregar_manifesto, sha256_pacote
+
+logger = logging.getLogger(__name__)
+
+ARQUIVO_RESULTADOS = "estado/notas_processadas.jsonl"
+TAMANHO_BLOCO = 64 * 1024
+
+# (elemento pai, elemento) -> campo, dentro de infNFe e de infEvento
+CAMPOS_NFE: Dict[Tuple[str, str], str] = {
+    ('ide', 'dhEmi'): 'dh_emi',
+    ('ide', 'dEmi'): 'dh_emi',
+    ('emit', 'CNPJ'): 'cnpj_emitente',
+    ('emit', 'CPF'): 'cnpj_emitente',
+    ('dest', 'IE'): 'ie_destinatario',
+    ('ICMSTot', 'vNF'): 'v_nf',
+}
+CAMPOS_EVENTO: Dict[Tuple[str, str], str] = {
+    ('infEvento', 'chNFe'): 'chave',
+    ('infEvento', 'tpEvento'): 'tipo_evento',
+    ('infEvento', 'nSeqEvento'): 'seq_evento',
+    ('infEvento', 'dhEvento'): 'dh_emi',
+    ('detEvento', 'descEvento'): 'descricao_evento',
+}
+CONVERSORES = {'v_nf': float, 'seq_evento': int}
+
+
+@dataclass
+class NotaProcessada:
+    chave: str
+    membro: str
+    offset: int
+    tipo: str = "nfe"
+    cnpj_emitente: Optional[str] = None
+    ie_destinatario: Optional[str] = None
+    dh_emi: Optional[str] = None
+    v_nf: Optional[float] = None
+    tipo_evento: Optional[str] = None
+    seq_evento: Optional[int] = None
+    descricao_evento: Optional[str] = None
+
+
+@dataclass
+class ResultadoPosProcessamento:
+    arquivo: str
+    ie: str = ""
+    sha256: str = ""
+    membros: int = 0
+    notas: List[NotaProcessada] = field(default_factory=list)
+    erros: List[str] = field(default_factory=list)
+    integro: bool = True
+    duracao: float = 0.0
+
+
+class _LeitorEspelhado:
+    """Repassa a leitura do membro ao parser e grava os mesmos blocos em disco"""
+
+    def __init__(self, origem, destino):
+        self.origem = origem
+        self.destino = destino
+
+    def read(self, tamanho: int = -1) -> bytes:
+        bloco = self.origem.read(tamanho)
+        self.destino.write(bloco)
+        return bloco
+
+
+def _nome_local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def ler_documentos_xml(fluxo, membro: str = "", offset: int = 0) -> List[NotaProcessada]:
+    """Lê NFe (infNFe) e eventos (infEvento) de um XML em streaming com iterparse.
+
+    Num procEventoNFe só o infEvento de `evento` vira registro: o de
+    `retEvento` é o protocolo da SEFAZ para o mesmo evento.
+    """
+    notas = []
+    caminho: List[str] = []
+    atual: Optional[NotaProcessada] = None
+    campos: Dict[Tuple[str, str], str] = {}
+
+    for evento, elemento in ET.iterparse(fluxo, events=('start', 'end')):
+        nome = _nome_local(elemento.tag)
+        if evento == 'start':
+            caminho.append(nome)
+            if nome == 'infNFe':
+                atual = NotaProcessada(chave=elemento.get('Id', '')[-44:], membro=membro, offset=offset)
+                campos = CAMPOS_NFE
+            elif nome == 'infEvento' and caminho[-2:-1] == ['evento']:
+                atual = NotaProcessada(chave="", membro=membro, offset=offset, tipo="evento")
+                campos = CAMPOS_EVENTO
+            continue
+
+        caminho.pop()
+        if atual is None:
+            continue
+
+        if nome in ('infNFe', 'infEvento'):
+            if atual.tipo == "evento" and atual.chave and not atual.cnpj_emitente:
+                # Chave de acesso: cUF(2) AAMM(4) CNPJ do emitente(14) ...
+                atual.cnpj_emitente = atual.chave[6:20]
+            notas.append(atual)
+            atual = None
+            elemento.clear()
+        elif caminho and (caminho[-1], nome) in campos:
+            campo = campos[(caminho[-1], nome)]
+            texto = (elemento.text or "").strip()
+            if getattr(atual, campo) is None or campo == 'chave':
+                setattr(atual, campo, CONVERSORES.get(campo, str)(texto) if texto else None)
+
+    return notas
+
+
+def processar_zip(caminho: str, ie: str = "", extrair_para: Optional[str] = None,
+                  sha256: Optional[str] = None) -> ResultadoPosProcessamento:
+    """Percorre o ZIP membro a membro, sem descompactar em disco (salvo `extrair_para`).
+
+    Cada membro é lido até o fim, o que faz o zipfile conferir o CRC-32;
+    membros corrompidos entram em `erros` sem interromper os demais.
+    Executado nos processos do pool: só recebe e devolve dados serializáveis.
+    """
+    inicio = time.time()
+    resultado = ResultadoPosProcessamento(arquivo=str(caminho), ie=ie)
+    if not os.path.exists(caminho):
+        # Modo armazém: o ZIP virou entrada do manifesto da pasta
+        entrada = carregar_manifesto(Path(caminho).parent).get(Path(caminho).name)
+        if entrada is not None:
+            _processar_objetos(entrada, resultado)
+            resultado.duracao = time.time() - inicio
+            return resultado
+
+    try:
+        resultado.sha256 = sha256 or calcular_sha256(caminho)
+        with zipfile.ZipFile(caminho) as pacote:
+            for info in pacote.infolist():
+                if info.is_dir():
+                    continue
+                resultado.membros += 1
+                try:
+                    resultado.notas.extend(_processar_membro(pacote, info, extrair_para))
+                except zipfile.BadZipFile as e:
+                    resultado.erros.append(f"{info.filename}: {e}")
+                    resultado.integro = False
+                except (ET.ParseError, ValueError) as e:
+                    resultado.erros.append(f"{info.filename}: {e}")
+    except (OSError, zipfile.BadZipFile) as e:
+        resultado.erros.append(str(e))
+        resultado.integro = False
+
+    resultado.duracao = time.time() - inicio
+    return resultado
+
+
+def _processar_objetos(entrada: Dict, resultado: ResultadoPosProcessamento):
+    armazem = ArmazemXML()
+    resultado.sha256 = entrada['sha256']
+    for membro, sha256 in entrada.get('membros', {}).items():
+        resultado.membros += 1
+        try:
+            with open(armazem.caminho_objeto(sha256), 'rb') as objeto:
+                resultado.notas.extend(ler_documentos_xml(objeto, membro))
+        except OSError as e:
+            resultado.erros.append(f"{membro}: {e}")
+            resultado.integro = False
+        except (ET.ParseError, ValueError) as e:
+            resultado.erros.append(f"{membro}: {e}")
+
+
+def _processar_membro(pacote: zipfile.ZipFile, info: zipfile.ZipInfo,
+                      extrair_para: Optional[str]) -> List[NotaProcessada]:
+    with pacote.open(info) as membro:
+        if not info.filename.lower().endswith('.xml'):
+            # Sem XML para ler: só a conferência do CRC
+            while membro.read(TAMANHO_BLOCO):
+                pass
+            return []
+
+        if extrair_para is None:
+            notas = ler_documentos_xml(membro, info.filename, info.header_offset)
+            while membro.read(TAMANHO_BLOCO):
+                pass
+            return notas
+
+        destino = Path(extrair_para) / os.path.basename(info.filename)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        with open(destino, 'wb') as saida:
+            espelho = _LeitorEspelhado(membro, saida)
+            notas = ler_documentos_xml(espelho, info.filename, info.header_offset)
+            while espelho.read(TAMANHO_BLOCO):
+                pass
+        return notas
+
+
+class GerenciadorPosProcessamento:
+    """Processa os ZIPs em segundo plano enquanto o navegador segue para a próxima IE.
+
+    O GerenciadorDownload enfileira cada pacote organizado; uma thread
+    despachante repassa a fila a um ProcessPoolExecutor, e os resultados
+    (uma linha JSON por ZIP, com as notas e eventos lidos) são gravados em
+    `estado/notas_processadas.jsonl` conforme ficam prontos e, com catálogo,
+    indexados nele; pacotes de conteúdo já catalogado nem vão ao pool.
+    Compartilhado entre os workers do pool de navegadores.
+    """
+
+    def __init__(self, processos: int = 2, extrair: bool = False,
+                 arquivo_resultados: str = ARQUIVO_RESULTADOS, catalogo=None):
+        self.processos = max(1, processos)
+        self.extrair = extrair
+        self.catalogo = catalogo
+        self.arquivo_resultados = Path(arquivo_resultados)
+        self.fila: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue()
+        self.estatisticas = {'pacotes': 0, 'notas': 0, 'erros': 0, 'repetidos': 0}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._despachante: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        with self._lock:
+            if self._despachante is not None:
+                return
+            self._despachante = threading.Thread(target=self._despachar, name="pos_processamento", daemon=True)
+            self._despachante.start()
+
+    def enfileirar(self, caminho: Path, ie: str = ""):
+        """Chamado logo após o ZIP chegar à pasta da empresa; não bloqueia"""
+        self.iniciar()
+        self.fila.put((str(caminho), ie))
+
+    def _despachar(self):
+        # O pool (e o custo de criar os processos) só existe a partir do primeiro pacote
+        while True:
+            item = self.fila.get()
+            if item is None:
+                return
+            caminho, ie = item
+            extrair_para = str(Path(caminho).with_suffix('')) if self.extrair else None
+            try:
+                sha256 = None
+                if self.catalogo is not None:
+                    sha256 = sha256_pacote(caminho)
+                    if self.catalogo.catalogado(sha256):
+                        logger.debug(f"{Path(caminho).name} já catalogado, ignorado")
+                        with self._lock:
+                            self.estatisticas['repetidos'] += 1
+                        continue
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(self.processos)
+                futuro = self._executor.submit(processar_zip, caminho, ie, extrair_para, sha256)
+            except Exception as e:
+                logger.error(f"Erro ao agendar pós-processamento de {caminho}: {e}")
+                continue
+            futuro.add_done_callback(self._registrar)
+
+    def _registrar(self, futuro: Future):
+        try:
+            resultado: ResultadoPosProcessamento = futuro.result()
+        except Exception as e:
+            logger.error(f"Falha no pós-processamento: {e}")
+            with self._lock:
+                self.estatisticas['erros'] += 1
+            return
+
+        for erro in resultado.erros:
+            logger.warning(f"{Path(resultado.arquivo).name}: {erro}")
+        logger.debug(f"Pós-processado {Path(resultado.arquivo).name}: {len(resultado.notas)} documento(s) "
+                     f"em {resultado.membros} membro(s), {resultado.duracao:.2f}s")
+
+        with self._lock:
+            self.estatisticas['pacotes'] += 1
+            self.estatisticas['notas'] += len(resultado.notas)
+            self.estatisticas['erros'] += len(resultado.erros)
+            try:
+                self.arquivo_resultados.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.arquivo_resultados, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(asdict(resultado), ensure_ascii=False) + "\n")
+            except Exception as e:
+                logger.warning(f"Erro ao gravar resultado do pós-processamento: {e}")
+
+        if self.catalogo is not None:
+            try:
+                self.catalogo.indexar(resultado)
+            except Exception as e:
+                logger.warning(f"Erro ao indexar {Path(resultado.arquivo).name} no catálogo: {e}")
+
+    def encerrar(self):
+        """Aguarda os pacotes ainda em processamento (só a cauda do último download)"""
+        if self._despachante is not None:
+            self.fila.put(None)
+            self._despachante.join()
+            self._despachante = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.catalogo is not None:
+            self.catalogo.fechar()
+        if self.estatisticas['pacotes'] or self.estatisticas['repetidos']:
+            logger.info(f"Pós-processamento: {self.estatisticas['pacotes']} pacote(s), "
+                        f"{self.estatisticas['notas']} documento(s), {self.estatisticas['erros']} erro(s), "
+                        f"{self.estatisticas['repetidos']} já catalogado(s)")
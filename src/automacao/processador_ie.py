@@ -3,7 +3,8 @@ Processador consolidado de IEs individuais
 """
 import logging
 import time
-from typing import Dict, Optional
+import threading
+from typing import Dict, Generator, Optional
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 
@@ -11,10 +12,19 @@ from .timeout_manager import TipoOperacao
 
 from .retry_manager import gerenciador_retry
 from .iframe_manager import GerenciadorIframe
+from .motor_espera import IFRAME_NETACCESS
 from selenium.webdriver.common.keys import Keys
 
 logger = logging.getLogger(__name__)
 
+# Um único console para todos os workers: prompts de CAPTCHA são atendidos um por vez
+_lock_console = threading.Lock()
+
+# Etapas até o download, na ordem; a retomada no modo multi-abas recomeça da etapa salva
+ETAPAS_CONSULTA = ('formulario', 'captcha', 'consulta', 'validacao')
+RETOMADA_EM_ETAPAS = {etapa: etapa for etapa in ETAPAS_CONSULTA}
+RETOMADA_EM_ETAPAS['download'] = 'validacao'     # confere a tabela de resultados antes de baixar
+
 class ProcessadorIE:
     """Consolida toda lógica de processamento de IEs individuais"""
     
@@ -24,6 +34,8 @@ class ProcessadorIE:
         self.config = automator.config
         self.gerenciador_download = automator.gerenciador_download
         self.gerenciador_iframe = GerenciadorIframe(automator.driver)
+        self.motor_espera = automator.motor_espera
+        self.consulta_driver = automator.consulta_driver
         self.gerenciador_estado = None
         if hasattr(automator, 'gerenciador_multi_ie'):
             self.gerenciador_estado = automator.gerenciador_multi_ie
@@ -50,18 +62,104 @@ class ProcessadorIE:
                 return self._retomar_processamento(empresa, estado_anterior)
             return self._executar_fluxo_com_checkpoints(empresa)
     
+    def solicitar_pacote_ie(self, ie: str, nome_empresa: str) -> bool:
+        """Pipeline, fase 1: consulta a IE e pede o pacote, sem esperar a geração no servidor"""
+        logger.info(f"Solicitando pacote: {ie} - Empresa: {nome_empresa}")
+        empresa = {'ie': ie, 'nome': nome_empresa}
+        
+        # A solicitação anterior deixou o histórico aberto
+        self._voltar_pagina_consulta()
+        
+        if self.gerenciador_download._executar_etapas(self._etapas_consulta(empresa)) is None:
+            return False
+        
+        if not self.gerenciador_download.solicitar_pacote(ie):
+            self._rollback_etapa(empresa, "validacao", "Falha ao solicitar pacote")
+            return False
+        
+        if self.gerenciador_estado:
+            self.gerenciador_estado.marcar_solicitado(empresa)
+        return True
+    
+    def processar_ie_em_etapas(self, ie: str, nome_empresa: str, agendador) -> Generator[float, None, bool]:
+        """Fluxo da IE para o modo multi-abas: cada yield devolve os segundos até a aba ter trabalho pronto"""
+        logger.info(f"Processando IE: {ie} - Empresa: {nome_empresa} (aba)")
+        empresa = {'ie': ie, 'nome': nome_empresa}
+        
+        desde = ETAPAS_CONSULTA[0]
+        estado_anterior = self._verificar_estado_anterior(ie)
+        if estado_anterior:
+            desde = RETOMADA_EM_ETAPAS.get(estado_anterior['etapa'], desde)
+            logger.info(f"Retomando processamento de {ie} da etapa: {desde}")
+        
+        total_notas = yield from self._etapas_consulta(empresa, desde, agendador)
+        if total_notas is None:
+            return False
+        
+        from datetime import datetime
+        data_referencia = datetime.strptime(self.config.data_inicio, "%d/%m/%Y")
+        resultado = yield from self.gerenciador_download.executar_fluxo_download_em_etapas(
+            nome_empresa, data_referencia, agendador, ie=ie
+        )
+        logger.info(f"=== RESULTADO DOWNLOAD: {resultado.total_baixado}/{resultado.total_encontrado} arquivos ===")
+        
+        if resultado.total_baixado > 0:
+            self._voltar_pagina_consulta()
+            self._criar_checkpoint(empresa, "concluido", 100, total_notas=total_notas)
+            return True
+        return False
+    
+    def _etapas_consulta(self, empresa: Dict, desde: str = "formulario",
+                         agendador=None) -> Generator[float, None, Optional[int]]:
+        """Formulário → CAPTCHA → consulta → validação, a partir da etapa `desde`.
+        
+        Devolve o total de notas da tabela, ou None se o fluxo parou (falha ou
+        nenhuma nota), com checkpoint e rollback já feitos. Só cede (yield) com
+        agendador, enquanto o servidor responde à consulta.
+        """
+        ie = empresa['ie']
+        etapas = ETAPAS_CONSULTA[ETAPAS_CONSULTA.index(desde):]
+        
+        if 'formulario' in etapas:
+            self._criar_checkpoint(empresa, "formulario", 20)
+            if not self._preencher_formulario(ie):
+                self._rollback_etapa(empresa, "inicio", "Falha no formulário")
+                return None
+        
+        if 'captcha' in etapas:
+            self._criar_checkpoint(empresa, "captcha", 40)
+            if not self._aguardar_captcha_manual():
+                self._rollback_etapa(empresa, "formulario", "Falha no CAPTCHA")
+                return None
+        
+        if 'consulta' in etapas:
+            self._criar_checkpoint(empresa, "consulta", 60)
+            if not self._executar_consulta(ie):
+                self._rollback_etapa(empresa, "captcha", "Falha na consulta")
+                return None
+            if agendador:
+                yield agendador.espera('consulta')
+        
+        self._criar_checkpoint(empresa, "validacao", 70)
+        if not self._validar_resultados(ie):
+            logger.info("Nenhuma nota encontrada")
+            self._criar_checkpoint(empresa, "concluido", 100, total_notas=0)
+            return None
+        
+        total_notas = self.gerenciador_download.tem_notas_tabela()
+        self._criar_checkpoint(empresa, "download", 80, total_notas=total_notas)
+        return total_notas
+    
     def _verificar_estado_anterior(self, ie: str) -> Optional[Dict]:
         """Verifica se existe estado anterior para retomada"""
         if not self.gerenciador_estado:
             return None
             
         try:
-            sessoes_interrompidas = self.gerenciador_estado.recuperar_sessao_interrompida()
-            for sessao in sessoes_interrompidas:
-                if sessao['ie'] == ie:
-                    logger.info(f"Encontrado estado anterior para {ie}: {sessao['etapa']} ({sessao['progresso']}%)")
-                    return sessao
-            return None
+            sessao = self.gerenciador_estado.obter_sessao_interrompida(ie)
+            if sessao:
+                logger.info(f"Encontrado estado anterior para {ie}: {sessao['etapa']} ({sessao['progresso']}%)")
+            return sessao
         except Exception as e:
             logger.error(f"Erro ao verificar estado anterior: {e}")
             return None
@@ -96,20 +194,17 @@ class ProcessadorIE:
     def _retomar_captcha(self, empresa: Dict, estado_anterior: Dict) -> bool:
         """Retoma da etapa de CAPTCHA"""
         logger.info(f"Retomando CAPTCHA para {empresa['ie']}")
-        self._criar_checkpoint(empresa, "captcha", 40)
-        return self._executar_desde_captcha(empresa)
+        return self._executar_desde(empresa, "captcha")
     
     def _retomar_consulta(self, empresa: Dict, estado_anterior: Dict) -> bool:
         """Retoma da etapa de consulta"""
         logger.info(f"Retomando consulta para {empresa['ie']}")
-        self._criar_checkpoint(empresa, "consulta", 60)
-        return self._executar_desde_consulta(empresa)
+        return self._executar_desde(empresa, "consulta")
     
     def _retomar_validacao(self, empresa: Dict, estado_anterior: Dict) -> bool:
         """Retoma da etapa de validação"""
         logger.info(f"Retomando validação para {empresa['ie']}")
-        self._criar_checkpoint(empresa, "validacao", 70)
-        return self._executar_desde_validacao(empresa)
+        return self._executar_desde(empresa, "validacao")
         
     def _retomar_download(self, empresa: Dict, estado_anterior: Dict) -> bool:
         """Retoma o processo na etapa de download"""
@@ -127,43 +222,15 @@ class ProcessadorIE:
             logger.error(f"Erro na retomada do download: {e}")
             return self._executar_fluxo_com_checkpoints(empresa)
     
-    def _executar_desde_captcha(self, empresa: Dict) -> bool:
-        """Executa fluxo a partir do CAPTCHA"""
-        ie = empresa['ie']
-        
-        self._criar_checkpoint(empresa, "captcha", 40)
-        if not self._aguardar_captcha_manual():
-            self._rollback_etapa(empresa, "formulario", "Falha no CAPTCHA")
+    def _executar_desde(self, empresa: Dict, desde: str) -> bool:
+        """Fluxo sequencial a partir da etapa `desde`, até o download"""
+        fluxo = self._etapas_consulta(empresa, desde)
+        total_notas = self.gerenciador_download._executar_etapas(fluxo)
+        if total_notas is None:
             return False
         
-        return self._executar_desde_consulta(empresa)
-    
-    def _executar_desde_consulta(self, empresa: Dict) -> bool:
-        """Executa fluxo a partir da consulta"""
-        ie = empresa['ie']
-        
-        self._criar_checkpoint(empresa, "consulta", 60)
-        if not self._executar_consulta(ie):
-            self._rollback_etapa(empresa, "captcha", "Falha na consulta")
-            return False
-        
-        return self._executar_desde_validacao(empresa)
-    
-    def _executar_desde_validacao(self, empresa: Dict) -> bool:
-        """Executa fluxo a partir da validação"""
-        ie = empresa['ie']
-        
-        self._criar_checkpoint(empresa, "validacao", 70)
-        if not self._validar_resultados(ie):
-            logger.info("Nenhuma nota encontrada")
-            self._criar_checkpoint(empresa, "concluido", 100, total_notas=0)
-            return False
-        
-        total_notas = self.gerenciador_download.tem_notas_tabela()
-        self._criar_checkpoint(empresa, "download", 80, total_notas=total_notas)
-        
         if total_notas > 0:
-            sucesso = self._processar_download(ie, empresa['nome'])
+            sucesso = self._processar_download(empresa['ie'], empresa['nome'])
             if sucesso:
                 self._criar_checkpoint(empresa, "concluido", 100, total_notas=total_notas)
             return sucesso
@@ -174,14 +241,7 @@ class ProcessadorIE:
     def _executar_fluxo_com_checkpoints(self, empresa: Dict) -> bool:
         """Fluxo principal com checkpoints em cada etapa"""
         try:
-            ie = empresa['ie']
-            
-            self._criar_checkpoint(empresa, "formulario", 20)
-            if not self._preencher_formulario(ie):
-                self._rollback_etapa(empresa, "inicio", "Falha no formulário")
-                return False
-            
-            return self._executar_desde_captcha(empresa)
+            return self._executar_desde(empresa, "formulario")
                 
         except Exception as e:
             logger.error(f"Erro não esperado no fluxo: {e}")
@@ -191,9 +251,11 @@ class ProcessadorIE:
     def _criar_checkpoint(self, empresa: Dict, etapa: str, progresso: int, total_notas: int = None):
         """Wrapper para criar checkpoint"""
         if self.gerenciador_estado:
+            # Só URL e título, numa ida ao driver (ou nenhuma, com o estado da época em cache)
+            pagina = self.consulta_driver.pagina()
             dados_sessao = {
-                'url_atual': self.driver.current_url,
-                'titulo': self.driver.title
+                'url_atual': pagina['url'],
+                'titulo': pagina['titulo']
             }
             
             if total_notas is not None:
@@ -216,7 +278,7 @@ class ProcessadorIE:
         
         def tentar_preencher():
             nonlocal sucesso
-            time.sleep(2)
+            self.motor_espera.elemento_visivel_iframe((By.ID, "cmpDataInicial"), obrigatoria=False)
             
             with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
                 if not self._preencher_data_com_mascara("cmpDataInicial", self.config.data_inicio):
@@ -330,8 +392,7 @@ class ProcessadorIE:
     def _verificar_data_preenchida(self, campo_id: str, data_esperada: str) -> bool:
         """Verifica se a data foi preenchida corretamente"""
         try:
-            elemento = self.driver.find_element(By.ID, campo_id)
-            valor_obtido = elemento.get_attribute("value") or ""
+            valor_obtido = self.consulta_driver.campos([campo_id])[campo_id].get('valor') or ""
             
             return valor_obtido and data_esperada in valor_obtido
         except:
@@ -359,30 +420,38 @@ class ProcessadorIE:
     def _aguardar_captcha_manual(self) -> bool:
         """Aguarda resolução manual com verificação opcional"""
         logger.info("Aguardando resolução manual do CAPTCHA")
+        id_worker = getattr(self.automator, 'id_worker', 0)
         
-        print("\n" + "="*50)
-        print("RESOLUÇÃO MANUAL DO CAPTCHA")
-        print("="*50)
-        print("1. Resolva o CAPTCHA no navegador")
-        print("2. Aguarde processamento completo")
-        print("3. Pressione ENTER quando concluído")
-        print("="*50)
+        with _lock_console:
+            print("\n" + "="*50)
+            print("RESOLUÇÃO MANUAL DO CAPTCHA")
+            if id_worker:
+                print(f"Navegador do worker {id_worker}")
+            print("="*50)
+            print("1. Resolva o CAPTCHA no navegador")
+            print("2. Aguarde processamento completo")
+            print("3. Pressione ENTER quando concluído")
+            print("="*50)
+            
+            try:
+                input("Pressione ENTER após resolver o CAPTCHA: ")
+            except Exception as e:
+                logger.error(f"Erro no CAPTCHA manual: {e}")
+                return False
         
-        try:
-            input("Pressione ENTER após resolver o CAPTCHA: ")
-            time.sleep(2)
-            return True
-        except Exception as e:
-            logger.error(f"Erro no CAPTCHA manual: {e}")
-            return False
+        self.motor_espera.rede_ociosa(iframe=IFRAME_NETACCESS)
+        return True
     
     def _executar_consulta(self, ie: str) -> bool:
         def tentar_consultar():
             with self.gerenciador_iframe.contexto_iframe((By.ID, "iNetaccess")):
                 try:
-                    campo_ie = self.driver.find_element(By.ID, "cmpNumIeDest")
-                    if campo_ie.get_attribute("value") != ie:
+                    campo = self.consulta_driver.campos(["cmpNumIeDest"])["cmpNumIeDest"]
+                    if not campo['presente']:
+                        raise ValueError("cmpNumIeDest ausente")
+                    if campo.get('valor') != ie:
                         logger.warning("IE não preenchida - preenchendo novamente")
+                        campo_ie = self.driver.find_element(By.ID, "cmpNumIeDest")
                         campo_ie.clear()
                         campo_ie.send_keys(ie)
                 except:
@@ -409,7 +478,9 @@ class ProcessadorIE:
             from datetime import datetime
             data_referencia = datetime.strptime(self.config.data_inicio, "%d/%m/%Y")
             
-            resultado = self.gerenciador_download.executar_fluxo_download_completo(nome_empresa, data_referencia)
+            resultado = self.gerenciador_download.executar_fluxo_download_completo(
+                nome_empresa, data_referencia, ie=ie
+            )
             logger.info(f"=== RESULTADO DOWNLOAD: {resultado.total_baixado}/{resultado.total_encontrado} arquivos ===")
             logger.info(f"=== ERROS: {resultado.erros} ===")
             
@@ -424,25 +495,17 @@ class ProcessadorIE:
     def _voltar_pagina_consulta(self) -> bool:
         """Volta para página de consulta"""
         try:
-            iframe = self.driver.find_element(By.ID, "iNetaccess")
-            self.driver.switch_to.frame(iframe)
-            
-            try:
-                botao_nova_consulta = self.driver.find_element(
-                    By.XPATH, "//button[contains(text(), 'Nova Consulta')]"
-                )
-                if botao_nova_consulta.is_displayed():
-                    botao_nova_consulta.click()
-                    time.sleep(2)
-            except:
-                pass
-            
-            self.driver.switch_to.default_content()
+            with self.gerenciador_iframe.contexto_iframe(IFRAME_NETACCESS):
+                try:
+                    botao_nova_consulta = self.driver.find_element(
+                        By.XPATH, "//button[contains(text(), 'Nova Consulta')]"
+                    )
+                    if botao_nova_consulta.is_displayed():
+                        botao_nova_consulta.click()
+                        self.motor_espera.elemento_visivel((By.ID, "cmpNumIeDest"), obrigatoria=False)
+                except:
+                    pass
             return True
             
         except Exception:
-            try:
-                self.driver.switch_to.default_content()
-            except:
-                pass
             return True
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Registro dos seletores alternativos com estatísticas de acerto persistidas e reordenação
+"""
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..config.constants import SELECTORS
+
+logger = logging.getLogger(__name__)
+
+ARQUIVO_SELETORES = "estado/seletores.json"
+LIMITE_REBAIXAMENTO = 5         # tentativas seguidas sem acerto até o seletor ir para o fim da fila
+INTERVALO_GRAVACAO = 30.0       # segundos mínimos entre gravações automáticas
+PESO_LATENCIA = 0.3             # peso da última medida na média móvel da latência
+
+Seletor = Tuple[str, str]
+
+
+def _chave(seletor: Seletor) -> str:
+    return f"{seletor[0]}={seletor[1]}"
+
+
+class RegistroSeletores:
+    """Ordem das alternativas de cada alvo de `SELECTORS['alvos']` pelo histórico.
+
+    Só buscas em que alguma alternativa casou geram estatística: a vencedora
+    ganha um acerto e a latência da busca, as tentadas antes dela ganham uma
+    tentativa sem acerto (alvo ausente da página não diz nada sobre os
+    seletores). Ordena por taxa de acerto e latência; seletor que erra
+    LIMITE_REBAIXAMENTO vezes seguidas vai para o fim, mesmo que já tenha
+    acertado antes (o portal mudou), e volta ao primeiro acerto. As estatísticas
+    ficam em `estado/seletores.json` e são recarregadas na próxima execução.
+    Compartilhado entre os workers do pool.
+    """
+
+    def __init__(self, arquivo: str = ARQUIVO_SELETORES, alvos: Optional[Dict[str, List[Seletor]]] = None):
+        self.arquivo = Path(arquivo)
+        self.alvos = alvos if alvos is not None else SELECTORS['alvos']
+        self._lock = threading.RLock()
+        self._estatisticas: Optional[Dict[str, Dict[str, Dict]]] = None
+        self._alterado = False
+        self._ultima_gravacao = time.time()
+
+    @property
+    def estatisticas(self) -> Dict[str, Dict[str, Dict]]:
+        with self._lock:
+            if self._estatisticas is None:
+                self._estatisticas = self._carregar()
+            return self._estatisticas
+
+    def _carregar(self) -> Dict[str, Dict[str, Dict]]:
+        try:
+            with open(self.arquivo, 'r', encoding='utf-8') as f:
+                estatisticas = json.load(f)
+            logger.debug(f"Estatísticas de seletores carregadas: {self.arquivo}")
+            return estatisticas
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Estatísticas de seletores ignoradas ({self.arquivo}): {e}")
+            return {}
+
+    def ordenar(self, alvo: str) -> List[Seletor]:
+        """Alternativas do alvo na ordem em que devem ser tentadas"""
+        alternativas = self.alvos[alvo]
+        with self._lock:
+            estatisticas = self.estatisticas.get(alvo, {})
+
+            def prioridade(item):
+                indice, seletor = item
+                estatistica = estatisticas.get(_chave(seletor), {})
+                acertos = estatistica.get('acertos', 0)
+                tentativas = estatistica.get('tentativas', 0)
+                rebaixado = estatistica.get('falhas_seguidas', 0) >= LIMITE_REBAIXAMENTO
+                taxa = (acertos + 1) / (tentativas + 2)
+                return rebaixado, -taxa, estatistica.get('latencia', float('inf')), indice
+
+            return [seletor for _, seletor in sorted(enumerate(alternativas), key=prioridade)]
+
+    def registrar(self, alvo: str, tentados: List[Seletor], vencedor: Seletor, latencia: float):
+        """`tentados` inclui o vencedor; os anteriores a ele contam como tentativa sem acerto"""
+        with self._lock:
+            estatisticas = self.estatisticas.setdefault(alvo, {})
+            for seletor in tentados:
+                estatistica = estatisticas.setdefault(_chave(seletor), {'acertos': 0, 'tentativas': 0})
+                estatistica['tentativas'] += 1
+                if seletor != vencedor:
+                    estatistica['falhas_seguidas'] = estatistica.get('falhas_seguidas', 0) + 1
+                else:
+                    estatistica['acertos'] += 1
+                    estatistica['falhas_seguidas'] = 0
+                    anterior = estatistica.get('latencia')
+                    estatistica['latencia'] = round(latencia if anterior is None else
+                                                    anterior + PESO_LATENCIA * (latencia - anterior), 4)
+                    break
+            self._alterado = True
+            if time.time() - self._ultima_gravacao >= INTERVALO_GRAVACAO:
+                self.salvar()
+
+    def encontrar(self, driver, alvo: str, condicao: Optional[Callable] = None):
+        """Primeiro elemento (que satisfaça `condicao`) entre as alternativas, na ordem do histórico"""
+        inicio = time.time()
+        tentados = []
+        for seletor in self.ordenar(alvo):
+            tentados.append(seletor)
+            try:
+                elementos = driver.find_elements(*seletor)
+                if elementos and (condicao is None or condicao(elementos[0])):
+                    self.registrar(alvo, tentados, seletor, time.time() - inicio)
+                    logger.debug(f"{alvo}: seletor {seletor[1]} (alternativa {len(tentados)})")
+                    return elementos[0]
+            except Exception:
+                continue
+        return None
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado:
+                return
+            try:
+                self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+                temporario = self.arquivo.with_name(self.arquivo.name + '.tmp')
+                with open(temporario, 'w', encoding='utf-8') as f:
+                    json.dump(self.estatisticas, f, ensure_ascii=False, indent=1)
+                os.replace(temporario, self.arquivo)
+                self._alterado = False
+                self._ultima_gravacao = time.time()
+            except Exception as e:
+                logger.warning(f"Erro ao gravar estatísticas de seletores: {e}")
+
+
+registro_seletores = RegistroSeletores()
@@ -1,5 +1,6 @@
 import time
 import logging
+import threading
 from typing import Callable, Any
 from datetime import datetime
 
@@ -10,6 +11,7 @@ class GerenciadorRetry:
 
     
     def __init__(self):
+        self._lock = threading.Lock()
         self.estatisticas = {
             'total_operacoes': 0,
             'operacoes_com_retry': 0,
@@ -25,20 +27,19 @@ class GerenciadorRetry:
         nome_operacao: str = "Operação"
     ) -> Any:
 
-        self.estatisticas['total_operacoes'] += 1
+        self._incrementar('total_operacoes')
         ultima_excecao = None
         inicio = datetime.now()
         
         for tentativa in range(1, max_tentativas + 1):
-            self.estatisticas['total_tentativas'] += 1
+            self._incrementar('total_tentativas')
             
             try:
                 logger.debug(f"{nome_operacao} - Tentativa {tentativa}/{max_tentativas}")
                 resultado = funcao()
                 
                 if tentativa > 1:
-                    self.estatisticas['operacoes_com_retry'] += 1
-                    self.estatisticas['sucessos_apos_retry'] += 1
+                    self._incrementar('operacoes_com_retry', 'sucessos_apos_retry')
                     tempo_decorrido = (datetime.now() - inicio).total_seconds()
                     logger.info(f"{nome_operacao} - Sucesso após {tentativa} tentativas ({tempo_decorrido:.1f}s)")
                 else:
@@ -59,6 +60,11 @@ class GerenciadorRetry:
         
         raise ultima_excecao
     
+    def _incrementar(self, *chaves: str):
+        with self._lock:
+            for chave in chaves:
+                self.estatisticas[chave] += 1
+    
     def obter_estatisticas(self) -> dict:
         return self.estatisticas.copy()
     
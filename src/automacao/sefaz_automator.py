@@ -3,15 +3,22 @@ Automação SEFAZ - Download XML NFe
 """
 
 import time
+import signal
 import logging
-from typing import Optional, Dict
+import threading
+from typing import Optional, Dict, List
 from datetime import datetime
 
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 
-from .download_manager import GerenciadorDownload
+from .download_manager import DIRETORIO_STAGING, GerenciadorDownload
+from .download_http import GerenciadorDownloadHttp
+from .pos_processamento import GerenciadorPosProcessamento
+from .catalogo_nfe import CatalogoNFe
+from .armazem_xml import ArmazemXML
 from .fluxo_utils import DetectorMudancas, GerenciadorWaitInteligente, VerificadorEstado
 from src.config.config_manager import SEFAZConfig
 from .driver_manager import GerenciadorDriver
@@ -20,28 +27,41 @@ from .retry_manager import gerenciador_retry
 from .ie_loader import CarregadorIEs
 from .processador_ie import ProcessadorIE
 from .iframe_manager import GerenciadorIframe
+from .motor_espera import IFRAME_NETACCESS, MotorEspera
+from .registro_seletores import registro_seletores
 from .health_check import HealthCheckDriver
+from .consulta_driver import ConsultaDriver
 from .timeout_manager import TimeoutManager
 from .multi_ie_manager import GerenciadorMultiplasEmpresas
+from .pool_workers import GerenciadorPoolWorkers
+from .agendador_abas import AgendadorAbas
+from .sessao_manager import GerenciadorSessao
 from .timeout_manager import TimeoutManager, TipoOperacao
 
 logger = logging.getLogger(__name__)
 
 class AutomatorSEFAZ:
-    def __init__(self):
-        self.gerenciador_driver = GerenciadorDriver()
+    def __init__(self, id_worker: int = 0, diretorio_download: Optional[str] = None):
+        self.id_worker = id_worker
+        self.diretorio_download = diretorio_download
+        self.estado_compartilhado = False
+        self.finalizando = False
+        self.gerenciador_driver = GerenciadorDriver(diretorio_download)
         self.wait = None
         self.config = None
         self.detector_mudancas = None
         self.wait_inteligente = None
+        self.motor_espera = None
         self.verificador_estado = None
         self.gerenciador_download = None
-        self.seletor_baixar_xml_cache = None
         self.carregador_ies = CarregadorIEs()
         self.processador_ie = None
         self.gerenciador_iframe = None
         self.health_check = None
+        self.consulta_driver = None
         self.timeout_manager = TimeoutManager()
+        self.gerenciador_sessao = None
+        self.pos_processador = None
         
         self.estatisticas_fluxo = {
             'inicio_execucao': None,
@@ -60,27 +80,68 @@ class AutomatorSEFAZ:
             ("PROCESSAR_MULTIPLAS_IES", self._processar_multiplas_ies, "Processar todas as IEs"),
         ]
     
-    def inicializar(self, config: SEFAZConfig) -> bool:
-        logger.info("Inicializando automator")
+    def inicializar(self, config: SEFAZConfig,
+                    gerenciador_multi_ie: Optional[GerenciadorMultiplasEmpresas] = None,
+                    timeout_manager: Optional[TimeoutManager] = None,
+                    pos_processador: Optional[GerenciadorPosProcessamento] = None) -> bool:
+        """Inicializa driver e utilitários; workers do pool recebem estado e timeouts compartilhados"""
+        logger.info(f"Inicializando automator (worker {self.id_worker})")
         try:
             self.config = config
+            self.gerenciador_driver = self._criar_gerenciador_driver(config)
             driver = self.gerenciador_driver.configurar_driver()
             if not driver:
                 return False
                 
-            self.timeout_manager = TimeoutManager()
+            self.timeout_manager = timeout_manager or TimeoutManager()
             
             self.detector_mudancas = DetectorMudancas(driver)
             self.verificador_estado = VerificadorEstado(driver)
-            self.gerenciador_download = GerenciadorDownload(driver)
-            self.gerenciador_multi_ie = GerenciadorMultiplasEmpresas()
+            if gerenciador_multi_ie:
+                self.gerenciador_multi_ie = gerenciador_multi_ie
+                self.estado_compartilhado = True
+            else:
+                periodo = (config.data_inicio, config.data_fim)
+                GerenciadorMultiplasEmpresas.selar_periodos_finalizados(exceto=periodo)
+                self.gerenciador_multi_ie = GerenciadorMultiplasEmpresas(
+                    armazenamento=getattr(config, 'backend_estado', 'json'),
+                    escrita_assincrona=getattr(config, 'escrita_assincrona_estado', False),
+                    intervalo_flush=getattr(config, 'intervalo_flush_estado', 0.5),
+                    max_transicoes=getattr(config, 'max_transicoes_flush', 50),
+                    periodo=periodo
+                )
+                if self.gerenciador_multi_ie.escrita_assincrona:
+                    self._instalar_handlers_sinais()
+            self.pos_processador = pos_processador or self._criar_pos_processador(config)
+            
+            self.gerenciador_download = GerenciadorDownload(
+                driver, self.diretorio_download,
+                prazo_download=getattr(config, 'prazo_download', 60),
+                monitorar_cdp=getattr(config, 'monitorar_downloads_cdp', False),
+                diretorio_staging=str(DIRETORIO_STAGING / f"worker_{self.id_worker}"),
+                downloader_http=self._criar_downloader_http(config),
+                periodo=(config.data_inicio, config.data_fim),
+                gerenciador_estado=self.gerenciador_multi_ie,
+                pos_processador=self.pos_processador,
+                armazem=ArmazemXML() if getattr(config, 'armazem_xml', False) else None
+            )
             
             timeout_elementos = self.timeout_manager.get_timeout(TipoOperacao.ELEMENTO_WAIT)
             self.wait = WebDriverWait(driver, timeout_elementos)
             
-            self.health_check = HealthCheckDriver(driver)
+            self.consulta_driver = ConsultaDriver(driver)
+            self.health_check = HealthCheckDriver(driver, self.consulta_driver)
             self.wait_inteligente = GerenciadorWaitInteligente(driver, self.timeout_manager)
             self.gerenciador_iframe = GerenciadorIframe(driver)
+            self.motor_espera = MotorEspera(
+                driver, self.timeout_manager, intervalo=getattr(config, 'intervalo_espera', 0.1)
+            )
+            
+            if getattr(config, 'reutilizar_sessao', True):
+                self.gerenciador_sessao = GerenciadorSessao(
+                    driver, config.usuario, config.senha,
+                    validade_horas=getattr(config, 'validade_sessao_horas', 8)
+                )
             
             self.processador_ie = ProcessadorIE(self)
             
@@ -90,6 +151,70 @@ class AutomatorSEFAZ:
             logger.error(f"Erro inicializacao: {e}")
             return False
     
+    def _criar_gerenciador_driver(self, config: SEFAZConfig) -> GerenciadorDriver:
+        perfil_chrome = getattr(config, 'perfil_chrome', '') or None
+        endereco_depuracao = getattr(config, 'endereco_depuracao', '') or None
+        if self.id_worker:
+            # Perfis não podem ser compartilhados entre Chromes; só o worker 0 usa o modo attach
+            perfil_chrome = f"{perfil_chrome}_worker{self.id_worker}" if perfil_chrome else None
+            endereco_depuracao = None
+        
+        return GerenciadorDriver(
+            self.diretorio_download, perfil_chrome=perfil_chrome,
+            endereco_depuracao=endereco_depuracao,
+            cache_driver=getattr(config, 'cache_driver', True),
+            log_performance=getattr(config, 'monitorar_downloads_cdp', False)
+        )
+    
+    def _criar_downloader_http(self, config: SEFAZConfig) -> Optional[GerenciadorDownloadHttp]:
+        if not getattr(config, 'download_direto', False):
+            return None
+        if not GerenciadorDownloadHttp.disponivel():
+            logger.warning("Pacote 'requests' ausente - downloads seguem pelo navegador")
+            return None
+        return GerenciadorDownloadHttp(paralelismo=getattr(config, 'paralelismo_download', 4))
+    
+    def _criar_pos_processador(self, config: SEFAZConfig) -> Optional[GerenciadorPosProcessamento]:
+        catalogo = CatalogoNFe() if getattr(config, 'catalogo_nfe', False) else None
+        if not getattr(config, 'pos_processamento', False) and catalogo is None:
+            return None
+        return GerenciadorPosProcessamento(
+            processos=getattr(config, 'processos_pos_processamento', 2),
+            extrair=getattr(config, 'extrair_xml', False),
+            catalogo=catalogo
+        )
+    
+    def _instalar_handlers_sinais(self):
+        """Converte SIGINT/SIGTERM em exceção para o flush pendente rodar em `limpar_recursos`.
+
+        O handler não grava nada: ele roda na thread principal, que pode estar
+        segurando o lock de escrita do estado. Durante a finalização o sinal é
+        ignorado para não interromper a gravação final.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            handler_anterior = signal.getsignal(sinal)
+            
+            def handler(signum, frame, handler_anterior=handler_anterior):
+                if self.finalizando:
+                    logger.warning(f"Sinal {signum} ignorado - gravando estado final")
+                    return
+                logger.warning(f"Sinal {signum} recebido - encerrando e gravando estado pendente")
+                
+                if callable(handler_anterior):
+                    handler_anterior(signum, frame)
+                elif signum == signal.SIGINT:
+                    raise KeyboardInterrupt
+                else:
+                    raise SystemExit(128 + signum)
+            
+            try:
+                signal.signal(sinal, handler)
+            except (ValueError, OSError) as e:
+                logger.debug(f"Handler para sinal {sinal} não instalado: {e}")
+    
     @property
     def driver(self) -> Optional[WebDriver]:
         return self.gerenciador_driver.driver
@@ -100,7 +225,12 @@ class AutomatorSEFAZ:
         logger.info(f"Total de etapas: {len(self.etapas_fluxo)}")
         
         try:
-            for nome_etapa, funcao_etapa, descricao in self.etapas_fluxo:
+            etapas = self.etapas_fluxo
+            if self._restaurar_sessao_salva():
+                etapas = [etapa for etapa in self.etapas_fluxo if etapa[0] == "PROCESSAR_MULTIPLAS_IES"]
+                logger.info("Sessão salva válida - login ignorado")
+            
+            for nome_etapa, funcao_etapa, descricao in etapas:
                 inicio_etapa = datetime.now()
                 logger.info(f"Executando etapa: {descricao}")
                 
@@ -117,6 +247,9 @@ class AutomatorSEFAZ:
                 
                 self.estatisticas_fluxo['etapas_executadas'] += 1
                 logger.info(f"Etapa concluída: {tempo_etapa:.1f}s")
+                
+                if nome_etapa == "CLICAR_BAIXAR_XML_APOS_LOGIN" and self.gerenciador_sessao:
+                    self.gerenciador_sessao.exportar()
             
             self._log_estatisticas_finais()
             return True
@@ -126,6 +259,46 @@ class AutomatorSEFAZ:
             self._log_estatisticas_parciais()
             return False
 
+    def _restaurar_sessao_salva(self) -> bool:
+        """Injeta a sessão exportada e confirma com uma sonda rápida no formulário de consulta"""
+        if not self.gerenciador_sessao:
+            return False
+        
+        url_retomada = self.gerenciador_sessao.importar()
+        if not url_retomada:
+            return False
+        
+        inicio = time.time()
+        sucesso = False
+        try:
+            self.driver.get(url_retomada)
+            self.detector_mudancas.aguardar_carregamento()
+            
+            if self.verificador_estado.esta_na_pagina_login() or not self._clicar_baixar_xml_apos_login():
+                logger.info("Sessão salva expirou no servidor - login completo necessário")
+                return False
+            
+            iframe = self.consulta_driver.estado(ids=["cmpNumIeDest"], atualizar=True).get('iframe') or {}
+            sucesso = bool((iframe.get('campos') or {}).get("cmpNumIeDest", {}).get('presente'))
+            
+            if not sucesso:
+                logger.info("Sonda da sessão salva falhou - login completo necessário")
+            return sucesso
+        
+        except Exception as e:
+            logger.info(f"Sessão salva não reutilizada: {e}")
+            return False
+        
+        finally:
+            if not sucesso:
+                try:
+                    self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                except Exception:
+                    pass
+            self.timeout_manager.registrar_tempo_operacao(
+                TipoOperacao.LOGIN, time.time() - inicio, sucesso
+            )
+    
     def _log_estatisticas_parciais(self):
         tempo_total = (datetime.now() - self.estatisticas_fluxo['inicio_execucao']).total_seconds()
         
@@ -170,6 +343,20 @@ class AutomatorSEFAZ:
             eficiencia = (stats_retry['total_operacoes'] / stats_retry['total_tentativas']) * 100
             logger.info(f"  Eficiência: {eficiencia:.1f}%")
         
+        if self.consulta_driver is not None:
+            resumo = self.consulta_driver.resumo()
+            logger.info("-" * 30)
+            logger.info("IDAS AO WEBDRIVER:")
+            logger.info(f"  Total: {resumo['idas']}")
+            if resumo['ies']:
+                logger.info(f"  Por IE: média {resumo['media_por_ie']:.1f}, máximo {resumo['max_por_ie']} "
+                            f"({resumo['ies']} IE(s))")
+            logger.info(f"  Consultas agrupadas: {resumo['executadas']} executadas, "
+                        f"{resumo['respondidas_cache']} respondidas pelo cache da época")
+            frames = self.consulta_driver.gerenciador_iframe.rastreador.estatisticas
+            logger.info(f"  Iframe: {frames['entradas']} entradas, {frames['reentradas']} reentradas sem troca, "
+                        f"{frames['saidas']} saídas")
+        
         logger.info("=" * 50)
     
     def _fazer_login_portal(self) -> bool:
@@ -203,8 +390,10 @@ class AutomatorSEFAZ:
                 campo_senha.send_keys(self.config.senha)
                 botao_login.click()
                 
-                delay_login = self.timeout_manager.get_delay(TipoOperacao.LOGIN)
-                time.sleep(delay_login)
+                self.motor_espera.aguardar(
+                    lambda driver: not self.verificador_estado.esta_na_pagina_login(),
+                    TipoOperacao.PAGINA_CARREGAMENTO, descricao="saída da página de login"
+                )
                 
                 mudanca, url_atual = self.detector_mudancas.verificar_mudanca_url(url_anterior)
                 
@@ -229,13 +418,15 @@ class AutomatorSEFAZ:
             return False
     
     def _aguardar_dashboard(self) -> bool:
-        delay_acao = self.timeout_manager.get_delay('action_delay')
-        time.sleep(delay_acao)
+        # O redirecionamento pós-login costuma cair direto no dashboard: o antigo delay vira o teto
+        url_dashboard = self.motor_espera.mudanca_url(
+            contendo="portalsefaz-apps", timeout=self.timeout_manager.get_delay(TipoOperacao.ACAO_CLIQUE),
+            obrigatoria=False
+        )
         
-        if "portalsefaz-apps" not in self.driver.current_url:
+        if not url_dashboard:
             self.driver.get(SEFAZ_DASHBOARD_URL)
-            delay_page_load = self.timeout_manager.get_delay('page_load')
-            time.sleep(delay_page_load)
+            self.motor_espera.dom_quieto()
         return True
     
     def _clicar_acesso_restrito(self) -> bool:
@@ -246,45 +437,31 @@ class AutomatorSEFAZ:
             sucesso = False
             
             try:
-                time.sleep(3)
-                self.detector_mudancas.aguardar_carregamento()
+                self.motor_espera.dom_quieto()
                 
-                link_acesso = self.wait_inteligente.aguardar_elemento_ou_alternativas(
-                    (By.XPATH, "//h3[contains(text(), 'Acesso Restrito')]"),
-                    (By.XPATH, "//a[contains(@href, 'NETACCESS/default.asp')]"),
-                    (By.XPATH, "//a[@target='_blank' and contains(@href, 'NETACCESS')]"),
-                    (By.XPATH, "//a[contains(@class, 'dashboard-sistemas-item')]"),
-                    (By.XPATH, "//a[contains(@href, 'NETACCESS') and contains(@title, 'Acessar')]"),
-                    (By.XPATH, "//h3[contains(text(), 'Acesso Restrito')]/ancestor::a"),
-                )
+                link_acesso = self.wait_inteligente.aguardar_alvo('acesso_restrito')
                 
                 if not link_acesso:
                     link_acesso = self.wait_inteligente.buscar_elementos_similares("Acesso Restrito")
                     
                 if not link_acesso:
                     logger.warning("Usando fallback manual para Acesso Restrito")
-                    for seletor in [
-                        (By.XPATH, "//h3[contains(text(), 'Acesso Restrito')]"),
-                        (By.XPATH, "//a[contains(@href, 'NETACCESS/default.asp')]"),
-                    ]:
-                        try:
-                            link_acesso = self.driver.find_element(*seletor)
-                            break
-                        except:
-                            continue
+                    link_acesso = registro_seletores.encontrar(self.driver, 'acesso_restrito')
                 
                 if not link_acesso:
                     raise Exception("Nenhum seletor de acesso restrito funcionou")
                 
-                aba_original = self.driver.current_window_handle
+                abas_anteriores = self.driver.window_handles
                 self.driver.execute_script("arguments[0].click();", link_acesso)
-                time.sleep(5)
                 
-                abas = self.driver.window_handles
-                if len(abas) > 1:
-                    nova_aba = abas[-1]
+                nova_aba = self.motor_espera.nova_janela(abas_anteriores)
+                if nova_aba:
                     self.driver.switch_to.window(nova_aba)
                     logger.info("Mudou para nova aba")
+                    self.motor_espera.aguardar(
+                        EC.presence_of_element_located(IFRAME_NETACCESS), obrigatoria=False,
+                        descricao="iframe iNetaccess"
+                    )
                     
                     if self.verificador_estado.esta_no_acesso_restrito():
                         logger.info("Acesso restrito verificado com sucesso")
@@ -324,17 +501,18 @@ class AutomatorSEFAZ:
             try:
                 logger.info("Procurando iframe...")
                 
-                try:
-                    iframe = self.driver.find_element(By.ID, "iNetaccess")
-                    self.driver.switch_to.frame(iframe)
-                    logger.info("Dentro do iframe!")
-                except:
+                if not self.motor_espera.aguardar(
+                    EC.frame_to_be_available_and_switch_to_it(IFRAME_NETACCESS), descricao="iframe iNetaccess"
+                ):
                     logger.error("IFRAME NAO ENCONTRADO!")
                     return False
+                logger.info("Dentro do iframe!")
                 
                 logger.info("Buscando Baixar XML NFE...")
                 
-                link_encontrado = self._encontrar_link_baixar_xml()
+                link_encontrado = self.motor_espera.aguardar(
+                    lambda driver: self._encontrar_link_baixar_xml(), descricao="link Baixar XML NFE"
+                )
                 
                 if not link_encontrado:
                     logger.error("Link nao encontrado dentro do iframe")
@@ -351,7 +529,11 @@ class AutomatorSEFAZ:
                     return False
                 
                 logger.info("Aguardando acao do clique...")
-                time.sleep(5)
+                self.motor_espera.aguardar(
+                    lambda driver: ("consulta-notas-recebidas" in driver.current_url
+                                    or self._verificar_popup_login()),
+                    TipoOperacao.POPUP, obrigatoria=False, descricao="popup ou página de consulta"
+                )
                 
                 try:
                     current_url = self.driver.current_url
@@ -388,19 +570,18 @@ class AutomatorSEFAZ:
             sucesso = False
             
             try:
-                logger.info("Aguardando até 15 segundos para popup aparecer...")
-                
                 timeout_popup = self.timeout_manager.get_timeout(TipoOperacao.POPUP)
-                for tentativa in range(timeout_popup):
-                    if self._verificar_popup_login():
-                        logger.info("POPUP DETECTADO! Preenchendo...")
-                        sucesso = self._preencher_popup_login()
-                        return sucesso
-                    
-                    logger.info(f"Aguardando popup... ({tentativa + 1}/{timeout_popup})")
-                    time.sleep(1)
+                logger.info(f"Aguardando até {timeout_popup} segundos para popup aparecer...")
                 
-                logger.error("TIMEOUT: Popup de login não apareceu após 15 segundos")
+                if self.motor_espera.aguardar(
+                    lambda driver: self._verificar_popup_login(), timeout=timeout_popup,
+                    descricao="popup de login"
+                ):
+                    logger.info("POPUP DETECTADO! Preenchendo...")
+                    sucesso = self._preencher_popup_login()
+                    return sucesso
+                
+                logger.error(f"TIMEOUT: Popup de login não apareceu após {timeout_popup} segundos")
                 return False
                 
             finally:
@@ -422,19 +603,8 @@ class AutomatorSEFAZ:
     
     def _verificar_popup_login(self) -> bool:
         try:
-            elementos_popup = [
-                (By.ID, "NetAccess.Login"),
-                (By.ID, "NetAccess.Password"),
-                (By.ID, "btnAuthenticate"),
-            ]
-            
-            for elemento in elementos_popup:
-                try:
-                    if self.driver.find_element(*elemento):
-                        logger.info(f"Elemento de popup encontrado: {elemento[1]}")
-                        return True
-                except:
-                    continue
+            if registro_seletores.encontrar(self.driver, 'popup_login'):
+                return True
             
             textos_popup = [
                 "Para se autenticar, favor informar suas credenciais",
@@ -445,7 +615,7 @@ class AutomatorSEFAZ:
             page_source = self.driver.page_source
             for texto in textos_popup:
                 if texto in page_source:
-                    logger.info(f"Texto de popup encontrado: {texto}")
+                    logger.debug(f"Texto de popup encontrado: {texto}")
                     return True
             
             return False
@@ -471,7 +641,10 @@ class AutomatorSEFAZ:
             logger.info("Clicou em Autenticar no popup")
             
             logger.info("Aguardando processamento do login no popup...")
-            time.sleep(5)
+            self.motor_espera.aguardar(
+                lambda driver: not self._verificar_popup_login(), TipoOperacao.LOGIN,
+                descricao="fechamento do popup"
+            )
             
             if not self._verificar_popup_login():
                 logger.info("Login no popup realizado com sucesso!")
@@ -492,16 +665,14 @@ class AutomatorSEFAZ:
             sucesso = False
             
             try:
-                delay_acao = self.timeout_manager.get_delay(TipoOperacao.ACAO_CLIQUE)
-                time.sleep(delay_acao)
-                
-                try:
-                    iframe = self.driver.find_element(By.ID, "iNetaccess")
-                    self.driver.switch_to.frame(iframe)
-                except:
+                if not self.motor_espera.aguardar(
+                    EC.frame_to_be_available_and_switch_to_it(IFRAME_NETACCESS), descricao="iframe iNetaccess"
+                ):
                     return False
                 
-                link_encontrado = self._encontrar_link_baixar_xml()
+                link_encontrado = self.motor_espera.aguardar(
+                    lambda driver: self._encontrar_link_baixar_xml(), descricao="link Baixar XML NFE"
+                )
                 
                 if not link_encontrado:
                     self.driver.switch_to.default_content()
@@ -514,7 +685,9 @@ class AutomatorSEFAZ:
                     return False
                 
                 self.driver.switch_to.default_content()
-                time.sleep(5)
+                self.motor_espera.elemento_visivel_iframe(
+                    (By.ID, "cmpDataInicial"), tipo=TipoOperacao.PAGINA_CARREGAMENTO, obrigatoria=False
+                )
                 
                 sucesso = True
                 return True
@@ -533,35 +706,7 @@ class AutomatorSEFAZ:
         )
         
     def _encontrar_link_baixar_xml(self):
-        if self.seletor_baixar_xml_cache:
-            try:
-                elemento = self.driver.find_element(*self.seletor_baixar_xml_cache)
-                logger.info(f"Usando seletor em cache: {self.seletor_baixar_xml_cache[1]}")
-                return elemento
-            except:
-                self.seletor_baixar_xml_cache = None 
-        
-        seletores_prioridade = [
-            (By.XPATH, "//a[@onclick=\"OpenUrl('https://nfeweb.sefaz.go.gov.br/nfeweb/sites/nfe/consulta-notas-recebidas', false, '', 'False', 'true')\"]"),
-            (By.XPATH, "//a[text()='Baixar XML NFE']"),
-            (By.XPATH, "//a[contains(text(), 'Baixar XML NFE')]"),
-        ]
-        
-        for seletor in seletores_prioridade:
-            try:
-                elemento = self.driver.find_element(*seletor)
-                logger.info(f"Seletor encontrado: {seletor[1]}")
-                self.seletor_baixar_xml_cache = seletor 
-                return elemento
-            except:
-                continue
-        
-        try:
-            elemento = self.driver.find_element(By.XPATH, "//a[contains(., 'Baixar XML')]")
-            logger.info("Usando fallback genérico")
-            return elemento
-        except:
-            return None
+        return registro_seletores.encontrar(self.driver, 'link_baixar_xml')
 
     def _captcha_manual(self) -> bool:
         """CAPTCHA REAL - aguarda resolução manual"""
@@ -582,7 +727,7 @@ class AutomatorSEFAZ:
             
             try:
                 input("Pressione ENTER após resolver o CAPTCHA: ")
-                time.sleep(3)
+                self.motor_espera.rede_ociosa()
                 logger.info("CAPTCHA resolvido - continuando fluxo")
                 sucesso = True
                 return True
@@ -623,7 +768,9 @@ class AutomatorSEFAZ:
                         sucesso_ie = False
                         
                         try:
-                            if self.processador_ie.processar_ie(sessao['ie'], sessao['nome']):
+                            with self.consulta_driver.contar_ie(sessao['ie']):
+                                com_notas = self.processador_ie.processar_ie(sessao['ie'], sessao['nome'])
+                            if com_notas:
                                 self.gerenciador_multi_ie.marcar_concluido(empresa)
                                 logger.info(f"✓ Sessão interrompida concluída: {sessao['nome']} ({sessao['ie']})")
                                 sucesso_ie = True
@@ -650,35 +797,23 @@ class AutomatorSEFAZ:
                 empresas_para_processar = [emp for emp in empresas if emp['ie'] not in ies_processadas]
                 logger.info(f"{len(ies_processadas)} empresas já processadas, {len(empresas_para_processar)} restantes")
             
-            for i, empresa in enumerate(empresas_para_processar, 1):
-                inicio_ie = time.time()
-                sucesso_ie = False
-                
-                try:
+            num_workers = getattr(self.config, 'workers', 1)
+            num_abas = getattr(self.config, 'abas', 1)
+            if getattr(self.config, 'pipeline', False):
+                ies_com_notas += self._executar_pipeline(empresas_para_processar)
+            elif num_workers > 1 and len(empresas_para_processar) > 1:
+                pool = GerenciadorPoolWorkers(self, num_workers)
+                ies_com_notas += pool.executar(empresas_para_processar)
+            elif num_abas > 1 and len(empresas_para_processar) > 1:
+                agendador = AgendadorAbas(self, num_abas)
+                ies_com_notas += agendador.executar(empresas_para_processar)
+            else:
+                for i, empresa in enumerate(empresas_para_processar, 1):
                     if i % 10 == 1 or i == len(empresas_para_processar):
                         logger.info(f"[{i}/{len(empresas_para_processar)}] {empresa['nome']} ({empresa['ie']})")
                     
-                    self.gerenciador_multi_ie.marcar_em_andamento(empresa)
-                    
-                    if self.processador_ie.processar_ie(empresa['ie'], empresa['nome']):
+                    if self.processar_empresa(empresa):
                         ies_com_notas += 1
-                        self.gerenciador_multi_ie.marcar_concluido(empresa)
-                        logger.info(f"  ✓ Concluído com notas")
-                        sucesso_ie = True
-                    else:
-                        self.gerenciador_multi_ie.marcar_concluido(empresa)  
-                        logger.info(f"  ✓ Concluído sem notas")
-                        sucesso_ie = True
-                        
-                except Exception as e:
-                    logger.error(f"  ✗ Erro: {e}")
-                    self.gerenciador_multi_ie.marcar_erro(empresa, str(e))
-                
-                finally:
-                    tempo_ie = time.time() - inicio_ie
-                    self.timeout_manager.registrar_tempo_operacao(
-                        TipoOperacao.CONSULTA, tempo_ie, sucesso_ie
-                    )
             
             removidos = self.gerenciador_multi_ie.limpar_checkpoints_antigos()
             if removidos > 0:
@@ -698,6 +833,84 @@ class AutomatorSEFAZ:
                 TipoOperacao.DOWNLOAD, tempo_total, sucesso_total
             )
 
+    def _executar_pipeline(self, empresas: List[Dict]) -> int:
+        """Fase 1 solicita os pacotes de todas as IEs; fase 2 colhe o histórico em lote.
+        
+        A geração no servidor corre enquanto as próximas IEs são consultadas, e a
+        cada solicitação o histórico exibido é colhido sem espera.
+        """
+        data_referencia = datetime.strptime(self.config.data_inicio, "%d/%m/%Y")
+        multi_ie = self.gerenciador_multi_ie
+        
+        for i, empresa in enumerate(empresas, 1):
+            logger.info(f"[{i}/{len(empresas)}] Solicitando {empresa['nome']} ({empresa['ie']})")
+            if multi_ie.foi_colhida(empresa['ie']):
+                continue
+            
+            inicio_ie = time.time()
+            sucesso_ie = False
+            try:
+                multi_ie.marcar_em_andamento(empresa)
+                with self.consulta_driver.contar_ie(empresa['ie']):
+                    solicitado = self.processador_ie.solicitar_pacote_ie(empresa['ie'], empresa['nome'])
+                if solicitado:
+                    self.gerenciador_download.colher_prontos(data_referencia)
+                else:
+                    multi_ie.marcar_concluido(empresa)
+                sucesso_ie = True
+            except Exception as e:
+                logger.error(f"  ✗ Erro: {e}")
+                multi_ie.marcar_erro(empresa, str(e))
+            finally:
+                self.timeout_manager.registrar_tempo_operacao(
+                    TipoOperacao.CONSULTA, time.time() - inicio_ie, sucesso_ie
+                )
+        
+        logger.info(f"Fase 2: colhendo {len(multi_ie.obter_solicitadas())} pacote(s) pendente(s) no histórico")
+        self.gerenciador_download.aguardar_solicitacoes(
+            data_referencia, getattr(self.config, 'prazo_pipeline', 900)
+        )
+        
+        for empresa in multi_ie.obter_solicitadas():
+            multi_ie.marcar_pendente(empresa, "Pacote não ficou pronto no prazo do pipeline")
+        
+        return sum(multi_ie.foi_colhida(empresa['ie']) for empresa in empresas)
+    
+    def processar_empresa(self, empresa: Dict) -> bool:
+        """Processa uma empresa registrando estado e tempo; retorna True se houve notas"""
+        if self.gerenciador_multi_ie.foi_colhida(empresa['ie']):
+            logger.info(f"  ✓ Pacote já colhido do histórico de outra IE")
+            return True
+        
+        inicio_ie = time.time()
+        sucesso_ie = False
+        com_notas = False
+        
+        try:
+            self.gerenciador_multi_ie.marcar_em_andamento(empresa)
+            
+            with self.consulta_driver.contar_ie(empresa['ie']):
+                com_notas = self.processador_ie.processar_ie(empresa['ie'], empresa['nome'])
+            if com_notas:
+                logger.info(f"  ✓ Concluído com notas")
+            else:
+                logger.info(f"  ✓ Concluído sem notas")
+            self.gerenciador_multi_ie.marcar_concluido(empresa)
+            sucesso_ie = True
+                
+        except Exception as e:
+            logger.error(f"  ✗ Erro: {e}")
+            self.gerenciador_multi_ie.marcar_erro(empresa, str(e))
+        
+        finally:
+            tempo_ie = time.time() - inicio_ie
+            self.timeout_manager.registrar_tempo_operacao(
+                TipoOperacao.CONSULTA, tempo_ie, sucesso_ie
+            )
+            logger.debug(f"  Idas ao WebDriver: {self.consulta_driver.idas_por_ie.get(empresa['ie'], 0)}")
+        
+        return com_notas
+
     def _mostrar_relatorio_final(self, relatorio: Dict):
         print("\n" + "="*60)
         print("RELATÓRIO FINAL - PROCESSAMENTO COM CHECKPOINTS")
@@ -726,24 +939,44 @@ class AutomatorSEFAZ:
         
     def limpar_recursos(self):
         """Limpa recursos e salva estado final"""
+        if self.estado_compartilhado:
+            self.encerrar_driver()
+            return
+        
         logger.info("Finalizando automator e salvando estado")
+        self.finalizando = True
         
         if hasattr(self, 'gerenciador_multi_ie'):
             try:
                 self.gerenciador_multi_ie.salvar_estado()
+                if self.gerenciador_multi_ie.selar_periodo_se_finalizado():
+                    logger.info("Período finalizado: estado selado e arquivado")
+                self.gerenciador_multi_ie.fechar()
                 logger.info("Estado do processamento salvo para retomada futura")
             except Exception as e:
                 logger.error(f"Erro ao salvar estado final: {e}")
         
-        if hasattr(self, 'gerenciador_driver') and self.gerenciador_driver.driver:
-            try:
-                self.gerenciador_driver.driver.quit()
-                logger.info("WebDriver finalizado")
-            except Exception as e:
-                logger.warning(f"Erro ao finalizar WebDriver: {e}")
+        self.encerrar_driver()
+        registro_seletores.salvar()
+        
+        if self.pos_processador is not None:
+            # Navegador já fechado: resta só a cauda dos pacotes em processamento
+            self.pos_processador.encerrar()
         
         print("\n" + "="*60)
         print("PROCESSAMENTO CONCLUÍDO")
         print("="*60)
         print("✓ Estado salvo para retomada futura")
-        print("="*60)
\ No newline at end of file
+        print("="*60)
+    
+    def encerrar_driver(self):
+        downloader_http = getattr(self.gerenciador_download, 'downloader_http', None)
+        if downloader_http:
+            downloader_http.encerrar()
+        
+        if hasattr(self, 'gerenciador_driver') and self.gerenciador_driver.driver:
+            try:
+                self.gerenciador_driver.encerrar()
+                logger.info(f"WebDriver finalizado (worker {self.id_worker})")
+            except Exception as e:
+                logger.warning(f"Erro ao finalizar WebDriver: {e}")
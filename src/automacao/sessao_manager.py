@@ -0,0 +1,180 @@
+"""
+Exportação e importação da sessão autenticada (cookies + storage) entre drivers
+"""
+import os
+import json
+import base64
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from selenium.webdriver.common.by import By
+
+logger = logging.getLogger(__name__)
+
+DOMINIOS_SESSAO = ("portal.sefaz.go.gov.br", "www.sefaz.go.gov.br", "nfeweb.sefaz.go.gov.br")
+
+# Campos aceitos por Network.setCookies (CookieParam do DevTools Protocol)
+CAMPOS_COOKIE = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires", "priority")
+
+CABECALHO_ARQUIVO = b"NFESESS1"
+TAMANHO_SALT = 16
+ITERACOES_PBKDF2 = 390000
+
+SCRIPT_LER_STORAGE = """
+const ler = (s) => { const r = {}; for (let i = 0; i < s.length; i++) { const k = s.key(i); r[k] = s.getItem(k); } return r; };
+return {origem: location.origin, local: ler(window.localStorage), sessao: ler(window.sessionStorage)};
+"""
+
+# Restaura o storage de uma origem ao carregar qualquer documento dela, sem sobrescrever valores novos
+SCRIPT_RESTAURAR_STORAGE = """
+(function (dados) {
+    const itens = dados[location.origin];
+    if (!itens) return;
+    for (const [k, v] of Object.entries(itens.local)) if (localStorage.getItem(k) === null) localStorage.setItem(k, v);
+    for (const [k, v] of Object.entries(itens.sessao)) if (sessionStorage.getItem(k) === null) sessionStorage.setItem(k, v);
+})(%s);
+"""
+
+
+class GerenciadorSessao:
+    """Snapshot criptografado da sessão autenticada do portal.
+
+    O arquivo é cifrado com Fernet (pacote opcional `cryptography`), com chave
+    derivada por PBKDF2 das credenciais do portal; sem o pacote a exportação é
+    desativada, nunca gravando cookies em texto puro.
+    """
+
+    def __init__(self, driver, usuario: str, senha: str,
+                 arquivo_sessao: str = "estado/sessao.bin", validade_horas: float = 8):
+        self.driver = driver
+        self.arquivo_sessao = Path(arquivo_sessao)
+        self.validade = timedelta(hours=validade_horas)
+        self._segredo = f"{usuario}:{senha}".encode('utf-8')
+
+    @staticmethod
+    def criptografia_disponivel() -> bool:
+        try:
+            import cryptography  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _fernet(self, salt: bytes):
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=ITERACOES_PBKDF2)
+        return Fernet(base64.urlsafe_b64encode(kdf.derive(self._segredo)))
+
+    def _coletar_cookies(self) -> List[Dict]:
+        cookies = self.driver.execute_cdp_cmd("Network.getAllCookies", {}).get('cookies', [])
+        selecionados = []
+        for cookie in cookies:
+            dominio = cookie.get('domain', '').lstrip('.')
+            if not any(dominio == alvo or alvo.endswith('.' + dominio) for alvo in DOMINIOS_SESSAO):
+                continue
+            param = {campo: cookie[campo] for campo in CAMPOS_COOKIE if campo in cookie}
+            if cookie.get('session'):
+                param.pop('expires', None)
+            selecionados.append(param)
+        return selecionados
+
+    def _coletar_storage(self) -> Dict[str, Dict]:
+        storage = {}
+        try:
+            dados = self.driver.execute_script(SCRIPT_LER_STORAGE)
+            storage[dados['origem']] = {'local': dados['local'], 'sessao': dados['sessao']}
+
+            iframe = self.driver.find_element(By.ID, "iNetaccess")
+            self.driver.switch_to.frame(iframe)
+            dados = self.driver.execute_script(SCRIPT_LER_STORAGE)
+            storage[dados['origem']] = {'local': dados['local'], 'sessao': dados['sessao']}
+        except Exception as e:
+            logger.debug(f"Storage parcial na exportação da sessão: {e}")
+        finally:
+            try:
+                self.driver.switch_to.default_content()
+            except Exception:
+                pass
+        return storage
+
+    def exportar(self) -> bool:
+        """Grava o snapshot da sessão atual (a aba deve estar na página do NETACCESS)"""
+        if not self.criptografia_disponivel():
+            logger.info("Pacote 'cryptography' ausente - sessão não será exportada")
+            return False
+
+        try:
+            snapshot = {
+                'criado_em': datetime.now().isoformat(),
+                'url_retomada': self.driver.current_url,
+                'cookies': self._coletar_cookies(),
+                'storage': self._coletar_storage(),
+            }
+
+            salt = os.urandom(TAMANHO_SALT)
+            token = self._fernet(salt).encrypt(json.dumps(snapshot).encode('utf-8'))
+
+            self.arquivo_sessao.parent.mkdir(parents=True, exist_ok=True)
+            temporario = self.arquivo_sessao.with_suffix('.tmp')
+            with open(temporario, 'wb') as f:
+                f.write(CABECALHO_ARQUIVO + salt + token)
+            os.chmod(temporario, 0o600)
+            os.replace(temporario, self.arquivo_sessao)
+
+            logger.info(f"Sessão exportada ({len(snapshot['cookies'])} cookies)")
+            return True
+        except Exception as e:
+            logger.warning(f"Erro ao exportar sessão: {e}")
+            return False
+
+    def carregar(self) -> Optional[Dict]:
+        """Lê e decifra o snapshot; None se ausente, inválido ou expirado"""
+        if not self.arquivo_sessao.exists() or not self.criptografia_disponivel():
+            return None
+
+        try:
+            conteudo = self.arquivo_sessao.read_bytes()
+            if not conteudo.startswith(CABECALHO_ARQUIVO):
+                return None
+
+            inicio_token = len(CABECALHO_ARQUIVO) + TAMANHO_SALT
+            salt = conteudo[len(CABECALHO_ARQUIVO):inicio_token]
+            ttl = int(self.validade.total_seconds())
+            snapshot = json.loads(self._fernet(salt).decrypt(conteudo[inicio_token:], ttl=ttl))
+            return snapshot
+        except Exception as e:
+            logger.info(f"Sessão salva descartada (expirada ou inválida): {type(e).__name__}")
+            return None
+
+    def importar(self) -> Optional[str]:
+        """Injeta o snapshot no driver; retorna a URL para retomada ou None"""
+        snapshot = self.carregar()
+        if not snapshot:
+            return None
+
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setCookies", {'cookies': snapshot['cookies']})
+
+            if snapshot.get('storage'):
+                self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+                    'source': SCRIPT_RESTAURAR_STORAGE % json.dumps(snapshot['storage'])
+                })
+
+            logger.info(f"Sessão importada ({len(snapshot['cookies'])} cookies)")
+            return snapshot['url_retomada']
+        except Exception as e:
+            logger.warning(f"Erro ao importar sessão: {e}")
+            return None
+
+    def descartar(self):
+        try:
+            self.arquivo_sessao.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug(f"Erro ao remover sessão salva: {e}")
@@ -1,5 +1,6 @@
 import logging
 import time
+import threading
 from typing import Dict, List
 from datetime import datetime, timedelta
 from enum import Enum
@@ -54,39 +55,43 @@ class TimeoutManager:
             'janela_estatisticas': 20,  # últimas 20 operações
             'limite_erros_instavel': 3,  # 3 erros consecutivos = instável
         }
+        
+        # Compartilhado entre workers do pool: estatísticas são atualizadas sob lock
+        self._lock = threading.RLock()
     
     def registrar_tempo_operacao(self, tipo: TipoOperacao, tempo_decorrido: float, sucesso: bool = True):
         """Registra tempo de operação para adaptação futura"""
-        try:
-            # Adicionar à lista de estatísticas
-            if tipo in self.estatisticas_tempo:
-                self.estatisticas_tempo[tipo].append({
-                    'tempo': tempo_decorrido,
-                    'sucesso': sucesso,
-                    'timestamp': datetime.now()
-                })
+        with self._lock:
+            try:
+                # Adicionar à lista de estatísticas
+                if tipo in self.estatisticas_tempo:
+                    self.estatisticas_tempo[tipo].append({
+                        'tempo': tempo_decorrido,
+                        'sucesso': sucesso,
+                        'timestamp': datetime.now()
+                    })
                 
-                # Manter apenas as últimas operações
-                if len(self.estatisticas_tempo[tipo]) > self.config_adaptacao['janela_estatisticas']:
-                    self.estatisticas_tempo[tipo].pop(0)
+                    # Manter apenas as últimas operações
+                    if len(self.estatisticas_tempo[tipo]) > self.config_adaptacao['janela_estatisticas']:
+                        self.estatisticas_tempo[tipo].pop(0)
             
-            # Registrar erros
-            if not sucesso:
-                self.erros_recentes.append({
-                    'tipo': tipo,
-                    'timestamp': datetime.now()
-                })
-                # Limpar erros antigos (últimos 10 minutos)
-                self.erros_recentes = [
-                    erro for erro in self.erros_recentes 
-                    if (datetime.now() - erro['timestamp']).total_seconds() < 600
-                ]
+                # Registrar erros
+                if not sucesso:
+                    self.erros_recentes.append({
+                        'tipo': tipo,
+                        'timestamp': datetime.now()
+                    })
+                    # Limpar erros antigos (últimos 10 minutos)
+                    self.erros_recentes = [
+                        erro for erro in self.erros_recentes 
+                        if (datetime.now() - erro['timestamp']).total_seconds() < 600
+                    ]
             
-            self._atualizar_estado_servidor()
-            self._atualizar_fator_adaptacao()
+                self._atualizar_estado_servidor()
+                self._atualizar_fator_adaptacao()
             
-        except Exception as e:
-            logger.error(f"Erro ao registrar tempo de operação: {e}")
+            except Exception as e:
+                logger.error(f"Erro ao registrar tempo de operação: {e}")
     
     def _atualizar_estado_servidor(self) -> EstadoServidor:
         """Atualiza estado do servidor baseado em performance recente"""
@@ -279,8 +284,9 @@ class TimeoutManager:
     
     def reiniciar_estatisticas(self):
         """Reinicia todas as estatísticas"""
-        self.estatisticas_tempo = {op_type: [] for op_type in TipoOperacao}
-        self.erros_recentes = []
-        self.estado_servidor = EstadoServidor.NORMAL
-        self.fator_adaptacao = 1.0
+        with self._lock:
+            self.estatisticas_tempo = {op_type: [] for op_type in TipoOperacao}
+            self.erros_recentes = []
+            self.estado_servidor = EstadoServidor.NORMAL
+            self.fator_adaptacao = 1.0
         logger.info("Estatísticas de timeout reiniciadas")
\ No newline at end of file
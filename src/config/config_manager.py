@@ -16,6 +16,29 @@ class SEFAZConfig:
     inscricao_estadual: str
     data_inicio: str
     data_fim: str
+    backend_estado: str = "json"
+    escrita_assincrona_estado: bool = False
+    intervalo_flush_estado: float = 0.5
+    max_transicoes_flush: int = 50
+    workers: int = 1
+    abas: int = 1
+    reutilizar_sessao: bool = True
+    validade_sessao_horas: float = 8
+    cache_driver: bool = True
+    perfil_chrome: str = ""
+    endereco_depuracao: str = ""
+    prazo_download: float = 60
+    monitorar_downloads_cdp: bool = False
+    download_direto: bool = False
+    paralelismo_download: int = 4
+    pipeline: bool = False
+    prazo_pipeline: float = 900
+    pos_processamento: bool = False
+    processos_pos_processamento: int = 2
+    extrair_xml: bool = False
+    catalogo_nfe: bool = False
+    armazem_xml: bool = False
+    intervalo_espera: float = 0.1
     
     def validar_formatos(self) -> List[str]:
         erros = []
@@ -32,6 +55,15 @@ class SEFAZConfig:
         if not self.inscricao_estadual or not self.inscricao_estadual.strip().isdigit():
             erros.append("Inscricao Estadual deve conter apenas numeros")
         
+        if self.backend_estado not in ('json', 'sqlite'):
+            erros.append("backend_estado deve ser 'json' ou 'sqlite'")
+        
+        if self.workers < 1:
+            erros.append("workers deve ser pelo menos 1")
+        
+        if self.abas < 1:
+            erros.append("abas deve ser pelo menos 1")
+        
         # Validar datas
         data_erros = self._validar_datas()
         erros.extend(data_erros)
@@ -109,7 +141,30 @@ class GerenciadorConfig:
                 senha=config_dict.get('senha', '').strip(),
                 inscricao_estadual=str(config_dict.get('inscricao_estadual', '')).strip(),
                 data_inicio=config_dict.get('data_inicio', '').strip(),
-                data_fim=config_dict.get('data_fim', '').strip()
+                data_fim=config_dict.get('data_fim', '').strip(),
+                backend_estado=config_dict.get('backend_estado', 'json'),
+                escrita_assincrona_estado=bool(config_dict.get('escrita_assincrona_estado', False)),
+                intervalo_flush_estado=float(config_dict.get('intervalo_flush_estado', 0.5)),
+                max_transicoes_flush=int(config_dict.get('max_transicoes_flush', 50)),
+                workers=int(config_dict.get('workers', 1)),
+                abas=int(config_dict.get('abas', 1)),
+                reutilizar_sessao=bool(config_dict.get('reutilizar_sessao', True)),
+                validade_sessao_horas=float(config_dict.get('validade_sessao_horas', 8)),
+                cache_driver=bool(config_dict.get('cache_driver', True)),
+                perfil_chrome=config_dict.get('perfil_chrome', ''),
+                endereco_depuracao=config_dict.get('endereco_depuracao', ''),
+                prazo_download=float(config_dict.get('prazo_download', 60)),
+                monitorar_downloads_cdp=bool(config_dict.get('monitorar_downloads_cdp', False)),
+                download_direto=bool(config_dict.get('download_direto', False)),
+                paralelismo_download=int(config_dict.get('paralelismo_download', 4)),
+                pipeline=bool(config_dict.get('pipeline', False)),
+                prazo_pipeline=float(config_dict.get('prazo_pipeline', 900)),
+                pos_processamento=bool(config_dict.get('pos_processamento', False)),
+                processos_pos_processamento=int(config_dict.get('processos_pos_processamento', 2)),
+                extrair_xml=bool(config_dict.get('extrair_xml', False)),
+                catalogo_nfe=bool(config_dict.get('catalogo_nfe', False)),
+                armazem_xml=bool(config_dict.get('armazem_xml', False)),
+                intervalo_espera=float(config_dict.get('intervalo_espera', 0.1))
             )
             
             # Se datas estão vazias, usar período automático
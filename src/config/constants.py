@@ -26,7 +26,42 @@ SELECTORS = {
         'inscricao_estadual': (By.ID, "cmpNumIeDest"),
         'modelo_nota': (By.ID, "cmpModelo"),
         'botao_pesquisar': (By.ID, "btnPesquisar"),
-    }
+    },
+    # Alvos com seletores alternativos, na ordem inicial de prioridade; o RegistroSeletores
+    # reordena pelo histórico de acertos e latência (estado/seletores.json)
+    'alvos': {
+        'acesso_restrito': [
+            (By.XPATH, "//h3[contains(text(), 'Acesso Restrito')]"),
+            (By.XPATH, "//a[contains(@href, 'NETACCESS/default.asp')]"),
+            (By.XPATH, "//a[@target='_blank' and contains(@href, 'NETACCESS')]"),
+            (By.XPATH, "//a[contains(@class, 'dashboard-sistemas-item')]"),
+            (By.XPATH, "//a[contains(@href, 'NETACCESS') and contains(@title, 'Acessar')]"),
+            (By.XPATH, "//h3[contains(text(), 'Acesso Restrito')]/ancestor::a"),
+        ],
+        'link_baixar_xml': [
+            (By.XPATH, "//a[@onclick=\"OpenUrl('https://nfeweb.sefaz.go.gov.br/nfeweb/sites/nfe/consulta-notas-recebidas', false, '', 'False', 'true')\"]"),
+            (By.XPATH, "//a[text()='Baixar XML NFE']"),
+            (By.XPATH, "//a[contains(text(), 'Baixar XML NFE')]"),
+            (By.XPATH, "//a[contains(., 'Baixar XML')]"),
+        ],
+        'botao_baixar_xml': [
+            (By.XPATH, "//button[contains(text(), 'Baixar XML')]"),
+            (By.XPATH, "//a[contains(text(), 'Baixar XML')]"),
+            (By.ID, "btnBaixarXml"),
+            (By.XPATH, "//button[contains(@onclick, 'baixar')]"),
+            (By.XPATH, "//button[contains(@class, 'btn') and contains(text(), 'Baixar')]"),
+        ],
+        'linhas_tabela_notas': [
+            (By.XPATH, "//table//tr[contains(@class, 'tbody-row')]"),
+            (By.XPATH, "//table//tr[position()>1]"),
+            (By.XPATH, "//tbody/tr"),
+        ],
+        'popup_login': [
+            (By.ID, "NetAccess.Login"),
+            (By.ID, "NetAccess.Password"),
+            (By.ID, "btnAuthenticate"),
+        ],
+    },
 }
 
 TIMEOUTS = {
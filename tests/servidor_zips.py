@@ -0,0 +1,69 @@
+"""
+Servidor HTTP local que simula o histórico da SEFAZ para os testes e o benchmark do download direto
+
+Serve ZIPs com latência por requisição e suporte a Range; pode derrubar a
+conexão no meio da primeira resposta de cada arquivo (`interromper`) ou
+ignorar o Range e responder 200 com o arquivo inteiro (`ignorar_range`).
+"""
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+
+
+class ServidorZips(BaseHTTPRequestHandler):
+    arquivos: Dict[str, bytes] = {}
+    nomes: Dict[str, str] = {}
+    latencia = 0.0
+    interromper: set = set()
+    ignorar_range = False
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        conteudo = self.arquivos.get(self.path)
+        if conteudo is None:
+            self.send_error(404)
+            return
+
+        time.sleep(self.latencia)
+        inicio = 0
+        faixa = None if self.ignorar_range else self.headers.get('Range')
+        if faixa:
+            inicio = int(faixa.split('=')[1].split('-')[0])
+            if inicio >= len(conteudo):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {inicio}-{len(conteudo) - 1}/{len(conteudo)}")
+        else:
+            self.send_response(200)
+
+        nome = self.nomes.get(self.path, self.path.strip('/'))
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Length', str(len(conteudo) - inicio))
+        self.send_header('Content-Disposition', f'attachment; filename="{nome}"')
+        self.end_headers()
+
+        if self.path in self.interromper:
+            self.interromper.discard(self.path)
+            self.wfile.write(conteudo[inicio:inicio + len(conteudo) // 2])
+            self.wfile.flush()
+            self.connection.close()
+            return
+        self.wfile.write(conteudo[inicio:])
+
+
+def iniciar_servidor(arquivos: Dict[str, bytes], nomes: Optional[Dict[str, str]] = None,
+                     latencia: float = 0.0, interromper: Iterable[str] = (),
+                     ignorar_range: bool = False) -> ThreadingHTTPServer:
+    """Sobe o servidor numa porta livre; a URL base fica em `servidor.base`"""
+    manipulador = type('ServidorZipsConfigurado', (ServidorZips,), {
+        'arquivos': arquivos, 'nomes': nomes or {}, 'latencia': latencia,
+        'interromper': set(interromper), 'ignorar_range': ignorar_range,
+    })
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), manipulador)
+    servidor.base = f"http://127.0.0.1:{servidor.server_address[1]}"
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
@@ -0,0 +1,57 @@
+import zipfile
+
+from src.automacao.armazem_xml import ArmazemXML, calcular_sha256, carregar_manifesto, sha256_pacote
+
+
+def _zip(caminho, membros):
+    with zipfile.ZipFile(caminho, 'w') as pacote:
+        for nome, conteudo in membros.items():
+            pacote.writestr(nome, conteudo)
+    return caminho
+
+
+def test_guardar_zip_grava_cada_xml_uma_vez(tmp_path):
+    armazem = ArmazemXML(str(tmp_path / ".objetos"))
+    pasta = tmp_path / "Empresa" / "2026" / "10"
+    pasta.mkdir(parents=True)
+
+    zip_a = _zip(pasta / "a.zip", {"1.xml": b"<a/>", "2.xml": b"<b/>"})
+    hash_a = calcular_sha256(zip_a)
+    resultado = armazem.guardar_zip(zip_a, str(pasta))
+
+    assert (resultado.membros, resultado.objetos_novos) == (2, 2)
+    assert not zip_a.exists()
+    assert sha256_pacote(zip_a) == hash_a
+
+    zip_b = _zip(pasta / "b.zip", {"2.xml": b"<b/>", "3.xml": b"<c/>"})
+    resultado = armazem.guardar_zip(zip_b, str(pasta))
+
+    assert resultado.objetos_novos == 1
+    manifesto = carregar_manifesto(pasta)
+    assert set(manifesto) == {"a.zip", "b.zip"}
+    assert manifesto["a.zip"]['membros']["2.xml"] == manifesto["b.zip"]['membros']["2.xml"]
+    assert armazem.caminho_objeto(manifesto["b.zip"]['membros']["3.xml"]).read_bytes() == b"<c/>"
+
+
+def test_pacote_repetido_nao_grava_nada(tmp_path):
+    armazem = ArmazemXML(str(tmp_path / ".objetos"))
+    membros = {"1.xml": b"<a/>"}
+    armazem.guardar_zip(_zip(tmp_path / "a.zip", membros), str(tmp_path))
+
+    resultado = armazem.guardar_zip(_zip(tmp_path / "a.zip", membros), str(tmp_path))
+
+    assert resultado.repetido
+    assert resultado.objetos_novos == 0
+    assert not (tmp_path / "a.zip").exists()
+
+
+def test_calcular_sha256_com_mmap(tmp_path, monkeypatch):
+    from src.automacao import armazem_xml
+
+    arquivo = tmp_path / "grande.bin"
+    arquivo.write_bytes(b"x" * 5000)
+    esperado = calcular_sha256(arquivo)
+
+    monkeypatch.setattr(armazem_xml, 'LIMITE_MMAP', 1024)
+    monkeypatch.setattr(armazem_xml, 'TAMANHO_BLOCO', 1000)
+    assert calcular_sha256(arquivo) == esperado
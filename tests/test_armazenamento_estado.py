@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from src.automacao.armazenamento_estado import ArmazenamentoJSON, ArmazenamentoSQLite, ParticaoPeriodo
+
+
+def _registro(ie, status='pendente', **extras):
+    return {'ie': ie, 'nome': f"Empresa {ie}", 'status': status, 'tentativas': 0,
+            'progresso_download': 0, 'total_notas': 0, 'notas_processadas': 0, **extras}
+
+
+def test_sqlite_ida_e_volta_preserva_ordem_e_payload(tmp_path):
+    banco = ArmazenamentoSQLite(str(tmp_path / "estado.db"))
+    banco.registrar([_registro("2"), _registro("1", arquivos_baixados=["a.zip"], dados_sessao={'url': 'u'})])
+    # Transição sem payload preserva o payload gravado
+    banco.registrar([_registro("1", status='concluido', checkpoint_time="2026-10-01T10:00:00")])
+    banco.fechar()
+
+    banco = ArmazenamentoSQLite(str(tmp_path / "estado.db"))
+    registros = banco.carregar()
+
+    assert list(registros) == ["2", "1"]
+    assert registros["1"]['status'] == 'concluido'
+    assert 'arquivos_baixados' not in registros["1"]
+    assert banco.carregar_payload("1") == (["a.zip"], {'url': 'u'})
+    assert banco.carregar_payload("2") == ([], {})
+    assert banco.consultar_checkpoints_antigos("2026-10-02T00:00:00") == ["1"]
+
+    banco.limpar()
+    assert banco.carregar() == {}
+    banco.fechar()
+
+
+def test_abrir_somente_leitura_usa_banco_da_particao(tmp_path):
+    particao = ParticaoPeriodo(tmp_path, "01/10/2026", "31/10/2026")
+    banco = ArmazenamentoSQLite(str(particao.diretorio / ArmazenamentoSQLite.NOME_BANCO))
+    banco.registrar([_registro("1")])
+
+    conexao = ArmazenamentoSQLite.abrir_somente_leitura("01/10/2026", "31/10/2026", str(tmp_path))
+    try:
+        assert [linha['ie'] for linha in conexao.execute("SELECT ie FROM estados")] == ["1"]
+    finally:
+        conexao.close()
+        banco.fechar()
+
+    with pytest.raises(FileNotFoundError):
+        ArmazenamentoSQLite.abrir_somente_leitura("01/11/2026", "30/11/2026", str(tmp_path))
+
+
+def _journal(tmp_path, limite_journal=1000):
+    return ArmazenamentoJSON(str(tmp_path / "estado.json"), limite_journal=limite_journal)
+
+
+def test_journal_reaplicado_sobre_o_snapshot(tmp_path):
+    armazenamento = _journal(tmp_path)
+    armazenamento.salvar_tudo({"1": _registro("1", arquivos_baixados=["a.zip"], dados_sessao={})})
+    armazenamento.registrar([_registro("1", status='em_andamento'), _registro("2")])
+    armazenamento.registrar([_registro("1", status='concluido')])
+    armazenamento.fechar()
+
+    recarregado = _journal(tmp_path)
+    registros = recarregado.carregar()
+
+    assert registros["1"]['status'] == 'concluido'
+    assert registros["2"]['status'] == 'pendente'
+    # Linhas do journal sem payload preservam o payload do snapshot
+    assert recarregado.carregar_payload("1") == (["a.zip"], {})
+
+
+def test_journal_ignora_linha_truncada(tmp_path):
+    armazenamento = _journal(tmp_path)
+    armazenamento.registrar([_registro("1", status='concluido')])
+    armazenamento.fechar()
+    with open(armazenamento.arquivo_journal, 'a', encoding='utf-8') as f:
+        f.write('{"ie": "2", "sta')
+
+    assert list(_journal(tmp_path).carregar()) == ["1"]
+
+
+def test_compactacao_grava_snapshot_e_descarta_journal(tmp_path):
+    estados = {}
+    armazenamento = _journal(tmp_path, limite_journal=3)
+    armazenamento.vincular_snapshot(lambda: dict(estados))
+
+    for ie in ("1", "2", "3"):
+        estados[ie] = _registro(ie, status='concluido')
+        armazenamento.registrar([estados[ie]])
+    armazenamento.aguardar_compactacao()
+
+    assert armazenamento.arquivo_estado.exists()
+    assert not armazenamento.arquivo_journal.exists()
+    assert not armazenamento.arquivo_journal_compactando.exists()
+
+    estados["4"] = _registro("4")
+    armazenamento.registrar([estados["4"]])
+    armazenamento.fechar()
+
+    assert set(_journal(tmp_path).carregar()) == {"1", "2", "3", "4"}
+
+
+def test_compactacao_interrompida_e_reaplicada(tmp_path):
+    armazenamento = _journal(tmp_path)
+    armazenamento.salvar_tudo({"1": _registro("1")})
+    # Queda durante a compactação: journal rotacionado ainda sem o snapshot novo
+    armazenamento.arquivo_journal_compactando.write_text(
+        json.dumps(_registro("1", status='concluido')) + "\n", encoding='utf-8'
+    )
+    armazenamento.registrar([_registro("2")])
+    armazenamento.fechar()
+
+    registros = _journal(tmp_path).carregar()
+
+    assert registros["1"]['status'] == 'concluido'
+    assert "2" in registros
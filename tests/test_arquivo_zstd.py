@@ -0,0 +1,83 @@
+import zipfile
+
+import pytest
+
+from src.automacao import arquivo_zstd
+from src.automacao.arquivo_zstd import LeitorArquivoZstd, NOME_ARQUIVO, empacotar_arvore, empacotar_pasta
+
+pytest.importorskip("zstandard")
+
+
+def _chave(numero: int) -> str:
+    return f"{numero:044d}"
+
+
+def _nfe(numero: int) -> bytes:
+    return (f'<nfeProc><NFe><infNFe versao="4.00" Id="NFe{_chave(numero)}">'
+            f'<ide><nNF>{numero}</nNF></ide></infNFe></NFe></nfeProc>').encode()
+
+
+def _evento(numero: int) -> bytes:
+    return (f'<procEventoNFe><evento><infEvento><chNFe>{_chave(numero)}</chNFe>'
+            f'<tpEvento>110111</tpEvento></infEvento></evento></procEventoNFe>').encode()
+
+
+def _zip(caminho, membros):
+    with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED) as pacote:
+        for nome, conteudo in membros.items():
+            pacote.writestr(nome, conteudo)
+
+
+def test_empacotar_e_ler_por_chave(tmp_path):
+    _zip(tmp_path / "a.zip", {f"{n}.xml": _nfe(n) for n in range(30)})
+    _zip(tmp_path / "b.zip", {"29.xml": _nfe(29), "evento.xml": _evento(3)})
+
+    resultado = empacotar_pasta(tmp_path)
+
+    assert resultado.documentos == 32
+    assert resultado.zips == 2
+    with LeitorArquivoZstd(tmp_path / NOME_ARQUIVO) as leitor:
+        assert len(leitor.chaves()) == 30
+        assert leitor.ler(_chave(3)) == [_nfe(3), _evento(3)]
+        # XML idêntico em dois pacotes é gravado uma vez só
+        entradas = [e for e in leitor.entradas if e['chave'] == _chave(29)]
+        assert len(entradas) == 2 and entradas[0]['offset'] == entradas[1]['offset']
+    assert (tmp_path / "a.zip").exists()
+
+
+def test_reempacotamento_incremental_remove_zips(tmp_path):
+    _zip(tmp_path / "a.zip", {"1.xml": _nfe(1)})
+    empacotar_pasta(tmp_path, remover_zips=True)
+    assert not (tmp_path / "a.zip").exists()
+
+    _zip(tmp_path / "b.zip", {"2.xml": _nfe(2)})
+    resultado = empacotar_pasta(tmp_path, remover_zips=True)
+
+    assert resultado.documentos == 2
+    with LeitorArquivoZstd(tmp_path / NOME_ARQUIVO) as leitor:
+        assert leitor.ler(_chave(1)) == [_nfe(1)]
+        assert leitor.ler(_chave(2)) == [_nfe(2)]
+
+
+def test_arquivo_truncado_e_rejeitado(tmp_path):
+    _zip(tmp_path / "a.zip", {"1.xml": _nfe(1)})
+    empacotar_pasta(tmp_path)
+    destino = tmp_path / NOME_ARQUIVO
+    destino.write_bytes(destino.read_bytes()[:-4])
+
+    with pytest.raises(ValueError):
+        LeitorArquivoZstd(destino)
+
+
+def test_empacotar_arvore_ignora_diretorios_ocultos(tmp_path):
+    mes = tmp_path / "Empresa" / "2026" / "10"
+    mes.mkdir(parents=True)
+    _zip(mes / "a.zip", {"1.xml": _nfe(1)})
+    oculto = tmp_path / ".objetos"
+    oculto.mkdir()
+    _zip(oculto / "x.zip", {"2.xml": _nfe(2)})
+
+    resultados = empacotar_arvore(tmp_path)
+
+    assert [r.arquivo for r in resultados] == [mes / NOME_ARQUIVO]
+    assert arquivo_zstd.disponivel()
@@ -0,0 +1,45 @@
+from src.automacao.catalogo_nfe import CatalogoNFe
+from src.automacao.pos_processamento import processar_zip
+
+from tests.test_pos_processamento import CHAVE, _evento, _nfe, _zip
+
+
+def test_cartas_de_correcao_da_mesma_nota_nao_se_sobrescrevem(tmp_path):
+    catalogo = CatalogoNFe(str(tmp_path / "catalogo.db"))
+    pacote = _zip(tmp_path / "a.zip", {"nfe.xml": _nfe(), "cce1.xml": _evento(1), "cce2.xml": _evento(2)})
+
+    assert catalogo.indexar(processar_zip(str(pacote), "101234567")) == 3
+
+    documentos = catalogo.buscar_chave(CHAVE)
+    assert [(d['tipo'], d['tipo_evento'], d['seq_evento']) for d in documentos] == [
+        ("nfe", "", 0), ("evento", "110110", 1), ("evento", "110110", 2)
+    ]
+    assert documentos[2]['dh_emi'] == "2026-10-02T09:00:00-03:00"
+    assert documentos[2]['descricao_evento'] == "Carta de Correcao"
+    catalogo.fechar()
+
+
+def test_pacote_repetido_so_atualiza_localizacao(tmp_path):
+    catalogo = CatalogoNFe(str(tmp_path / "catalogo.db"))
+    resultado = processar_zip(str(_zip(tmp_path / "a.zip", {"nfe.xml": _nfe()})), "101234567")
+    catalogo.indexar(resultado)
+
+    assert catalogo.catalogado(resultado.sha256)
+    outro = processar_zip(str(_zip(tmp_path / "b.zip", {"copia/nfe.xml": _nfe()})), "101234567")
+    catalogo.indexar(outro)
+
+    [nota] = catalogo.buscar_chave(CHAVE)
+    assert (nota['arquivo'], nota['membro']) == (str(tmp_path / "b.zip"), "copia/nfe.xml")
+    assert [d['chave'] for d in catalogo.buscar_por_ie("101234567", "2026-10")] == [CHAVE]
+    catalogo.fechar()
+
+
+def test_reindexar_ignora_pacotes_ja_catalogados(tmp_path):
+    catalogo = CatalogoNFe(str(tmp_path / "catalogo.db"))
+    pasta = tmp_path / "SEFAZ" / "Empresa" / "2026" / "10"
+    pasta.mkdir(parents=True)
+    _zip(pasta / "a.zip", {"nfe.xml": _nfe(), "cce1.xml": _evento(1)})
+
+    assert catalogo.reindexar(tmp_path / "SEFAZ", processos=1) == 2
+    assert catalogo.reindexar(tmp_path / "SEFAZ", processos=1) == 0
+    catalogo.fechar()
@@ -0,0 +1,96 @@
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+
+from src.automacao.consulta_driver import ConsultaDriver
+
+
+class DriverFalso:
+    def __init__(self):
+        self.comandos = []
+        self.switch_to = SwitchTo(self)
+        self.valor = "1"
+
+    def execute(self, comando, parametros=None):
+        self.comandos.append(comando)
+        return {'value': None}
+
+    def execute_script(self, script, *args):
+        self.execute(Command.W3C_EXECUTE_SCRIPT)
+        return {campo: {'presente': True, 'valor': self.valor} for campo in args[0]}
+
+
+class DriverPagina(DriverFalso):
+    def execute_script(self, script, *args):
+        self.execute(Command.W3C_EXECUTE_SCRIPT)
+        return ["https://sefaz/consulta", "Consulta"]
+
+
+def test_campos_respondidos_pelo_cache_na_mesma_epoca():
+    driver = DriverFalso()
+    consulta = ConsultaDriver(driver, validade=60)
+
+    consulta.campos(["cmpNumIeDest"])
+    consulta.campos(["cmpNumIeDest"])
+
+    assert driver.comandos.count(Command.W3C_EXECUTE_SCRIPT) == 1
+    assert consulta.consultas == {'respondidas_cache': 1, 'executadas': 1}
+
+
+def test_comando_de_escrita_abre_nova_epoca():
+    driver = DriverFalso()
+    consulta = ConsultaDriver(driver, validade=60)
+    consulta.campos(["cmpNumIeDest"])
+
+    driver.execute(Command.CLICK_ELEMENT)
+    driver.valor = "2"
+
+    assert consulta.campos(["cmpNumIeDest"])["cmpNumIeDest"]['valor'] == "2"
+
+
+def _no_iframe(consulta):
+    # O rastreador no frame, como depois de contexto_iframe
+    consulta.gerenciador_iframe.rastreador.frame = ("id", "iNetaccess")
+
+
+def test_leitura_do_iframe_expira_sem_comando_do_driver():
+    # O portal recarrega o iframe e troca o conteúdo por XHR sem passar pelo driver
+    driver = DriverFalso()
+    consulta = ConsultaDriver(driver, validade=0)
+    _no_iframe(consulta)
+    consulta.campos(["cmpNumIeDest"])
+
+    driver.valor = "2"
+
+    assert consulta.campos(["cmpNumIeDest"])["cmpNumIeDest"]['valor'] == "2"
+    assert consulta.consultas['respondidas_cache'] == 0
+
+
+def test_leitura_do_documento_principal_vale_a_epoca_toda():
+    driver = DriverFalso()
+    consulta = ConsultaDriver(driver, validade=0)
+    consulta.campos(["cmpNumIeDest"])
+
+    driver.valor = "2"
+
+    assert consulta.campos(["cmpNumIeDest"])["cmpNumIeDest"]['valor'] == "1"
+    assert consulta.consultas == {'respondidas_cache': 1, 'executadas': 1}
+
+
+def test_pagina_numa_unica_ida_e_reaproveitada_na_epoca():
+    driver = DriverPagina()
+    consulta = ConsultaDriver(driver)
+
+    assert consulta.pagina() == {'url': "https://sefaz/consulta", 'titulo': "Consulta"}
+    assert consulta.pagina()['url'] == "https://sefaz/consulta"
+    assert driver.comandos == [Command.W3C_EXECUTE_SCRIPT]
+
+
+def test_contar_ie_soma_idas_do_bloco():
+    driver = DriverFalso()
+    consulta = ConsultaDriver(driver)
+
+    with consulta.contar_ie("101234567"):
+        driver.execute(Command.GET_CURRENT_URL)
+        driver.execute(Command.GET_TITLE)
+
+    assert consulta.idas_por_ie == {"101234567": 2}
@@ -0,0 +1,114 @@
+import hashlib
+
+import pytest
+import requests
+
+from src.automacao import download_http
+from src.automacao.download_http import GerenciadorDownloadHttp
+from tests.servidor_zips import iniciar_servidor
+
+
+class DriverFalso:
+    def __init__(self, cookies):
+        self.cookies = cookies
+
+    def execute_cdp_cmd(self, comando, parametros):
+        return {'cookies': self.cookies}
+
+    def execute_script(self, script):
+        return "Agente/1.0"
+
+
+def test_copiar_sessao_troca_o_pote_sem_esvaziar_o_anterior():
+    gerenciador = GerenciadorDownloadHttp()
+    gerenciador.copiar_sessao_navegador(DriverFalso([{'name': 'sessao', 'value': 'a', 'domain': 'sefaz'}]))
+    pote_anterior = gerenciador.sessao.cookies
+
+    total = gerenciador.copiar_sessao_navegador(DriverFalso([{'name': 'sessao', 'value': 'b', 'domain': 'sefaz'}]))
+
+    assert total == 1
+    assert gerenciador.sessao.cookies is not pote_anterior
+    assert pote_anterior.get('sessao') == 'a'
+    assert gerenciador.sessao.cookies.get('sessao') == 'b'
+    assert gerenciador.sessao.headers['User-Agent'] == "Agente/1.0"
+
+
+def test_retomada_espera_com_backoff(monkeypatch, tmp_path):
+    gerenciador = GerenciadorDownloadHttp(tentativas=3)
+    esperas = []
+    monkeypatch.setattr(download_http.time, 'sleep', esperas.append)
+
+    def falhar(url, destino):
+        raise requests.ConnectionError("conexão caiu")
+
+    monkeypatch.setattr(gerenciador, '_baixar_arquivo', falhar)
+
+    with pytest.raises(requests.ConnectionError):
+        gerenciador._baixar_com_retomada("https://sefaz/pacote.zip", tmp_path)
+
+    assert esperas == [1.0, 2.0]
+
+
+CONTEUDO = b"PK\x03\x04" + bytes(range(256)) * 6000
+NOME = "NFe_101234567_2026_10.zip"
+
+
+@pytest.fixture
+def servidor():
+    servidores = []
+
+    def iniciar(**opcoes):
+        servidor = iniciar_servidor({"/baixar?id=7": CONTEUDO}, {"/baixar?id=7": NOME}, **opcoes)
+        servidores.append(servidor)
+        return servidor
+
+    yield iniciar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def _baixar(servidor, destino, tentativas=3):
+    gerenciador = GerenciadorDownloadHttp(tentativas=tentativas)
+    try:
+        return gerenciador._baixar_com_retomada(servidor.base + "/baixar?id=7", destino)
+    finally:
+        gerenciador.encerrar()
+
+
+def _conferir(arquivo, destino, retomado):
+    assert arquivo.nome == NOME
+    assert arquivo.sha256 == hashlib.sha256(CONTEUDO).hexdigest()
+    assert arquivo.caminho.read_bytes() == CONTEUDO
+    assert arquivo.retomado is retomado
+    assert [p.name for p in destino.iterdir()] == [NOME]
+
+
+def test_download_completo(servidor, tmp_path):
+    _conferir(_baixar(servidor(), tmp_path), tmp_path, retomado=False)
+
+
+def test_conexao_interrompida_retoma_com_range(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(download_http, 'ESPERA_RETOMADA', 0.0)
+    arquivo = _baixar(servidor(interromper=["/baixar?id=7"]), tmp_path)
+
+    _conferir(arquivo, tmp_path, retomado=True)
+
+
+def test_servidor_que_ignora_range_recomeca_do_zero(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(download_http, 'ESPERA_RETOMADA', 0.0)
+    arquivo = _baixar(servidor(interromper=["/baixar?id=7"], ignorar_range=True), tmp_path)
+
+    _conferir(arquivo, tmp_path, retomado=False)
+
+
+def test_part_completo_de_execucao_anterior_recebe_416_e_mantem_o_nome(servidor, tmp_path):
+    local = servidor(interromper=["/baixar?id=7"])
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        _baixar(local, tmp_path, tentativas=1)
+
+    # O processo caiu depois do último bloco e antes do rename: o .part está completo
+    [parcial] = tmp_path.glob("*.part")
+    parcial.write_bytes(CONTEUDO)
+
+    _conferir(_baixar(local, tmp_path), tmp_path, retomado=True)
@@ -0,0 +1,66 @@
+import time
+
+from selenium.webdriver.remote.command import Command
+
+from src.automacao.fluxo_utils import GerenciadorWaitInteligente
+from src.automacao.timeout_manager import TimeoutManager, TipoOperacao
+
+A = ("id", "a")
+B = ("xpath", "//b")
+C = ("css selector", ".c")
+
+
+class DriverFalso:
+    """Responde à corrida de seletores com `respostas` em ordem (a última se repete)"""
+
+    def __init__(self, *respostas):
+        self.comandos = []
+        self.respostas = list(respostas)
+        self.argumentos = None
+
+    def execute(self, comando, parametros=None):
+        self.comandos.append(comando)
+        return {'value': None}
+
+    def execute_script(self, script, *args):
+        self.execute(Command.W3C_EXECUTE_SCRIPT)
+        self.argumentos = args
+        return self.respostas.pop(0) if len(self.respostas) > 1 else self.respostas[0]
+
+
+def _gerenciador(driver, timeout=1):
+    timeout_manager = TimeoutManager()
+    timeout_manager.timeouts_base[TipoOperacao.ELEMENTO_WAIT] = timeout
+    timeout_manager.config_adaptacao['min_timeout'] = timeout
+    return GerenciadorWaitInteligente(driver, timeout_manager)
+
+
+def test_retorna_indice_da_primeira_alternativa_presente():
+    elemento = object()
+    driver = DriverFalso(None, None, [1, elemento])
+    gerenciador = _gerenciador(driver)
+
+    assert gerenciador.aguardar_primeira_alternativa(A, B, C) == (1, elemento)
+
+    assert driver.comandos.count(Command.W3C_EXECUTE_SCRIPT) == 3
+    assert driver.argumentos[0] == [list(A), list(B), list(C)]
+    registro, = gerenciador.timeout_manager.estatisticas_tempo[TipoOperacao.ELEMENTO_WAIT]
+    assert registro['sucesso'] and registro['tempo'] < 1
+
+
+def test_prazo_unico_para_todas_as_alternativas():
+    gerenciador = _gerenciador(DriverFalso(None), timeout=1)
+
+    inicio = time.time()
+    assert gerenciador.aguardar_primeira_alternativa(A, B, C) is None
+
+    # Um prazo para a corrida inteira, não um por seletor
+    assert 1 <= time.time() - inicio < 2
+    registro, = gerenciador.timeout_manager.estatisticas_tempo[TipoOperacao.ELEMENTO_WAIT]
+    assert not registro['sucesso'] and registro['tempo'] >= 1
+
+
+def test_fallback_sem_alternativa_retorna_none():
+    gerenciador = _gerenciador(DriverFalso(None), timeout=1)
+
+    assert gerenciador.aguardar_elemento_ou_alternativas(A, B) is None
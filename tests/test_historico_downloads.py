@@ -0,0 +1,113 @@
+from src.automacao import historico_downloads
+from src.automacao.historico_downloads import ColetorHistorico, EntradaHistorico
+
+
+def _linha(*celulas, indice=0, tem_link=True):
+    return {'indice': indice, 'celulas': list(celulas), 'tem_link': tem_link, 'link': None}
+
+
+def test_de_linha_interpreta_celulas():
+    entrada = EntradaHistorico.de_linha(_linha(
+        "10.123.456-7", "01/10/2026 a 31/10/2026", "05/11/2026 14:32", "Disponível"
+    ))
+
+    assert entrada.ie == "101234567"
+    assert entrada.periodo == ("01/10/2026", "31/10/2026")
+    assert entrada.gerado_em == "05/11/2026 14:32"
+    assert entrada.status == "Disponível"
+    assert entrada.pronta
+
+
+def test_de_linha_data_sozinha_nao_vira_ie():
+    entrada = EntradaHistorico.de_linha(_linha("15/11/2026", "101234567", "Processado"))
+
+    assert entrada.ie == "101234567"
+
+
+def test_processado_conta_como_pronta():
+    assert EntradaHistorico.de_linha(_linha("101234567", "Processado")).pronta
+    assert EntradaHistorico.de_linha(_linha("101234567", "Concluído")).pronta
+
+
+def test_pendentes_e_falhas_nao_prontas():
+    for status in ("Processando", "Em processamento", "Aguardando", "Solicitado", "Erro na geração"):
+        entrada = EntradaHistorico.de_linha(_linha("101234567", status))
+        assert entrada.status == status
+        assert not entrada.pronta, status
+
+    assert not EntradaHistorico.de_linha(_linha("101234567", "Disponível", tem_link=False)).pronta
+
+
+def _coletor(tmp_path, periodo=None):
+    coletor = ColetorHistorico.__new__(ColetorHistorico)
+    coletor.periodo = periodo
+    coletor.arquivo_registro = tmp_path / "registro.json"
+    coletor._baixadas = set()
+    return coletor
+
+
+def test_de_linha_periodo_em_duas_celulas():
+    entrada = EntradaHistorico.de_linha(_linha(
+        "123456789", "01/10/2026", "31/10/2026", "02/11/2026 10:00", "Processado"
+    ))
+
+    assert entrada.ie == "123456789"
+    assert entrada.periodo == ("01/10/2026", "31/10/2026")
+    assert entrada.gerado_em == "02/11/2026 10:00"
+    assert entrada.pronta
+
+
+def test_selecionar_descarta_so_outro_periodo(tmp_path):
+    historico_downloads._em_coleta.clear()
+    coletor = _coletor(tmp_path, ("01/10/2026", "31/10/2026"))
+    entradas = [
+        EntradaHistorico.de_linha(_linha("111111111", "01/10/2026 a 31/10/2026", "Disponível", indice=0)),
+        EntradaHistorico.de_linha(_linha("222222222", "Disponível", indice=1)),
+        EntradaHistorico.de_linha(_linha("333333333", "01/09/2026 a 30/09/2026", "Disponível", indice=2)),
+    ]
+
+    grupos = coletor.selecionar(entradas, ie_atual="111111111", aceitar_ie=lambda ie: True)
+
+    assert sorted(grupos) == ["111111111", "222222222"]
+    coletor.concluir([e for grupo in grupos.values() for e in grupo], baixadas=False)
+
+
+def test_selecionar_periodo_em_celulas_separadas(tmp_path):
+    historico_downloads._em_coleta.clear()
+    coletor = _coletor(tmp_path, ("01/10/2026", "31/10/2026"))
+    entradas = [EntradaHistorico.de_linha(_linha(
+        "123456789", "01/10/2026", "31/10/2026", "02/11/2026 10:00", "Processado"
+    ))]
+
+    grupos = coletor.selecionar(entradas, ie_atual="123456789")
+
+    assert [e.indice for e in grupos["123456789"]] == [0]
+    coletor.concluir(grupos["123456789"], baixadas=False)
+
+
+def test_selecionar_linha_sem_ie_nem_periodo_vai_para_ie_atual(tmp_path):
+    historico_downloads._em_coleta.clear()
+    coletor = _coletor(tmp_path, ("01/10/2026", "31/10/2026"))
+    entradas = [
+        EntradaHistorico.de_linha(_linha("02/11/2026 10:00", "Disponível", indice=0)),
+        EntradaHistorico.de_linha(_linha("01/11/2026 09:00", "Disponível", indice=1)),
+    ]
+
+    grupos = coletor.selecionar(entradas, ie_atual="123456789")
+
+    # Só a primeira linha sem IE (a solicitação mais recente) é atribuída
+    assert [e.indice for e in grupos["123456789"]] == [0]
+    coletor.concluir(grupos["123456789"], baixadas=False)
+
+
+def test_selecionar_reserva_e_concluir_registra(tmp_path):
+    historico_downloads._em_coleta.clear()
+    coletor = _coletor(tmp_path)
+    entradas = [EntradaHistorico.de_linha(_linha("111111111", "05/11/2026 14:32", "Disponível"))]
+
+    grupos = coletor.selecionar(entradas, ie_atual="111111111")
+    assert coletor.selecionar(entradas, ie_atual="111111111") == {}
+
+    coletor.concluir(grupos["111111111"], baixadas=True)
+    assert coletor.selecionar(entradas, ie_atual="111111111") == {}
+    assert coletor._carregar_registro() == {entradas[0].chave}
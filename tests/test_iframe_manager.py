@@ -0,0 +1,107 @@
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+
+from src.automacao.iframe_manager import GerenciadorIframe
+
+IFRAME = ("id", "iNetaccess")
+
+
+class DriverFalso:
+    """Registra os comandos enviados; `find_element` devolve um novo elemento a cada busca"""
+
+    def __init__(self):
+        self.comandos = []
+        self.switch_to = SwitchTo(self)
+
+    def execute(self, comando, parametros=None):
+        self.comandos.append(comando)
+        return {'value': None}
+
+    def find_element(self, by, valor):
+        self.execute(Command.FIND_ELEMENT, {'using': by, 'value': valor})
+        return object()
+
+    def execute_script(self, script, *args):
+        return self.execute(Command.W3C_EXECUTE_SCRIPT, {'script': script, 'args': list(args)})
+
+    def close(self):
+        self.execute(Command.CLOSE)
+
+    def contar(self, comando):
+        return self.comandos.count(comando)
+
+
+def test_reentrada_no_mesmo_frame_nao_envia_comandos():
+    driver = DriverFalso()
+    gerenciador = GerenciadorIframe(driver)
+
+    for _ in range(5):
+        with gerenciador.contexto_iframe(IFRAME):
+            driver.execute_script("return 1")
+
+    assert driver.contar(Command.SWITCH_TO_FRAME) == 1
+    assert driver.contar(Command.FIND_ELEMENT) == 1
+    assert gerenciador.rastreador.estatisticas['reentradas'] == 4
+
+
+def test_saida_adiada_ate_comando_do_documento_principal():
+    driver = DriverFalso()
+    gerenciador = GerenciadorIframe(driver)
+    with gerenciador.contexto_iframe(IFRAME):
+        pass
+
+    driver.execute(Command.GET_CURRENT_URL)
+    assert driver.contar(Command.SWITCH_TO_FRAME) == 1
+
+    driver.execute(Command.CLICK_ELEMENT)
+    assert driver.comandos[-2:] == [Command.SWITCH_TO_FRAME, Command.CLICK_ELEMENT]
+    assert gerenciador.rastreador.frame is None
+
+
+def test_navegacao_descarta_elemento_do_iframe():
+    driver = DriverFalso()
+    gerenciador = GerenciadorIframe(driver)
+    with gerenciador.contexto_iframe(IFRAME):
+        pass
+
+    driver.execute(Command.REFRESH)
+    with gerenciador.contexto_iframe(IFRAME):
+        pass
+
+    assert driver.contar(Command.FIND_ELEMENT) == 2
+
+
+def test_fechar_aba_descarta_contexto_e_aba_ativa():
+    driver = DriverFalso()
+    gerenciador = GerenciadorIframe(driver)
+    gerenciador.ativar_aba("aba-1")
+    with gerenciador.contexto_iframe(IFRAME):
+        pass
+    rastreador = gerenciador.rastreador
+    assert rastreador.elementos
+
+    driver.close()
+
+    assert rastreador.frame is None
+    assert not rastreador.saida_pendente
+    assert rastreador.elementos == {}
+    assert gerenciador.aba_ativa is None
+
+    # A próxima entrada troca de aba e busca o iframe de novo
+    assert gerenciador.ativar_aba("aba-1")
+    with gerenciador.contexto_iframe(IFRAME):
+        pass
+    assert driver.contar(Command.FIND_ELEMENT) == 2
+
+
+def test_erro_no_bloco_volta_ao_documento_principal():
+    driver = DriverFalso()
+    gerenciador = GerenciadorIframe(driver)
+    try:
+        with gerenciador.contexto_iframe(IFRAME):
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert driver.comandos[-1] == Command.SWITCH_TO_FRAME
+    assert gerenciador.rastreador.frame is None
@@ -0,0 +1,36 @@
+import threading
+import time
+
+from src.automacao.monitor_downloads import MonitorDownloads
+
+
+def test_rename_do_crdownload_acorda_a_espera(tmp_path):
+    (tmp_path / "antigo.zip").write_bytes(b"x")
+    parcial = tmp_path / "NFe_101234567_2026_10.zip.crdownload"
+    monitor = MonitorDownloads(tmp_path)
+    monitor.iniciar()
+    parcial.write_bytes(b"PK")
+    assert not monitor.concluido()
+
+    renomear = threading.Timer(0.3, parcial.rename, [tmp_path / "NFe_101234567_2026_10.zip"])
+    renomear.start()
+    inicio = time.monotonic()
+    try:
+        assert monitor.esperar(prazo=10)
+    finally:
+        renomear.join()
+        monitor.parar()
+
+    # Acordado pelo rename, não pelo prazo
+    assert time.monotonic() - inicio < 2
+    assert [a.name for a in monitor.novos_arquivos()] == ["NFe_101234567_2026_10.zip"]
+
+
+def test_aguardar_respeita_o_prazo_com_parcial_pendente(tmp_path):
+    monitor = MonitorDownloads(tmp_path)
+    monitor.iniciar()
+    (tmp_path / "pacote.zip.crdownload").write_bytes(b"PK")
+
+    inicio = time.monotonic()
+    assert monitor.aguardar(prazo=0.3) == []
+    assert 0.3 <= time.monotonic() - inicio < 2
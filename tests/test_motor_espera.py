@@ -0,0 +1,89 @@
+import time
+
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+
+from src.automacao.motor_espera import MotorEspera
+from src.automacao.timeout_manager import TimeoutManager, TipoOperacao
+
+
+class DriverFalso:
+    """Abre uma janela nova e troca a URL depois de `leituras` consultas; o script devolve `estados` em ordem"""
+
+    def __init__(self, leituras=3, estados=()):
+        self.comandos = []
+        self.switch_to = SwitchTo(self)
+        self.leituras = leituras
+        self.estados = list(estados)
+
+    def execute(self, comando, parametros=None):
+        self.comandos.append(comando)
+        return {'value': None}
+
+    def _consultar(self):
+        self.leituras -= 1
+        return self.leituras <= 0
+
+    @property
+    def window_handles(self):
+        return ["principal", "nova"] if self._consultar() else ["principal"]
+
+    @property
+    def current_url(self):
+        return "https://sefaz/consulta" if self._consultar() else "https://sefaz/login"
+
+    def execute_script(self, script, *args):
+        self.execute(Command.W3C_EXECUTE_SCRIPT)
+        return self.estados.pop(0) if len(self.estados) > 1 else self.estados[0]
+
+
+def _motor(driver):
+    return MotorEspera(driver, TimeoutManager(), intervalo=0.01)
+
+
+def test_nova_janela_retorna_assim_que_abre_e_registra_latencia():
+    motor = _motor(DriverFalso(leituras=3))
+
+    inicio = time.time()
+    assert motor.nova_janela(["principal"], timeout=5) == "nova"
+
+    assert time.time() - inicio < 1
+    registro, = motor.timeout_manager.estatisticas_tempo[TipoOperacao.PAGINA_CARREGAMENTO]
+    assert registro['sucesso'] and registro['tempo'] < 1
+
+
+def test_mudanca_url_expirada_respeita_o_prazo_e_conta_como_erro():
+    motor = _motor(DriverFalso(leituras=1000))
+
+    inicio = time.time()
+    assert motor.mudanca_url(contendo="consulta", timeout=0.2) is None
+
+    assert 0.2 <= time.time() - inicio < 1
+    registro, = motor.timeout_manager.estatisticas_tempo[TipoOperacao.PAGINA_CARREGAMENTO]
+    assert not registro['sucesso'] and registro['tempo'] >= 0.2
+    assert len(motor.timeout_manager.erros_recentes) == 1
+
+
+def test_espera_opcional_expirada_nao_registra_erro():
+    motor = _motor(DriverFalso(leituras=1000))
+
+    assert motor.nova_janela(["principal"], timeout=0.1) is None
+
+    assert motor.timeout_manager.estatisticas_tempo[TipoOperacao.PAGINA_CARREGAMENTO] == []
+    assert motor.timeout_manager.erros_recentes == []
+
+
+def test_rede_ociosa_espera_requisicoes_em_andamento():
+    estados = [
+        {'pronto': 'complete', 'mutacao': 900, 'ativas': 1, 'rede': 900},
+        {'pronto': 'complete', 'mutacao': 900, 'ativas': 0, 'rede': 100},
+        {'pronto': 'complete', 'mutacao': 900, 'ativas': 0, 'rede': 600},
+    ]
+    driver = DriverFalso(estados=estados)
+    motor = _motor(driver)
+
+    assert motor.rede_ociosa(ociosidade=0.5, timeout=5)
+
+    assert driver.comandos.count(Command.W3C_EXECUTE_SCRIPT) == 3
+    registro, = motor.timeout_manager.estatisticas_tempo[TipoOperacao.PAGINA_CARREGAMENTO]
+    assert registro['sucesso']
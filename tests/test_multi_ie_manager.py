@@ -0,0 +1,87 @@
+import time
+
+from src.automacao.multi_ie_manager import GerenciadorMultiplasEmpresas
+
+EMPRESA = {'ie': '101234567', 'nome': 'Empresa Teste'}
+
+
+def test_escrita_assincrona_grava_ao_atingir_max_transicoes(tmp_path):
+    gerenciador = GerenciadorMultiplasEmpresas(
+        str(tmp_path / "estado.json"), escrita_assincrona=True, intervalo_flush=60, max_transicoes=3
+    )
+    try:
+        gerenciador.adicionar_empresas([EMPRESA])
+        gerenciador.marcar_em_andamento(EMPRESA)
+        assert gerenciador._sujas
+
+        # Mesma IE: a terceira transição dispara a gravação, mesmo com uma só IE suja
+        gerenciador.marcar_concluido(EMPRESA)
+        prazo = time.time() + 5
+        while gerenciador._sujas and time.time() < prazo:
+            time.sleep(0.01)
+        assert not gerenciador._sujas
+        assert gerenciador._transicoes_pendentes == 0
+    finally:
+        gerenciador.fechar()
+
+
+def test_estado_retomado_do_journal(tmp_path):
+    arquivo = str(tmp_path / "estado.json")
+    gerenciador = GerenciadorMultiplasEmpresas(arquivo)
+    outra = {'ie': '109876543', 'nome': 'Outra'}
+    gerenciador.adicionar_empresas([EMPRESA, outra])
+    gerenciador.marcar_em_andamento(EMPRESA)
+    gerenciador.criar_checkpoint(EMPRESA, "consulta", 60)
+    gerenciador.marcar_em_andamento(outra)
+    gerenciador.marcar_concluido(outra)
+    gerenciador.fechar()
+
+    retomado = GerenciadorMultiplasEmpresas(arquivo)
+    try:
+        assert retomado.estados[EMPRESA['ie']].status == 'em_andamento'
+        assert retomado.estados[EMPRESA['ie']].etapa_atual == 'consulta'
+        assert retomado.estados[outra['ie']].status == 'concluido'
+        assert retomado.obter_sessao_interrompida(EMPRESA['ie']) is not None
+        assert retomado.obter_proxima_empresa() is None
+    finally:
+        retomado.fechar()
+
+
+def test_solicitadas_listadas_e_persistidas(tmp_path):
+    arquivo = str(tmp_path / "estado.json")
+    gerenciador = GerenciadorMultiplasEmpresas(arquivo)
+    outra = {'ie': '109876543', 'nome': 'Outra'}
+    gerenciador.adicionar_empresas([EMPRESA, outra])
+    gerenciador.marcar_em_andamento(EMPRESA)
+    gerenciador.marcar_solicitado(EMPRESA)
+
+    assert gerenciador.obter_solicitadas() == [EMPRESA]
+    assert gerenciador.estados[EMPRESA['ie']].etapa_atual == 'solicitado'
+    assert 'solicitado_em' in gerenciador.estados[EMPRESA['ie']].dados_sessao
+    gerenciador.fechar()
+
+    retomado = GerenciadorMultiplasEmpresas(arquivo)
+    try:
+        assert retomado.obter_solicitadas() == [EMPRESA]
+    finally:
+        retomado.fechar()
+
+
+def test_solicitada_sai_da_lista_ao_ser_colhida_ou_marcada_pendente(tmp_path):
+    gerenciador = GerenciadorMultiplasEmpresas(str(tmp_path / "estado.json"))
+    outra = {'ie': '109876543', 'nome': 'Outra'}
+    try:
+        gerenciador.adicionar_empresas([EMPRESA, outra])
+        for empresa in (EMPRESA, outra):
+            gerenciador.marcar_em_andamento(empresa)
+            gerenciador.marcar_solicitado(empresa)
+
+        gerenciador.registrar_colheita(EMPRESA['ie'], ["a.zip"])
+        assert gerenciador.obter_solicitadas() == [outra]
+
+        gerenciador.marcar_pendente(outra, "Pacote não ficou pronto no prazo do pipeline")
+        assert gerenciador.obter_solicitadas() == []
+        assert gerenciador.estados[outra['ie']].status == 'pendente'
+        assert gerenciador.foi_colhida(EMPRESA['ie']) and not gerenciador.foi_colhida(outra['ie'])
+    finally:
+        gerenciador.fechar()
@@ -0,0 +1,86 @@
+import io
+import json
+import zipfile
+
+from src.automacao.pos_processamento import GerenciadorPosProcessamento, ler_documentos_xml, processar_zip
+
+CHAVE = "35261012345678000190550010000000011000000010"
+
+
+def _nfe(chave=CHAVE):
+    return (f'<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe"><NFe><infNFe versao="4.00" Id="NFe{chave}">'
+            '<ide><dhEmi>2026-10-05T10:00:00-03:00</dhEmi></ide><emit><CNPJ>12345678000190</CNPJ></emit>'
+            '<dest><IE>101234567</IE></dest><total><ICMSTot><vNF>150.25</vNF></ICMSTot></total>'
+            '</infNFe></NFe></nfeProc>').encode()
+
+
+def _evento(seq, chave=CHAVE, tipo="110110"):
+    # procEventoNFe: um infEvento no evento e outro no protocolo (retEvento)
+    return (f'<procEventoNFe xmlns="http://www.portalfiscal.inf.br/nfe">'
+            f'<evento><infEvento><chNFe>{chave}</chNFe><dhEvento>2026-10-0{seq}T09:00:00-03:00</dhEvento>'
+            f'<tpEvento>{tipo}</tpEvento><nSeqEvento>{seq}</nSeqEvento>'
+            f'<detEvento><descEvento>Carta de Correcao</descEvento></detEvento></infEvento></evento>'
+            f'<retEvento><infEvento><cStat>135</cStat><chNFe>{chave}</chNFe><tpEvento>{tipo}</tpEvento>'
+            f'<xEvento>Registrado</xEvento><nSeqEvento>{seq}</nSeqEvento>'
+            f'<dhRegEvento>2026-10-0{seq}T09:00:05-03:00</dhRegEvento></infEvento></retEvento>'
+            f'</procEventoNFe>').encode()
+
+
+def _zip(caminho, membros, compressao=zipfile.ZIP_DEFLATED):
+    with zipfile.ZipFile(caminho, 'w', compressao) as pacote:
+        for nome, conteudo in membros.items():
+            pacote.writestr(nome, conteudo)
+    return caminho
+
+
+def test_ler_nfe():
+    [nota] = ler_documentos_xml(io.BytesIO(_nfe()), "nfe.xml")
+
+    assert (nota.chave, nota.tipo, nota.membro) == (CHAVE, "nfe", "nfe.xml")
+    assert nota.cnpj_emitente == "12345678000190"
+    assert nota.ie_destinatario == "101234567"
+    assert nota.dh_emi.startswith("2026-10-05")
+    assert nota.v_nf == 150.25
+
+
+def test_proc_evento_gera_um_registro_com_os_campos_do_evento():
+    [evento] = ler_documentos_xml(io.BytesIO(_evento(2)))
+
+    assert (evento.chave, evento.tipo, evento.tipo_evento, evento.seq_evento) == (CHAVE, "evento", "110110", 2)
+    assert evento.dh_emi == "2026-10-02T09:00:00-03:00"
+    assert evento.descricao_evento == "Carta de Correcao"
+    assert evento.cnpj_emitente == "12345678000190"
+
+
+def test_processar_zip_confere_crc_e_extrai(tmp_path):
+    caminho = _zip(tmp_path / "pacote.zip", {"nfe.xml": _nfe(), "cce1.xml": _evento(1), "leia.txt": b"x"},
+                   zipfile.ZIP_STORED)
+    resultado = processar_zip(str(caminho), "101234567", extrair_para=str(tmp_path / "extraido"))
+
+    assert resultado.integro and not resultado.erros
+    assert resultado.membros == 3
+    assert [n.tipo for n in resultado.notas] == ["nfe", "evento"]
+    assert (tmp_path / "extraido" / "nfe.xml").read_bytes() == _nfe()
+
+    # Um byte trocado dentro do membro: o CRC-32 falha só nele
+    dados = caminho.read_bytes()
+    posicao = dados.index(b"Carta de Correcao")
+    caminho.write_bytes(dados[:posicao] + b"c" + dados[posicao + 1:])
+    resultado = processar_zip(str(caminho))
+
+    assert not resultado.integro
+    assert len(resultado.erros) == 1 and "cce1.xml" in resultado.erros[0]
+    assert [n.tipo for n in resultado.notas] == ["nfe"]
+
+
+def test_gerenciador_grava_resultados_em_segundo_plano(tmp_path):
+    arquivo_resultados = tmp_path / "notas.jsonl"
+    gerenciador = GerenciadorPosProcessamento(processos=1, arquivo_resultados=str(arquivo_resultados))
+    gerenciador.enfileirar(_zip(tmp_path / "a.zip", {"nfe.xml": _nfe()}), "101234567")
+    gerenciador.enfileirar(_zip(tmp_path / "b.zip", {"cce.xml": _evento(1)}), "101234567")
+    gerenciador.encerrar()
+
+    linhas = [json.loads(linha) for linha in arquivo_resultados.read_text(encoding='utf-8').splitlines()]
+    assert sorted(len(linha['notas']) for linha in linhas) == [1, 1]
+    assert {linha['ie'] for linha in linhas} == {"101234567"}
+    assert gerenciador.estatisticas['pacotes'] == 2
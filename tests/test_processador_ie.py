@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.automacao.download_manager import GerenciadorDownload
+from src.automacao.multi_ie_manager import GerenciadorMultiplasEmpresas
+from src.automacao.processador_ie import ProcessadorIE
+from src.utils.data_models import ResultadoDownload
+
+EMPRESA = {'ie': '101234567', 'nome': 'Empresa Teste'}
+
+
+class DownloadFalso:
+    _executar_etapas = staticmethod(GerenciadorDownload._executar_etapas)
+
+    def __init__(self, etapas):
+        self.etapas = etapas
+        self.solicitar_ok = True
+
+    def solicitar_pacote(self, ie):
+        self.etapas.append('solicitar')
+        return self.solicitar_ok
+
+    def tem_notas_tabela(self):
+        return True
+
+    def executar_fluxo_download_em_etapas(self, nome_empresa, data_referencia, agendador, ie=""):
+        self.etapas.append('download')
+        yield agendador.espera('download')
+        return ResultadoDownload(total_encontrado=1, total_baixado=1, erros=[],
+                                 notas_baixadas=["a.zip"], caminho_download="")
+
+
+class AgendadorFalso:
+    def espera(self, etapa):
+        return etapa
+
+
+@pytest.fixture
+def processador(tmp_path):
+    etapas = []
+    processador = ProcessadorIE.__new__(ProcessadorIE)
+    processador.config = SimpleNamespace(data_inicio="01/10/2026")
+    processador.consulta_driver = SimpleNamespace(pagina=lambda: {'url': "", 'titulo': ""})
+    processador.gerenciador_download = DownloadFalso(etapas)
+    processador.gerenciador_estado = GerenciadorMultiplasEmpresas(str(tmp_path / "estado.json"))
+    processador.gerenciador_estado.adicionar_empresas([EMPRESA])
+    processador.etapas = etapas
+
+    def etapa(nome):
+        return lambda *args: etapas.append(nome) or True
+
+    processador._preencher_formulario = etapa('formulario')
+    processador._aguardar_captcha_manual = etapa('captcha')
+    processador._executar_consulta = etapa('consulta')
+    processador._validar_resultados = etapa('validacao')
+    processador._voltar_pagina_consulta = etapa('voltar')
+    yield processador
+    processador.gerenciador_estado.fechar()
+
+
+def _executar(fluxo):
+    esperas = []
+    try:
+        while True:
+            esperas.append(next(fluxo))
+    except StopIteration as fim:
+        return fim.value, esperas
+
+
+def _em_etapas(processador):
+    fluxo = processador.processar_ie_em_etapas(EMPRESA['ie'], EMPRESA['nome'], AgendadorFalso())
+    return _executar(fluxo)
+
+
+def test_em_etapas_cede_so_nas_esperas_do_servidor(processador):
+    processador.gerenciador_estado.marcar_em_andamento(EMPRESA)
+
+    sucesso, esperas = _em_etapas(processador)
+
+    assert sucesso
+    assert esperas == ['consulta', 'download']
+    assert processador.etapas == ['formulario', 'captcha', 'consulta', 'validacao', 'download', 'voltar']
+    assert processador.gerenciador_estado.estados[EMPRESA['ie']].etapa_atual == 'concluido'
+
+
+def test_em_etapas_retoma_da_etapa_salva(processador):
+    estado = processador.gerenciador_estado
+    estado.marcar_em_andamento(EMPRESA)
+    estado.criar_checkpoint(EMPRESA, "consulta", 60)
+
+    sucesso, esperas = _em_etapas(processador)
+
+    assert sucesso
+    assert processador.etapas == ['consulta', 'validacao', 'download', 'voltar']
+
+
+def test_em_etapas_para_sem_notas(processador):
+    processador.gerenciador_estado.marcar_em_andamento(EMPRESA)
+    processador._validar_resultados = lambda ie: False
+
+    sucesso, esperas = _em_etapas(processador)
+
+    assert not sucesso
+    assert esperas == ['consulta']
+    assert 'download' not in processador.etapas
+
+
+def test_fluxo_sequencial_usa_as_mesmas_etapas_sem_ceder(processador):
+    processador._processar_download = lambda ie, nome: processador.etapas.append('download') or True
+
+    assert processador._executar_fluxo_com_checkpoints(EMPRESA)
+    assert processador.etapas == ['formulario', 'captcha', 'consulta', 'validacao', 'download']
+
+
+def test_solicitar_pacote_consulta_pede_e_marca_solicitado(processador):
+    estado = processador.gerenciador_estado
+    estado.marcar_em_andamento(EMPRESA)
+
+    assert processador.solicitar_pacote_ie(EMPRESA['ie'], EMPRESA['nome'])
+    assert processador.etapas == ['voltar', 'formulario', 'captcha', 'consulta', 'validacao', 'solicitar']
+    assert estado.obter_solicitadas() == [EMPRESA]
+
+
+def test_solicitar_pacote_com_falha_volta_para_validacao(processador):
+    estado = processador.gerenciador_estado
+    estado.marcar_em_andamento(EMPRESA)
+    processador.gerenciador_download.solicitar_ok = False
+
+    assert not processador.solicitar_pacote_ie(EMPRESA['ie'], EMPRESA['nome'])
+    assert estado.obter_solicitadas() == []
+    assert estado.estados[EMPRESA['ie']].etapa_atual == 'validacao'
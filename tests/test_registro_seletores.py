@@ -0,0 +1,41 @@
+from src.automacao.registro_seletores import LIMITE_REBAIXAMENTO, RegistroSeletores
+
+A = ("id", "a")
+B = ("id", "b")
+C = ("id", "c")
+
+
+def _registro(tmp_path):
+    return RegistroSeletores(str(tmp_path / "seletores.json"), alvos={'alvo': [A, B, C]})
+
+
+def test_vencedor_sobe_na_ordem(tmp_path):
+    registro = _registro(tmp_path)
+    registro.registrar('alvo', [A, B, C], C, 0.1)
+
+    assert registro.ordenar('alvo')[0] == C
+
+
+def test_seletor_que_ja_acertou_e_rebaixado_apos_falhas_seguidas(tmp_path):
+    registro = _registro(tmp_path)
+    for _ in range(20):
+        registro.registrar('alvo', [A], A, 0.05)
+
+    # O portal mudou: A passa a errar e B a casar
+    for _ in range(LIMITE_REBAIXAMENTO):
+        registro.registrar('alvo', [A, B], B, 0.05)
+
+    assert registro.ordenar('alvo')[-1] == A
+
+    registro.registrar('alvo', [B, C, A], A, 0.05)
+    assert registro.ordenar('alvo')[-1] != A
+
+
+def test_estatisticas_persistidas(tmp_path):
+    registro = _registro(tmp_path)
+    registro.registrar('alvo', [A, B], B, 0.2)
+    registro.salvar()
+
+    recarregado = _registro(tmp_path)
+    assert recarregado.ordenar('alvo')[0] == B
+    assert recarregado.estatisticas['alvo']['id=a']['falhas_seguidas'] == 1
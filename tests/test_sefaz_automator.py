@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from src.automacao.multi_ie_manager import GerenciadorMultiplasEmpresas
+from src.automacao.sefaz_automator import AutomatorSEFAZ
+
+EMPRESAS = [{'ie': '101234567', 'nome': 'Pronta'}, {'ie': '109876543', 'nome': 'Atrasada'}]
+
+
+class ConsultaFalsa:
+    @contextmanager
+    def contar_ie(self, ie):
+        yield
+
+
+def test_pipeline_marca_pendente_o_que_nao_ficou_pronto_no_prazo(tmp_path):
+    multi_ie = GerenciadorMultiplasEmpresas(str(tmp_path / "estado.json"))
+    multi_ie.adicionar_empresas(EMPRESAS)
+    prazos = []
+
+    def solicitar(ie, nome):
+        multi_ie.marcar_solicitado({'ie': ie, 'nome': nome})
+        return True
+
+    def aguardar_solicitacoes(data_referencia, prazo):
+        # Fase 2: só o pacote da primeira IE fica pronto antes do prazo
+        prazos.append(prazo)
+        multi_ie.registrar_colheita(EMPRESAS[0]['ie'], ["a.zip"])
+        return 1
+
+    automator = AutomatorSEFAZ.__new__(AutomatorSEFAZ)
+    automator.config = SimpleNamespace(data_inicio="01/10/2026", prazo_pipeline=60)
+    automator.gerenciador_multi_ie = multi_ie
+    automator.consulta_driver = ConsultaFalsa()
+    automator.timeout_manager = SimpleNamespace(registrar_tempo_operacao=lambda *args: None)
+    automator.processador_ie = SimpleNamespace(solicitar_pacote_ie=solicitar)
+    automator.gerenciador_download = SimpleNamespace(
+        colher_prontos=lambda data_referencia: [], aguardar_solicitacoes=aguardar_solicitacoes
+    )
+
+    try:
+        assert automator._executar_pipeline(EMPRESAS) == 1
+        assert prazos == [60]
+        assert multi_ie.estados[EMPRESAS[0]['ie']].status == 'concluido'
+        atrasada = multi_ie.estados[EMPRESAS[1]['ie']]
+        assert atrasada.status == 'pendente'
+        assert "prazo do pipeline" in atrasada.erro
+        assert multi_ie.obter_solicitadas() == []
+    finally:
+        multi_ie.fechar()
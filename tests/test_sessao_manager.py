@@ -0,0 +1,107 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.automacao import sessao_manager
+from src.automacao.sessao_manager import CABECALHO_ARQUIVO, GerenciadorSessao
+
+COOKIES = [
+    {'name': 'JSESSIONID', 'value': 'abc', 'domain': 'portal.sefaz.go.gov.br', 'path': '/',
+     'secure': True, 'session': True, 'expires': -1, 'size': 42},
+    {'name': 'dominio_pai', 'value': '1', 'domain': '.sefaz.go.gov.br', 'path': '/', 'expires': 1900000000},
+    {'name': 'rastreio', 'value': 'x', 'domain': '.exemplo.com', 'path': '/'},
+    {'name': 'parecido', 'value': 'y', 'domain': 'sefaz.go.gov.br.exemplo.com', 'path': '/'},
+]
+
+
+class SwitchToFalso:
+    def frame(self, elemento):
+        pass
+
+    def default_content(self):
+        pass
+
+
+class DriverFalso:
+    current_url = "https://portal.sefaz.go.gov.br/netaccess"
+
+    def __init__(self, cookies=()):
+        self.cookies = list(cookies)
+        self.comandos = []
+        self.switch_to = SwitchToFalso()
+
+    def execute_cdp_cmd(self, comando, parametros):
+        self.comandos.append((comando, parametros))
+        if comando == "Network.getAllCookies":
+            return {'cookies': self.cookies}
+        return {}
+
+    def execute_script(self, script):
+        return {'origem': "https://portal.sefaz.go.gov.br", 'local': {'token': "t"}, 'sessao': {}}
+
+    def find_element(self, by, valor):
+        return object()
+
+
+@pytest.fixture
+def criptografia(monkeypatch):
+    pytest.importorskip("cryptography")
+    # A derivação de chave real leva centenas de ms: irrelevante para o formato
+    monkeypatch.setattr(sessao_manager, 'ITERACOES_PBKDF2', 1000)
+
+
+def test_coletar_cookies_so_do_portal_e_sem_expiracao_de_sessao():
+    sessao = GerenciadorSessao(DriverFalso(COOKIES), "usuario", "senha")
+
+    cookies = sessao._coletar_cookies()
+
+    assert [c['name'] for c in cookies] == ['JSESSIONID', 'dominio_pai']
+    assert 'expires' not in cookies[0] and 'size' not in cookies[0]
+    assert cookies[1]['expires'] == 1900000000
+
+
+def test_exportar_e_importar_ida_e_volta(tmp_path, criptografia):
+    arquivo = tmp_path / "sessao.bin"
+    assert GerenciadorSessao(DriverFalso(COOKIES), "usuario", "senha", str(arquivo)).exportar()
+    assert arquivo.read_bytes().startswith(CABECALHO_ARQUIVO)
+    assert b"JSESSIONID" not in arquivo.read_bytes()
+
+    destino = DriverFalso()
+    url = GerenciadorSessao(destino, "usuario", "senha", str(arquivo)).importar()
+
+    assert url == DriverFalso.current_url
+    comandos = dict(destino.comandos)
+    assert [c['name'] for c in comandos["Network.setCookies"]['cookies']] == ['JSESSIONID', 'dominio_pai']
+    script = comandos["Page.addScriptToEvaluateOnNewDocument"]['source']
+    assert json.dumps({"https://portal.sefaz.go.gov.br": {'local': {'token': "t"}, 'sessao': {}}}) in script
+
+
+def test_credenciais_erradas_nao_abrem_a_sessao(tmp_path, criptografia):
+    arquivo = str(tmp_path / "sessao.bin")
+    GerenciadorSessao(DriverFalso(COOKIES), "usuario", "senha", arquivo).exportar()
+
+    destino = DriverFalso()
+    assert GerenciadorSessao(destino, "usuario", "outra", arquivo).importar() is None
+    assert destino.comandos == []
+
+
+def test_cabecalho_desconhecido_e_rejeitado(tmp_path, criptografia):
+    arquivo = tmp_path / "sessao.bin"
+    GerenciadorSessao(DriverFalso(COOKIES), "usuario", "senha", str(arquivo)).exportar()
+    arquivo.write_bytes(b"NFESESS0" + arquivo.read_bytes()[len(CABECALHO_ARQUIVO):])
+
+    assert GerenciadorSessao(DriverFalso(), "usuario", "senha", str(arquivo)).carregar() is None
+
+
+def test_sessao_expira_apos_a_validade(tmp_path, criptografia, monkeypatch):
+    arquivo = str(tmp_path / "sessao.bin")
+    GerenciadorSessao(DriverFalso(COOKIES), "usuario", "senha", arquivo, validade_horas=8).exportar()
+    sessao = GerenciadorSessao(DriverFalso(), "usuario", "senha", arquivo, validade_horas=8)
+    assert sessao.carregar() is not None
+
+    # O prazo vem do carimbo de tempo do token Fernet
+    daqui_9_horas = time.time() + 9 * 3600
+    monkeypatch.setattr("cryptography.fernet.time", SimpleNamespace(time=lambda: daqui_9_horas))
+    assert sessao.carregar() is None